@@ -0,0 +1,117 @@
+from __future__ import unicode_literals
+import sys
+import threading
+import pytest  # noqa
+from textx import metamodel_from_str
+from textx.exceptions import TextXSemanticError
+
+grammar = r"""
+Model: entities+=Entity;
+Entity: Compound | Simple;
+Simple: 'simple' name=ID ('refs' refs+=[Entity][','])?;
+Compound: 'simple' name=ID '{' entities+=Entity '}';
+"""
+
+
+def model_str(idx):
+    return ' '.join(
+        'simple e{0}_{1} {{ simple n{0}_{1} refs e{0}_{1} }} '
+        'simple s{0}_{1} refs e{0}_{1}, n{0}_{1}'.format(idx, i)
+        for i in range(20))
+
+
+def check_model(model, idx):
+    assert len(model.entities) == 40
+    for i in range(20):
+        compound, simple = model.entities[2 * i:2 * i + 2]
+        nested = compound.entities[0]
+        assert compound.name == 'e{}_{}'.format(idx, i)
+        assert nested.name == 'n{}_{}'.format(idx, i)
+        assert nested.parent is compound
+        assert nested.refs == [compound]
+        assert simple.refs == [compound, nested]
+
+
+@pytest.mark.parametrize('params', [
+    {},
+    {'memoization': True},
+    {'direct_construction': True},
+    {'direct_construction': True, 'memoization': True},
+])
+def test_concurrent_parsing(params):
+    """
+    Test that many models can be parsed concurrently using a shared
+    meta-model.
+    """
+    mm = metamodel_from_str(grammar, **params)
+    errors = []
+
+    def parse(thread_idx):
+        try:
+            for i in range(10):
+                idx = thread_idx * 100 + i
+                check_model(mm.model_from_str(model_str(idx)), idx)
+        except Exception as e:
+            errors.append(e)
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=parse, args=(i,))
+                   for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert not errors
+
+
+def test_names_not_shared_between_models():
+    mm = metamodel_from_str(grammar)
+    mm.model_from_str('simple a')
+    with pytest.raises(TextXSemanticError):
+        mm.model_from_str('simple b refs a')
+
+
+def test_reentrant_parsing():
+    """
+    Test that models can be parsed from object processors and during
+    streaming.
+    """
+    mm = metamodel_from_str(grammar)
+
+    def simple_processor(simple):
+        if simple.name.startswith('s0_'):
+            check_model(mm.model_from_str(model_str(1)), 1)
+
+    mm.register_obj_processors({'Simple': simple_processor})
+    check_model(mm.model_from_str(model_str(0)), 0)
+
+    for entity in mm.model_iter_from_str(model_str(2)):
+        check_model(mm.model_from_str(model_str(3)), 3)
+
+
+@pytest.mark.parametrize('direct_construction', [False, True])
+def test_metamodel_parser_keeps_last_line_index(direct_construction):
+    """
+    Test that positions of the last parsed model can be converted by the
+    parser of the meta-model.
+    """
+    mm = metamodel_from_str(grammar, direct_construction=direct_construction)
+    positions = []
+    mm.register_obj_processors({
+        'Simple': lambda simple: positions.append(
+            mm.parser.pos_to_linecol(simple._tx_position))})
+
+    mm.model_from_str('simple a')
+    model = mm.model_from_str('\n\n  simple b\nsimple c')
+    assert mm.parser.input is None
+    assert positions == [(1, 1), (3, 3), (4, 1)]
+    assert mm.parser.pos_to_linecol(model.entities[1]._tx_position) == (4, 1)
+
+    mm_lean = metamodel_from_str(grammar, lean=True)
+    mm_lean.model_from_str('simple a')
+    assert mm_lean.parser._line_index is None
@@ -0,0 +1,47 @@
+from __future__ import unicode_literals
+import sys
+import pytest  # noqa
+from textx import metamodel_from_str
+from textx.model import parse_tree_to_objgraph
+
+grammar = r"""
+Model: node=Node;
+Node: '(' name=ID children*=Node ')';
+"""
+
+
+def test_model_deeper_than_recursion_limit():
+    """
+    Test that model construction and object processors are not limited by
+    the Python recursion limit.
+    """
+    mm = metamodel_from_str(grammar)
+
+    processed = []
+    mm.register_obj_processors({'Node': lambda n: processed.append(n.name)})
+
+    depth = sys.getrecursionlimit() * 2
+    model_str = ''.join('(n{} '.format(i) for i in range(depth)) + \
+        ')' * depth
+
+    # Parser itself is recursive so the parse tree is built with the raised
+    # recursion limit.
+    parser = mm.parser
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(depth * 20)
+    try:
+        parser.parse(model_str)
+    finally:
+        sys.setrecursionlimit(limit)
+
+    model = parse_tree_to_objgraph(parser, parser.parse_tree[0])
+
+    node = model.node
+    for i in range(depth - 1):
+        assert node.name == 'n{}'.format(i)
+        node = node.children[0]
+        assert node.parent.name == 'n{}'.format(i)
+    assert node.children == []
+
+    # Contained objects are processed before their containers.
+    assert processed == ['n{}'.format(i) for i in reversed(range(depth))]
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import pytest  # noqa
+import os
+from textx import metamodel_from_str, metamodel_from_file
+from textx.const import MULT_ONE, MULT_OPTIONAL
+
+
+examples_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+                            '..', '..', 'examples')
+
+
+def model_repr(obj, visited=None):
+    """
+    Returns a structure describing the model graph starting from obj.
+    Containment links are followed while references are described by the
+    target name.
+    """
+    if visited is None:
+        visited = set()
+    cls = obj.__class__
+    if not hasattr(cls, '_tx_attrs'):
+        return obj
+    assert id(obj) not in visited
+    visited.add(id(obj))
+
+    result = [cls.__name__, obj._tx_position, obj._tx_position_end]
+    if hasattr(obj, 'parent'):
+        result.append(('parent', obj.parent.__class__.__name__,
+                       obj.parent._tx_position))
+    for attr_name, attr in cls._tx_attrs.items():
+        value = getattr(obj, attr_name)
+        if attr.mult in (MULT_ONE, MULT_OPTIONAL):
+            value = [value]
+        values = []
+        for v in value:
+            if attr.ref and not attr.cont:
+                values.append(('ref', getattr(v, 'name', None),
+                               getattr(v, '_tx_position', None)))
+            else:
+                values.append(model_repr(v, visited))
+        result.append((attr_name, values))
+    return result
+
+
+@pytest.mark.parametrize('grammar, model', [
+    ('hello_world/hello.tx', 'hello_world/example.hello'),
+    ('robot/robot.tx', 'robot/program.rbt'),
+    ('StateMachine/state_machine.tx', 'StateMachine/gate.sm'),
+    ('json/json.tx', 'json/example2.json'),
+    ('pyFlies/pyflies.tx', 'pyFlies/experiment.pf'),
+    ('workflow/workflow.tx', 'workflow/example.wf'),
+    ('IBM_Rhapsody/rhapsody.tx', 'IBM_Rhapsody/LightSwitch.rpy'),
+])
+@pytest.mark.parametrize('memoization', [False, True])
+def test_direct_construction_examples(grammar, model, memoization):
+    grammar = os.path.join(examples_dir, grammar)
+    model = os.path.join(examples_dir, model)
+
+    mm = metamodel_from_file(grammar, memoization=memoization)
+    direct_mm = metamodel_from_file(grammar, memoization=memoization,
+                                    direct_construction=True)
+
+    expected = mm.model_from_file(model)
+    parser = direct_mm.parser.clone()
+    direct_model = parser.get_model_from_file(model, 'utf-8', None)
+    assert model_repr(direct_model) == model_repr(expected)
+
+    # Full parse tree is not kept.
+    assert len(parser.parse_tree) == 2
+
+
+grammar = """
+Model: entities+=Entity;
+Entity: Simple | Compound;
+Simple: 'simple' name=ID ('refs' refs+=[Entity][','])?;
+Compound: 'compound' name=ID '{' entities*=Entity '}' ';'
+        | 'compound' name=ID '{' entities*=Entity '}' ':' ref=[Entity];
+"""
+
+
+def test_direct_construction_backtracking():
+    """
+    Test that objects constructed for alternatives which are discarded
+    by backtracking are not part of the model.
+    """
+    model_str = """
+    simple a refs b
+    compound b {
+        simple c refs a, b
+        compound d { simple e } : e
+    } : c
+    """
+    mm = metamodel_from_str(grammar, direct_construction=True)
+    model = mm.model_from_str(model_str)
+
+    a, b = model.entities
+    assert a.refs == [b]
+    assert b.ref is b.entities[0]
+    c, d = b.entities
+    assert c.parent is b
+    assert c.refs == [a, b]
+    e = d.entities[0]
+    assert d.ref is e
+    assert e.parent is d
+
+    assert model_repr(model) == \
+        model_repr(metamodel_from_str(grammar).model_from_str(model_str))
+
+
+def test_direct_construction_user_classes():
+
+    class Compound(object):
+        def __init__(self, parent, name, entities, ref):
+            self.parent = parent
+            self.name = name
+            self.entities = entities
+            self.ref = ref
+
+    mm = metamodel_from_str(grammar, classes=[Compound],
+                            direct_construction=True)
+    model = mm.model_from_str("""
+    compound a { simple b } ; compound c { } : b
+    """)
+    a, c = model.entities
+    assert type(a) is Compound
+    assert a.parent is model
+    assert a.entities[0].parent is a
+    assert c.ref is a.entities[0]
+
+
+def test_direct_construction_tools_support():
+    mm = metamodel_from_str(grammar, textx_tools_support=True)
+    direct_mm = metamodel_from_str(grammar, textx_tools_support=True,
+                                   direct_construction=True)
+    model_str = 'simple a refs b compound b { simple c } ; simple d refs c'
+    model = mm.model_from_str(model_str)
+    direct_model = direct_mm.model_from_str(model_str)
+
+    assert list(direct_model._pos_rule_dict) == list(model._pos_rule_dict)
+    assert [(r.name, r.ref_pos_start, r.def_pos_start)
+            for r in direct_model._pos_crossref_list] == \
+        [(r.name, r.ref_pos_start, r.def_pos_start)
+         for r in model._pos_crossref_list]
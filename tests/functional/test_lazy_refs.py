@@ -0,0 +1,111 @@
+from __future__ import unicode_literals
+import pytest  # noqa
+from textx import metamodel_from_str, resolve_all
+from textx.exceptions import TextXSemanticError
+from textx.model import ObjCrossRef, LazyReferenceList
+
+grammar = r"""
+Model: entities*=Entity types*=Type;
+Type: 'type' name=ID;
+Entity: 'entity' name=ID ('extends' bases+=[Entity][','])?
+        '{' attrs*=Attribute '}';
+Attribute: name=ID ':' type=[Type];
+"""
+
+model_str = """
+entity Person extends Named {
+    age: int
+}
+entity Named {
+    name: string
+}
+entity Employee extends Person, Named {}
+type int
+type string
+"""
+
+
+def raw_value(obj, attr_name):
+    return type(obj).__dict__[attr_name].get_value(obj)
+
+
+@pytest.mark.parametrize('slots', [False, True])
+def test_lazy_refs(slots):
+    mm = metamodel_from_str(grammar, lazy_refs=True, slots=slots)
+    model = mm.model_from_str(model_str)
+    person, named, employee = model.entities
+
+    age = person.attrs[0]
+    assert type(raw_value(age, 'type')) is ObjCrossRef
+    assert age.type is model.types[0]
+    assert raw_value(age, 'type') is model.types[0]
+
+    assert type(raw_value(person, 'bases')) is LazyReferenceList
+    assert person.bases == [named]
+    assert type(raw_value(person, 'bases')) is list
+    assert named.bases == []
+
+    # Backward references are resolved during the model construction.
+    assert type(raw_value(employee, 'bases')) is list
+    assert employee.bases == [person, named]
+
+    eager_model = metamodel_from_str(grammar).model_from_str(model_str)
+    assert [a.type.name for e in eager_model.entities for a in e.attrs] == \
+        [a.type.name for e in model.entities for a in e.attrs]
+
+
+@pytest.mark.parametrize('slots', [False, True])
+def test_lazy_refs_unknown_object(slots):
+    mm = metamodel_from_str(grammar, lazy_refs=True, slots=slots)
+    model = mm.model_from_str('entity A {\n  a: int\n  b: string\n}\n'
+                              'type int')
+    attr_a, attr_b = model.entities[0].attrs
+    assert attr_a.type is model.types[0]
+
+    with pytest.raises(TextXSemanticError) as e:
+        attr_b.type
+    assert 'Unknown object "string" of class "Type"' in str(e.value)
+    assert (e.value.line, e.value.col) == (3, 6)
+
+    with pytest.raises(TextXSemanticError) as e:
+        resolve_all(model)
+    assert (e.value.line, e.value.col) == (3, 6)
+
+
+def test_resolve_all():
+    mm = metamodel_from_str(grammar, lazy_refs=True)
+    model = mm.model_from_str(model_str)
+    resolve_all(model)
+    for entity in model.entities:
+        assert type(raw_value(entity, 'bases')) is list
+        for attr in entity.attrs:
+            assert raw_value(attr, 'type') in model.types
+
+
+def test_lazy_refs_processors():
+    """
+    Test that references accessed in processors are resolved.
+    """
+    mm = metamodel_from_str(grammar, lazy_refs=True)
+    type_names = []
+    mm.register_obj_processors(
+        {'Attribute': lambda attr: type_names.append(attr.type.name)})
+    mm.model_from_str(model_str)
+    assert type_names == ['int', 'string']
+
+
+def test_lazy_refs_user_classes():
+    """
+    Test that references of user classes are resolved eagerly.
+    """
+    class Attribute(object):
+        def __init__(self, parent, name, type):
+            self.parent = parent
+            self.name = name
+            self.type = type
+
+    mm = metamodel_from_str(grammar, lazy_refs=True, classes=[Attribute])
+    model = mm.model_from_str(model_str)
+    attr = model.entities[0].attrs[0]
+    assert 'type' not in Attribute.__dict__
+    assert attr.__dict__['type'] is model.types[0]
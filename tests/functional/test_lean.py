@@ -0,0 +1,101 @@
+from __future__ import unicode_literals
+import pickle
+import pytest  # noqa
+from textx import metamodel_from_str, objects_of_type
+from textx.model import object_at
+from textx.exceptions import TextXError
+
+grammar = r"""
+Model: types*=Type;
+Type: Entity | DataType;
+DataType: 'type' name=ID;
+Entity: 'entity' name=ID '{' attrs*=Attribute '}';
+Attribute: name=ID ':' type=[Type];
+"""
+
+model_str = """
+type int
+entity Person {
+    age: int
+    friend: Person
+}
+entity Employee {
+    boss: Person
+}
+"""
+
+
+@pytest.mark.parametrize('slots, direct_construction',
+                         [(False, False), (True, False), (False, True)])
+def test_lean(slots, direct_construction):
+    mm = metamodel_from_str(grammar, lean=True, slots=slots,
+                            direct_construction=direct_construction)
+    parser = mm.parser.clone()
+    model = parser.get_model_from_str(model_str)
+
+    assert parser.parse_tree is None
+    assert parser.input is None
+    assert parser._instances == {}
+    assert parser._objects is None
+    assert not hasattr(model, '_tx_objects')
+    assert not hasattr(model, '_tx_line_index')
+
+    int_type, person, employee = model.types
+    assert person.attrs[0].type is int_type
+    assert employee.attrs[0].type is person
+    assert person._tx_position == 10
+    assert objects_of_type(model, 'Attribute') == \
+        person.attrs + employee.attrs
+
+
+def test_lean_stream():
+    mm = metamodel_from_str(grammar, lean=True)
+    parser = mm.parser.clone()
+    objs = list(parser.get_model_iter_from_str(model_str))
+    assert [obj.name for obj in objs] == ['int', 'Person', 'Employee']
+    assert parser.input is None
+    assert parser._instances == {}
+
+
+@pytest.mark.parametrize('slots, direct_construction',
+                         [(False, False), (True, False), (False, True)])
+def test_no_positions(slots, direct_construction):
+    mm = metamodel_from_str(grammar, positions=False, slots=slots,
+                            direct_construction=direct_construction)
+    model = mm.model_from_str(model_str)
+    person = model.types[1]
+
+    # Classes keep their positions in the grammar.
+    if slots:
+        assert '_tx_position' not in type(person).__slots__
+    else:
+        assert '_tx_position' not in vars(model)
+        assert '_tx_position_end' not in vars(person)
+    assert objects_of_type(model, 'Entity') == model.types[1:]
+    with pytest.raises(TextXError):
+        object_at(model, 10)
+
+
+def test_no_positions_tools_support():
+    mm = metamodel_from_str(grammar, positions=False,
+                            textx_tools_support=True)
+    model = mm.model_from_str(model_str)
+    assert object_at(model, 10) is model.types[1]
+
+
+@pytest.mark.parametrize('params', [{'textx_tools_support': True},
+                                    {'lazy_refs': True, 'slots': True}])
+def test_pickle_protocol_0(params):
+    mm = metamodel_from_str(grammar, **params)
+    model = mm.model_from_str(model_str)
+    if params.get('textx_tools_support'):
+        object_at(model, 0)
+    model = pickle.loads(pickle.dumps(model, 0))
+
+    int_type, person, employee = model.types
+    assert person.attrs[0].type is int_type
+    assert model._tx_line_index.line_col(10) == (3, 1)
+    if params.get('textx_tools_support'):
+        ref = model._pos_crossref_list[0]
+        assert (ref.name, ref.def_pos_start) == ('int', 1)
+        assert object_at(model, 10) is person
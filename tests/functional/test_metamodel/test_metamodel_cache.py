@@ -0,0 +1,170 @@
+from __future__ import unicode_literals
+import pytest  # noqa
+import os
+import shutil
+import textx.metamodel
+from textx import metamodel_from_file
+from textx.const import RULE_ABSTRACT, RULE_COMMON, RULE_MATCH
+
+
+grammar = r"""
+Model:
+    'model' name=ID
+    types*=SimpleType
+    entities+=Entity
+;
+
+Type:
+    SimpleType | Entity
+;
+
+SimpleType:
+    'type' name=ID
+;
+
+Entity:
+    'entity' name=ID '{'
+        attributes*=Attribute
+    '}'
+;
+
+Attribute:
+    name=ID ':' type=[Type] mult=Multiplicity?
+;
+
+Multiplicity:
+    '[' /\d+/ ']'
+;
+
+Comment:
+    /\/\/.*$/
+;
+"""
+
+model_str = """
+model test
+type string
+entity Person {
+    name: string
+    // a comment
+    address: Address [1]
+}
+entity Address {
+    street: string
+}
+"""
+
+
+@pytest.fixture
+def grammar_file(tmpdir):
+    grammar_file = tmpdir.join('entity.tx')
+    grammar_file.write(grammar)
+    return str(grammar_file)
+
+
+def no_grammar_parsing(*args, **kwargs):
+    raise AssertionError('Grammar should not be parsed.')
+
+
+def test_metamodel_cache_restores_linked_metamodel(tmpdir, grammar_file,
+                                                   monkeypatch):
+    cache_dir = str(tmpdir.join('cache'))
+
+    mm = metamodel_from_file(grammar_file, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    monkeypatch.setattr(textx.metamodel, 'language_from_str',
+                        no_grammar_parsing)
+    cached_mm = metamodel_from_file(grammar_file, cache_dir=cache_dir)
+
+    assert cached_mm is not mm
+    assert cached_mm.rootcls is cached_mm['Model']
+    assert cached_mm['Type']._tx_type == RULE_ABSTRACT
+    assert cached_mm['Type']._tx_inh_by == [cached_mm['SimpleType'],
+                                            cached_mm['Entity']]
+    assert cached_mm['Entity']._tx_type == RULE_COMMON
+    assert cached_mm['Multiplicity']._tx_type == RULE_MATCH
+    assert cached_mm['Entity']._tx_peg_rule._tx_class is cached_mm['Entity']
+    attr = cached_mm['Attribute']._tx_attrs['type']
+    assert attr.cls is cached_mm['Type']
+    assert attr.ref and not attr.cont
+    assert list(cached_mm['Model']._tx_attrs) == ['name', 'types',
+                                                  'entities']
+
+    model = cached_mm.model_from_str(model_str)
+    assert model.__class__ is cached_mm['Model']
+    person, address = model.entities
+    assert person.attributes[1].type is address
+    assert person.attributes[1].mult == '[1]'
+    assert person.attributes[1].parent is person
+    assert model._tx_metamodel is cached_mm
+
+
+def test_metamodel_cache_invalidation(tmpdir, grammar_file, monkeypatch):
+    cache_dir = str(tmpdir.join('cache'))
+    metamodel_from_file(grammar_file, cache_dir=cache_dir)
+
+    # Different meta-model parameters
+    mm = metamodel_from_file(grammar_file, cache_dir=cache_dir,
+                             ignore_case=True)
+    assert len(os.listdir(cache_dir)) == 2
+    mm.model_from_str(model_str.replace('entity', 'ENTITY'))
+
+    # Changed grammar
+    with open(grammar_file, 'a') as f:
+        f.write("\nUnused: 'unused';\n")
+    mm = metamodel_from_file(grammar_file, cache_dir=cache_dir)
+    assert 'Unused' in mm
+    assert len(os.listdir(cache_dir)) == 3
+
+    # Nothing changed
+    monkeypatch.setattr(textx.metamodel, 'language_from_str',
+                        no_grammar_parsing)
+    mm = metamodel_from_file(grammar_file, cache_dir=cache_dir)
+    assert 'Unused' in mm
+
+
+def test_metamodel_cache_imports(tmpdir, monkeypatch):
+    import_dir = os.path.join(os.path.dirname(__file__), 'import')
+    shutil.copytree(import_dir, str(tmpdir.join('import')))
+    grammar_file = str(tmpdir.join('import', 'first_diamond.tx'))
+    cache_dir = str(tmpdir.join('cache'))
+
+    metamodel_from_file(grammar_file, cache_dir=cache_dir)
+
+    with monkeypatch.context() as m:
+        m.setattr(textx.metamodel, 'language_from_str', no_grammar_parsing)
+        mm = metamodel_from_file(grammar_file, cache_dir=cache_dir)
+
+    MyDiamondRule = mm['diamond.last.MyDiamondRule']
+    assert MyDiamondRule._tx_fqn == 'diamond.last.MyDiamondRule'
+    model = mm.model_from_str('second 42 11 third 42')
+    assert model.seconds[0].diamond.__class__ is MyDiamondRule
+    assert model.thirds[0].diamond.a == 42
+
+    # Change in the imported grammar must invalidate cache entry.
+    last = tmpdir.join('import', 'diamond', 'last.tx')
+    last.write(last.read().replace('a=INT', 'a=INT b=INT?'))
+    mm = metamodel_from_file(grammar_file, cache_dir=cache_dir)
+    assert 'b' in mm['diamond.last.MyDiamondRule']._tx_attrs
+
+
+def test_metamodel_cache_user_classes(tmpdir, grammar_file, monkeypatch):
+    cache_dir = str(tmpdir.join('cache'))
+
+    class Entity(object):
+        def __init__(self, parent, name, attributes):
+            self.parent = parent
+            self.name = name
+            self.attributes = attributes
+
+    metamodel_from_file(grammar_file, cache_dir=cache_dir, classes=[Entity])
+    monkeypatch.setattr(textx.metamodel, 'language_from_str',
+                        no_grammar_parsing)
+    mm = metamodel_from_file(grammar_file, cache_dir=cache_dir,
+                             classes=[Entity])
+
+    assert mm['Entity'] is Entity
+    model = mm.model_from_str(model_str)
+    assert type(model.entities[0]) is Entity
+    assert model.entities[0].attributes[1].type is model.entities[1]
@@ -0,0 +1,115 @@
+from __future__ import unicode_literals
+import pytest  # noqa
+import os
+import shutil
+import arpeggio
+import textx.compiler
+import textx.metamodel
+from textx import metamodel_from_file
+from textx.compiler import metamodel_compile
+from textx.exceptions import TextXError
+
+
+def import_module(name, file_name):
+    try:
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(name, file_name)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    except ImportError:
+        # Python 2
+        import imp
+        return imp.load_source(name, file_name)
+
+
+def test_compiled_metamodel(tmpdir, monkeypatch):
+    import_dir = os.path.join(os.path.dirname(__file__), 'import')
+    shutil.copytree(import_dir, str(tmpdir.join('import')))
+    grammar_file = str(tmpdir.join('import', 'first_diamond.tx'))
+    module_file = str(tmpdir.join('import', 'first_diamond_metamodel.py'))
+
+    mm = metamodel_from_file(grammar_file)
+    metamodel_compile(mm, module_file)
+
+    def no_grammar_parsing(*args, **kwargs):
+        raise AssertionError('Grammar should not be parsed.')
+    monkeypatch.setattr(textx.metamodel, 'language_from_str',
+                        no_grammar_parsing)
+
+    module = import_module('first_diamond_metamodel', module_file)
+    assert module.GRAMMAR == 'first_diamond.tx'
+    assert sorted(module.GRAMMAR_DIGESTS) == ['diamond/last.tx',
+                                              'diamond/second.tx',
+                                              'diamond/third.tx',
+                                              'first_diamond.tx']
+    compiled_mm = module.metamodel()
+
+    assert compiled_mm is not mm
+    assert sorted(compiled_mm.namespaces) == sorted(mm.namespaces)
+    for cls in mm:
+        compiled_cls = compiled_mm[cls._tx_fqn]
+        assert compiled_cls._tx_type == cls._tx_type
+        assert list(compiled_cls._tx_attrs) == list(cls._tx_attrs)
+
+    model_str = 'second 42 11 third 42'
+    model = mm.model_from_str(model_str)
+    compiled_model = compiled_mm.model_from_str(model_str)
+    assert compiled_mm.rootcls._tx_fqn == mm.rootcls._tx_fqn
+    assert compiled_model.__class__ is compiled_mm['First']
+    assert compiled_model.seconds[0].diamond.__class__.__name__ == \
+        model.seconds[0].diamond.__class__.__name__
+    assert compiled_model.seconds[0].diamond.a == 42
+    assert compiled_model.thirds[0].diamond.a == 42
+
+
+def compile_diamond(tmpdir, out_dir='import'):
+    import_dir = os.path.join(os.path.dirname(__file__), 'import')
+    shutil.copytree(import_dir, str(tmpdir.join('import')))
+    grammar_file = str(tmpdir.join('import', 'first_diamond.tx'))
+    tmpdir.join(out_dir).ensure(dir=True)
+    module_file = str(tmpdir.join(out_dir, 'first_diamond_metamodel.py'))
+    metamodel_compile(metamodel_from_file(grammar_file), module_file)
+    return module_file
+
+
+def test_compiled_metamodel_versions(tmpdir, monkeypatch):
+    module_file = compile_diamond(tmpdir)
+    module = import_module('first_diamond_metamodel', module_file)
+    assert module.VERSIONS == textx.compiler.compiled_versions()
+
+    # Patch releases may be used.
+    versions = dict(module.VERSIONS)
+    assert versions['arpeggio'].count('.') == 1
+    monkeypatch.setattr(arpeggio, '__version__',
+                        versions['arpeggio'] + '.99')
+    import_module('first_diamond_metamodel', module_file)
+
+    versions['arpeggio'] = '0.0'
+    monkeypatch.setattr(textx.compiler, 'compiled_versions',
+                        lambda: versions)
+    with pytest.raises(TextXError) as e:
+        import_module('first_diamond_metamodel', module_file)
+    assert 'arpeggio version' in str(e.value)
+
+
+@pytest.mark.parametrize('out_dir', ['import', 'out'])
+def test_compiled_metamodel_stale_grammar(tmpdir, out_dir):
+    module_file = compile_diamond(tmpdir, out_dir)
+    module = import_module('first_diamond_metamodel', module_file)
+    if out_dir == 'out':
+        assert module.GRAMMAR == '../import/first_diamond.tx'
+        assert '../import/diamond/last.tx' in module.GRAMMAR_DIGESTS
+    assert module.metamodel().file_name == \
+        str(tmpdir.join('import', 'first_diamond.tx'))
+
+    with open(str(tmpdir.join('import', 'diamond', 'last.tx')), 'a') as f:
+        f.write('\n// changed\n')
+    with pytest.raises(TextXError) as e:
+        import_module('first_diamond_metamodel', module_file)
+    assert 'last.tx" has changed' in str(e.value)
+
+    tmpdir.join('import', 'diamond').remove()
+    with pytest.raises(TextXError) as e:
+        import_module('first_diamond_metamodel', module_file)
+    assert 'is not found' in str(e.value)
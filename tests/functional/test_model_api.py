@@ -4,7 +4,9 @@ Model query and navigation API.
 from __future__ import unicode_literals
 import pytest  # noqa
 from textx import metamodel_from_str, children_of_type, parent_of_type, \
-    model_root
+    model_root, objects_of_type, iter_model
+import textx.model
+from textx.model import metamodel as get_metamodel, index_objects
 
 
 grammar = """
@@ -68,3 +70,249 @@ def test_model_root():
 
     t = model.a[0].y
     assert model_root(t) is model
+
+
+def test_children_of_type_root():
+    """
+    Test that the search from the model root finds the objects of the
+    meta-model classes in the order of the containment.
+    """
+    metamodel = metamodel_from_str(grammar)
+    model = metamodel.model_from_str(model_str)
+
+    thirds = children_of_type(metamodel['Third'], model)
+    assert [t.x for t in thirds] == ['one', 'two', 'first', 'second',
+                                     'third']
+    assert children_of_type('First', model) == [model]
+    assert children_of_type('Unknown', model) == []
+
+
+abstract_grammar = """
+Model: shapes*=Shape;
+Shape: Circle | Polygon;
+Polygon: Triangle | Square;
+Circle: 'circle' name=ID;
+Triangle: 'triangle' name=ID;
+Square: 'square' name=ID ('{' inner*=Shape '}')?;
+"""
+
+abstract_model_str = """
+square s1 { triangle t1 circle c1 square s2 }
+circle c2
+triangle t2
+square s3
+"""
+
+
+@pytest.mark.parametrize('direct_construction', [False, True])
+def test_objects_of_type(direct_construction):
+    metamodel = metamodel_from_str(abstract_grammar, object_index=True,
+                                   direct_construction=direct_construction)
+    model = metamodel.model_from_str(abstract_model_str)
+    assert len(model._tx_objects) == 8
+
+    def names(typ, **kwargs):
+        return [o.name for o in objects_of_type(model, typ, **kwargs)]
+
+    assert names('Square') == ['s1', 's2', 's3']
+    assert names(metamodel['Circle']) == ['c1', 'c2']
+    assert names('Polygon') == ['t1', 't2', 's1', 's2', 's3']
+    assert names('Shape') == ['c1', 'c2', 't1', 't2', 's1', 's2', 's3']
+    assert names('Shape', include_subclasses=False) == []
+    assert objects_of_type(model, 'Model') == [model]
+
+    # Without the index the model is traversed.
+    del model._tx_objects
+    assert names('Polygon') == ['t1', 't2', 's1', 's2', 's3']
+    assert names('Square') == ['s1', 's2', 's3']
+
+
+@pytest.mark.parametrize('object_index', [False, True])
+def test_queries_after_model_change(object_index):
+    """
+    Test that the objects removed from the model after the construction are
+    not found.
+    """
+    metamodel = metamodel_from_str(abstract_grammar,
+                                   object_index=object_index)
+    model = metamodel.model_from_str(abstract_model_str)
+    assert hasattr(model, '_tx_objects') == object_index
+
+    def names(objs):
+        return [o.name for o in objs]
+
+    s1 = model.shapes[0]
+    del model.shapes[1]
+    del s1.inner[0]
+    assert names(objects_of_type(model, 'Circle')) == ['c1']
+    assert names(objects_of_type(model, 'Polygon')) == ['t2', 's1', 's2',
+                                                        's3']
+    assert names(children_of_type('Circle', model)) == ['c1']
+    assert names(children_of_type('Triangle', model)) == ['t2']
+
+    # Objects contained in the removed object are not found either.
+    model.shapes.remove(s1)
+    assert names(objects_of_type(model, 'Shape')) == ['t2', 's3']
+    assert names(children_of_type('Shape', model)) == ['t2', 's3']
+
+    # Added objects are found after the index is rebuilt.
+    circle = metamodel['Circle']()
+    circle.name = 'c3'
+    circle.parent = model
+    model.shapes.append(circle)
+    if object_index:
+        index_objects(model)
+    assert names(objects_of_type(model, 'Shape')) == ['c3', 't2', 's3']
+    assert names(children_of_type('Shape', model)) == ['t2', 's3', 'c3']
+
+
+@pytest.mark.parametrize('object_index', [False, True])
+def test_queries_after_processors(object_index):
+    """
+    Test that the objects added by object and model processors are found.
+    """
+    metamodel = metamodel_from_str(abstract_grammar,
+                                   object_index=object_index)
+
+    def new_circle(name, parent):
+        circle = metamodel['Circle']()
+        circle.name = name
+        circle.parent = parent
+        return circle
+
+    def square_processor(square):
+        if square.name == 's2':
+            square.inner.append(new_circle('c3', square))
+
+    def model_processor(model, metamodel):
+        model.shapes.append(new_circle('c4', model))
+
+    metamodel.register_obj_processors({'Square': square_processor})
+    metamodel.register_model_processor(model_processor)
+    model = metamodel.model_from_str(abstract_model_str)
+
+    # Objects without positions in the input are given last by
+    # objects_of_type and in the order of the search by children_of_type.
+    assert [c.name for c in objects_of_type(model, 'Circle')] == \
+        ['c1', 'c2', 'c3', 'c4']
+    assert [c.name for c in children_of_type('Circle', model)] == \
+        ['c1', 'c3', 'c2', 'c4']
+
+
+def test_children_of_type_index(monkeypatch):
+    """
+    Test that the search from the model root uses the index of the model.
+    """
+    metamodel = metamodel_from_str(abstract_grammar, object_index=True)
+    model = metamodel.model_from_str(abstract_model_str)
+
+    def no_traversal(*args, **kwargs):
+        raise AssertionError('Model should not be traversed.')
+    monkeypatch.setattr(textx.model, 'iter_model', no_traversal)
+
+    assert [s.name for s in children_of_type('Polygon', model)] == \
+        ['s1', 't1', 's2', 't2', 's3']
+
+    monkeypatch.undo()
+    assert [s.name for s in children_of_type('Square', model.shapes[0])] \
+        == ['s1', 's2']
+
+
+def test_iter_model():
+    metamodel = metamodel_from_str(abstract_grammar)
+    model = metamodel.model_from_str(abstract_model_str)
+
+    def names(objs):
+        return [getattr(o, 'name', None) for o in objs]
+
+    assert names(iter_model(model)) == [None, 's1', 't1', 'c1', 's2', 'c2',
+                                        't2', 's3']
+    assert names(iter_model(model, order='post')) == ['t1', 'c1', 's2', 's1',
+                                                      'c2', 't2', 's3', None]
+    assert names(iter_model(model, typ='Polygon')) == ['s1', 't1', 's2',
+                                                       't2', 's3']
+    assert names(iter_model(model, typ=metamodel['Square'],
+                            predicate=lambda o: o.name != 's2')) == \
+        ['s1', 's3']
+
+    # Objects contained in s1 are skipped.
+    prune = lambda o: getattr(o, 'name', None) == 's1'  # noqa
+    assert names(iter_model(model, prune=prune)) == [None, 's1', 'c2', 't2',
+                                                     's3']
+    assert names(iter_model(model, order='post', prune=prune)) == \
+        ['s1', 'c2', 't2', 's3', None]
+
+    # Iteration may be stopped early.
+    objs = iter_model(model, typ='Circle')
+    assert next(objs).name == 'c1'
+
+    with pytest.raises(ValueError):
+        next(iter_model(model, order='in'))
+
+
+def test_iter_model_deep():
+    """
+    Test that the depth of the model is not limited by the recursion limit.
+    """
+    metamodel = metamodel_from_str(abstract_grammar)
+    model = metamodel.model_from_str('square s')
+    square = model.shapes[0]
+    depth = 5000
+    for i in range(depth):
+        inner = metamodel['Square']()
+        inner.name = 's{}'.format(i)
+        inner.inner = []
+        square.inner.append(inner)
+        square = inner
+    assert sum(1 for _ in iter_model(model, order='post')) == depth + 2
+
+
+@pytest.mark.parametrize('direct_construction', [False, True])
+def test_model_root_and_parents(direct_construction):
+    metamodel = metamodel_from_str(abstract_grammar,
+                                   direct_construction=direct_construction)
+    model = metamodel.model_from_str(abstract_model_str)
+    s1 = model.shapes[0]
+    t1, c1, s2 = s1.inner
+
+    assert all(obj._tx_model is model for obj in iter_model(model))
+    assert model_root(s2) is model
+    assert get_metamodel(c1) is metamodel
+
+    assert parent_of_type('Square', s2) is s1
+    assert parent_of_type(metamodel['Model'], s2) is model
+    assert parent_of_type('Square', s1) is None
+    # Circles and triangles never contain other objects.
+    assert not metamodel._containers[id(metamodel['Square'])] \
+        & metamodel._class_bits[id(metamodel['Circle'])]
+    assert parent_of_type('Circle', s2) is None
+    # Abstract classes are matched by inheriting classes.
+    assert parent_of_type('Polygon', c1) is s1
+    assert parent_of_type(metamodel['Shape'], s2) is s1
+
+    # Objects not created by the parser are handled by following parents.
+    square = metamodel['Square']()
+    square.parent = s2
+    assert model_root(square) is model
+    assert parent_of_type('Square', square) is s2
+
+
+def test_is_instance():
+    metamodel = metamodel_from_str(abstract_grammar)
+    model = metamodel.model_from_str(abstract_model_str)
+    s1 = model.shapes[0]
+    t1, c1, s2 = s1.inner
+
+    assert metamodel.is_instance(s1, 'Square')
+    assert metamodel.is_instance(s1, 'Polygon')
+    assert metamodel.is_instance(s1, metamodel['Shape'])
+    assert not metamodel.is_instance(s1, 'Circle')
+    assert metamodel.is_instance(c1, 'Shape')
+    assert not metamodel.is_instance(c1, 'Polygon')
+    assert not metamodel.is_instance(model, 'Shape')
+    assert not metamodel.is_instance(s1, 'Unknown')
+    assert not metamodel.is_instance('s1', 'ID')
+
+    assert [s.name for s in children_of_type('Polygon', s1)] == \
+        ['s1', 't1', 's2']
+    assert len(children_of_type('Shape', model)) == 7
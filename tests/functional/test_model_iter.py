@@ -0,0 +1,157 @@
+from __future__ import unicode_literals
+import gc
+import weakref
+import pytest  # noqa
+from textx import metamodel_from_str
+from textx.exceptions import TextXError, TextXSyntaxError, \
+    TextXSemanticError
+
+grammar = r"""
+Model:
+    'model' name=ID
+    entities*=Entity
+    'end'
+;
+
+Entity:
+    'entity' name=ID ('extends' base=[Entity])? '{'
+        attributes*=Attribute
+    '}'
+;
+
+Attribute:
+    name=ID
+;
+"""
+
+model_str = """
+model test
+entity A { x y }
+entity B extends A { }
+entity C extends B { z }
+end
+"""
+
+
+@pytest.mark.parametrize('direct_construction', [False, True])
+def test_model_iter(direct_construction):
+    mm = metamodel_from_str(grammar, direct_construction=direct_construction)
+    model = mm.model_from_str(model_str)
+
+    processed = []
+    mm.register_obj_processors({'Entity': lambda e: processed.append(e.name)})
+
+    entities = []
+    for entity, expected in zip(mm.model_iter_from_str(model_str),
+                                model.entities):
+        assert entity.name == expected.name
+        assert entity._tx_position == expected._tx_position
+        assert entity._tx_position_end == expected._tx_position_end
+        assert [a.name for a in entity.attributes] == \
+            [a.name for a in expected.attributes]
+        assert entity.attributes[0].parent is entity \
+            if entity.attributes else True
+        # Already streamed objects are resolved.
+        if expected.base:
+            assert entity.base is entities[-1]
+        entities.append(entity)
+
+    assert len(entities) == 3
+    assert processed == ['A', 'B', 'C']
+
+    # The root object is constructed from the matches before the
+    # repetition. Streamed objects are not added to it.
+    root = entities[0].parent
+    assert root.name == 'test'
+    assert root.entities == []
+    assert all(e.parent is root for e in entities)
+    assert root._tx_metamodel is mm
+
+
+def test_model_iter_releases_objects():
+    mm = metamodel_from_str(grammar)
+
+    refs = [weakref.ref(entity) for entity in mm.model_iter_from_str(
+        'model test ' + 'entity A {} ' * 10 + 'end')]
+    gc.collect()
+    assert len(refs) == 10
+    assert all(ref() is None for ref in refs)
+
+
+def test_model_iter_references():
+    mm = metamodel_from_str(grammar)
+
+    # Forward references
+    entities = mm.model_iter_from_str("""
+    model test
+    entity B extends A { }
+    entity A { }
+    end
+    """)
+    with pytest.raises(TextXSemanticError) as e:
+        next(entities)
+    assert 'Unknown object "A"' in str(e.value)
+    assert e.value.line == 3
+
+    # References to released objects
+    entities = mm.model_iter_from_str("""
+    model test
+    entity A { }
+    entity B { }
+    entity C extends A { }
+    end
+    """)
+    next(entities)
+    next(entities)
+    gc.collect()
+    with pytest.raises(TextXSemanticError):
+        next(entities)
+
+
+def test_model_iter_syntax_error():
+    mm = metamodel_from_str(grammar)
+    model_str = """
+    model test
+    entity A { }
+    entity B { x
+    end
+    """
+    with pytest.raises(TextXSyntaxError) as e:
+        mm.model_from_str(model_str)
+    line, col = e.value.line, e.value.col
+
+    entities = mm.model_iter_from_str(model_str)
+    assert next(entities).name == 'A'
+    with pytest.raises(TextXSyntaxError) as e:
+        next(entities)
+    assert (e.value.line, e.value.col) == (line, col)
+
+
+def test_model_iter_separator_and_user_classes():
+
+    class Entity(object):
+        def __init__(self, parent, name):
+            self.parent = parent
+            self.name = name
+
+    mm = metamodel_from_str(r"""
+    Model: entities+=Entity[','];
+    Entity: name=ID;
+    """, classes=[Entity])
+
+    entities = list(mm.model_iter_from_str('a, b, c'))
+    assert [e.name for e in entities] == ['a', 'b', 'c']
+    assert type(entities[0]) is Entity
+    assert entities[0].parent is entities[2].parent
+
+    with pytest.raises(TextXSyntaxError):
+        list(mm.model_iter_from_str(''))
+
+
+def test_model_iter_unsupported_grammar():
+    mm = metamodel_from_str(r"""
+    Model: 'model' entities*=Entity name=ID;
+    Entity: 'entity' name=ID;
+    """)
+    with pytest.raises(TextXError):
+        mm.model_iter_from_str('model entity A test')
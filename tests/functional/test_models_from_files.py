@@ -0,0 +1,94 @@
+from __future__ import unicode_literals
+import pytest  # noqa
+import sys
+from textx import metamodel_from_str
+from textx.exceptions import TextXSyntaxError, TextXSemanticError
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7),
+                                reason='requires Python 3.7+')
+
+grammar = r"""
+Model: types*=Type entities*=Entity;
+Type: 'type' name=ID;
+Entity: 'entity' name=ID '{' attrs*=Attribute '}';
+Attribute: name=ID ':' type=[Type];
+"""
+
+
+def count_attrs(model, metamodel):
+    model.attr_count = sum(len(e.attrs) for e in model.entities)
+
+
+def metamodel_factory():
+    mm = metamodel_from_str(grammar)
+    mm.register_model_processor(count_attrs)
+    return mm
+
+
+def write_models(tmpdir):
+    file_names = []
+    for i in range(7):
+        model_file = tmpdir.join('model{}.ent'.format(i))
+        model_file.write('type int\nentity E{0} {{ a: int b{0}: int }}'
+                         .format(i))
+        file_names.append(str(model_file))
+    model_file = tmpdir.join('syntax.ent')
+    model_file.write('type int\nentity S {\n a: int\n')
+    file_names.insert(2, str(model_file))
+    model_file = tmpdir.join('semantic.ent')
+    model_file.write('type int\nentity S { a: string }')
+    file_names.insert(5, str(model_file))
+    return file_names
+
+
+def check_results(mm, file_names, results):
+    assert sorted(r[0] for r in results) == sorted(file_names)
+    for file_name, result in results:
+        if file_name.endswith('syntax.ent'):
+            assert type(result) is TextXSyntaxError
+            assert (result.line, result.col) == (4, 1)
+            assert 'Expected' in str(result)
+        elif file_name.endswith('semantic.ent'):
+            assert type(result) is TextXSemanticError
+            assert 'Unknown object "string"' in str(result)
+        else:
+            assert type(result) is mm['Model']
+            assert result._tx_filename == file_name
+            assert result._tx_metamodel is mm
+            assert result.attr_count == 2
+            entity = result.entities[0]
+            assert type(entity) is mm['Entity']
+            assert entity.parent is result
+            assert entity.attrs[1].type is result.types[0]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3])
+def test_models_from_files_ordered(tmpdir, chunk_size):
+    mm = metamodel_factory()
+    file_names = write_models(tmpdir)
+
+    results = list(mm.models_from_files(file_names, max_workers=2,
+                                        chunk_size=chunk_size,
+                                        max_pending=2))
+    assert [r[0] for r in results] == file_names
+    check_results(mm, file_names, results)
+
+
+def test_models_from_files_unordered(tmpdir):
+    mm = metamodel_factory()
+    file_names = write_models(tmpdir)
+
+    results = list(mm.models_from_files(file_names, max_workers=2,
+                                        ordered=False))
+    check_results(mm, file_names, results)
+
+
+def test_models_from_files_factory(tmpdir):
+    mm = metamodel_factory()
+    file_names = write_models(tmpdir)
+
+    results = list(mm.models_from_files(file_names, max_workers=2,
+                                        chunk_size=2,
+                                        metamodel_factory=metamodel_factory))
+    assert [r[0] for r in results] == file_names
+    check_results(mm, file_names, results)
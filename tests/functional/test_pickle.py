@@ -0,0 +1,76 @@
+from __future__ import unicode_literals
+import pickle
+import pytest  # noqa
+import textx.cache
+from textx import metamodel_from_str, objects_of_type
+
+grammar = r"""
+Model: types*=Type entities*=Entity;
+Type: 'type' name=ID;
+Entity: 'entity' name=ID '{' attrs*=Attribute '}';
+Attribute: name=ID ':' type=[Type];
+"""
+
+model_str = """
+type int
+type string
+entity Person {
+    name: string
+    age: int
+}
+"""
+
+
+class Type(object):
+    def __init__(self, parent, name):
+        self.parent = parent
+        self.name = name
+
+
+def entity_processor(entity):
+    entity.attr_names = [a.name for a in entity.attrs]
+
+
+@pytest.mark.parametrize('slots', [False, True])
+def test_pickle_model(slots):
+    mm = metamodel_from_str(grammar, slots=slots, object_index=True)
+    model = mm.model_from_str(model_str)
+
+    # Meta-model pickled in this process is reused.
+    assert pickle.loads(pickle.dumps(mm)) is mm
+
+    model = pickle.loads(pickle.dumps(model))
+    assert type(model) is mm['Model']
+    assert model._tx_metamodel is mm
+    person = model.entities[0]
+    assert type(person) is mm['Entity']
+    assert person.parent is model
+    assert [a.name for a in person.attrs] == ['name', 'age']
+    assert person.attrs[0].type is model.types[1]
+    assert person._tx_position == 22
+    assert len(model._tx_objects) == 6
+    assert objects_of_type(model, 'Attribute') == person.attrs
+
+
+def test_unpickle_in_new_process():
+    mm = metamodel_from_str(grammar, classes=[Type])
+    mm.register_obj_processors({'Entity': entity_processor})
+    data = pickle.dumps(mm.model_from_str(model_str))
+    other_data = pickle.dumps(mm.model_from_str('type float'))
+
+    # Simulate unpickling in a process where the meta-model is not loaded.
+    textx.cache._pickled_metamodels.clear()
+
+    model = pickle.loads(data)
+    restored_mm = model._tx_metamodel
+    assert restored_mm is not mm
+    assert type(model) is restored_mm['Model']
+    assert type(model) is not mm['Model']
+    assert type(model.types[0]) is Type
+    assert model.entities[0].attrs[1].type is model.types[0]
+
+    # The restored meta-model is reused for the subsequent unpickling and
+    # is fully functional.
+    assert pickle.loads(other_data)._tx_metamodel is restored_mm
+    model = restored_mm.model_from_str(model_str)
+    assert model.entities[0].attr_names == ['name', 'age']
@@ -0,0 +1,93 @@
+from __future__ import unicode_literals
+import pytest  # noqa
+from textx import metamodel_from_str, objects_of_type
+from textx.exceptions import TextXSyntaxError
+
+grammar = r"""
+Model: packages*=Package;
+Package: 'package' name=ID '{' (packages+=Package | types+=Type)* '}';
+Type: Entity | DataType;
+DataType: 'type' name=ID;
+Entity: 'entity' name=ID '{' attrs*=Attribute '}';
+Attribute: name=ID ':' type=[Type];
+"""
+
+model_str = """
+package base {
+    type int
+    entity Named {
+        name: int
+    }
+}
+package app {
+    package model {
+        entity Person {
+            age: int
+            friend: Person
+        }
+    }
+}
+"""
+
+
+@pytest.fixture(params=[False, True])
+def mm(request):
+    return metamodel_from_str(grammar, direct_construction=request.param)
+
+
+def test_include(mm):
+    model = mm.model_from_str(model_str, include=['Entity', 'Attribute'])
+    base, app = model.packages
+
+    # Containers are stubs.
+    assert base.name == ''
+    assert [p.name for p in app.packages] == ['']
+    named = base.types[0]
+    person = app.packages[0].types[0]
+    assert base.types == [named]
+    assert named.name == 'Named'
+    assert named.parent is base
+
+    # References to data types which are not constructed are not assigned.
+    assert [a.name for a in person.attrs] == ['age', 'friend']
+    assert [a.type for a in person.attrs] == [None, None]
+    assert objects_of_type(model, 'DataType') == []
+    assert objects_of_type(model, 'Entity') == [named, person]
+
+
+def test_include_abstract(mm):
+    model = mm.model_from_str(model_str, include=['Type', 'Attribute'])
+    int_type, named = model.packages[0].types
+    person = model.packages[1].packages[0].types[0]
+    assert named.attrs[0].type is int_type
+    assert [a.type for a in person.attrs] == [int_type, person]
+
+
+def test_exclude(mm):
+    model = mm.model_from_str(model_str, exclude=[mm['Attribute']])
+    base, app = model.packages
+    assert base.name == 'base'
+    assert [t.name for t in base.types] == ['int', 'Named']
+    assert base.types[1].attrs == []
+    assert objects_of_type(model, 'Attribute') == []
+
+
+def test_projection_obj_processors(mm):
+    processed = []
+    mm.register_obj_processors({
+        'Package': lambda obj: processed.append(obj.name),
+        'Entity': lambda obj: processed.append(obj.name)})
+    mm.model_from_str(model_str, include=['Entity'])
+    assert processed == ['Named', 'Person']
+
+
+def test_projection_syntax_error(mm):
+    with pytest.raises(TextXSyntaxError):
+        mm.model_from_str('package a { type }', include=['Entity'])
+
+
+def test_projection_errors(mm):
+    with pytest.raises(ValueError):
+        mm.model_from_str(model_str, include=['Entity'], exclude=['Type'])
+    with pytest.raises(KeyError):
+        mm.model_from_str(model_str, include=['Unknown'])
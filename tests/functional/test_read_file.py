@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import codecs
+import pytest  # noqa
+from textx import metamodel_from_str
+from textx.exceptions import TextXSyntaxError
+from textx.model import read_file
+
+grammar = r"""
+Model: entities*=Entity;
+Entity: 'entity' name=ID '{' attrs*=STRING '}';
+"""
+
+model_str = ('﻿entity A {\r\n  "čćž"\r\n}\r\n'
+             'entity B { "ω" }\n')
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'utf-16', 'cp1250'])
+def test_read_file(tmpdir, encoding):
+    content = model_str if encoding != 'cp1250' else model_str[1:]
+    content = content.replace('ω', 'w') if encoding == 'cp1250' else content
+    model_file = tmpdir.join('model.ent')
+    model_file.write_binary(content.encode(encoding))
+
+    with codecs.open(str(model_file), 'r', encoding) as f:
+        expected = f.read()
+    assert read_file(str(model_file), encoding) == expected
+
+
+def test_read_empty_file(tmpdir):
+    model_file = tmpdir.join('model.ent')
+    model_file.write_binary(b'')
+    assert read_file(str(model_file), 'utf-8') == ''
+
+    mm = metamodel_from_str(grammar)
+    assert mm.model_from_file(str(model_file)) == mm.model_from_str('')
+
+
+def test_model_from_file_positions(tmpdir):
+    mm = metamodel_from_str(grammar)
+    model_file = tmpdir.join('model.ent')
+    model_file.write_binary(model_str.replace('﻿', '').encode('utf-8'))
+
+    model = mm.model_from_file(str(model_file))
+    expected = mm.model_from_str(model_str.replace('﻿', ''))
+    assert [(e._tx_position, e._tx_position_end, e.attrs)
+            for e in model.entities] == \
+        [(e._tx_position, e._tx_position_end, e.attrs)
+         for e in expected.entities]
+    assert model.entities[0].attrs == ['čćž']
+    assert model._tx_filename == str(model_file)
+
+    model_file.write_binary(
+        model_str.replace('﻿', '').replace('"ω"', '"ω').encode('utf-8'))
+    with pytest.raises(TextXSyntaxError) as e:
+        mm.model_from_file(str(model_file))
+    assert (e.value.line, e.value.col) == (4, 12)
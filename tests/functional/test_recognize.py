@@ -0,0 +1,95 @@
+from __future__ import unicode_literals
+import pytest  # noqa
+from textx import metamodel_from_str
+from textx.exceptions import TextXSyntaxError, TextXSemanticError
+from textx.scoping import FQN
+
+grammar = r"""
+Model: types*=Type;
+Type: Entity | DataType;
+DataType: 'type' name=ID;
+Entity: 'entity' name=ID ('extends' bases+=[Entity][','])?
+        '{' attrs*=Attribute '}';
+Attribute: name=ID ':' type=[Type];
+"""
+
+model_str = """
+type int
+entity Named {
+    name: string
+}
+entity Person extends Named {
+    age: int
+}
+type string
+"""
+
+
+@pytest.fixture(params=[False, True])
+def mm(request):
+    return metamodel_from_str(grammar, direct_construction=request.param)
+
+
+def test_validate_str(mm):
+    processed = []
+    mm.register_obj_processors({'Entity': processed.append})
+    mm.validate_str(model_str)
+    mm.validate_str(model_str, check_refs=True)
+    assert processed == []
+
+    # Parser state of the direct construction is not changed.
+    model = mm.model_from_str(model_str)
+    assert processed == model.types[1:3]
+
+
+def test_validate_syntax_error(mm):
+    with pytest.raises(TextXSyntaxError) as e:
+        mm.validate_str('type int\nentity Person { age: }')
+    assert (e.value.line, e.value.col) == (2, 22)
+
+
+def test_validate_check_refs(mm):
+    # References are not checked by default.
+    mm.validate_str('entity Person extends Named {}')
+    with pytest.raises(TextXSemanticError) as e:
+        mm.validate_str('type int\nentity Person extends Named {}',
+                        check_refs=True)
+    assert 'Unknown object "Named" of class "Entity"' in str(e.value)
+    assert (e.value.line, e.value.col) == (2, 23)
+
+    # Referenced class must match.
+    with pytest.raises(TextXSemanticError):
+        mm.validate_str('type int entity Person extends int {}',
+                        check_refs=True)
+
+
+def test_validate_check_refs_builtins():
+    mm = metamodel_from_str(grammar)
+    mm.builtins = {'string': mm['DataType']()}
+    mm.validate_str('entity Person { name: string }', check_refs=True)
+
+
+def test_validate_check_refs_scope_providers():
+    mm = metamodel_from_str(
+        grammar.replace('type=[Type]', 'type=[Type|QName]') +
+        "QName: ID ('.' ID)*;")
+    mm.register_scope_providers({'Attribute.type': FQN()})
+    mm.validate_str('entity Person { name: a.string }', check_refs=True)
+
+
+def test_validate_file(mm, tmpdir):
+    model_file = tmpdir.join('model.ent')
+    model_file.write(model_str)
+    mm.validate_file(str(model_file), check_refs=True)
+
+    model_file.write('entity A { a: int }')
+    with pytest.raises(TextXSemanticError):
+        mm.validate_file(str(model_file), check_refs=True)
+
+
+def test_recognize_releases_state(mm):
+    parser = mm.parser.clone()
+    parser.recognize(model_str, check_refs=True)
+    assert parser.parse_tree is None
+    assert parser.input is None
+    assert not parser.reduce_tree
@@ -0,0 +1,86 @@
+from __future__ import unicode_literals
+import pickle
+import pytest  # noqa
+from textx import metamodel_from_str, resolve_all
+
+grammar = r"""
+Model: entities*=Entity types*=Type;
+Type: 'type' name=ID;
+Entity: 'entity' name=ID ('extends' bases+=[Entity][','])?
+        '{' attrs*=Attribute '}';
+Attribute: name=ID ':' type=[Type];
+"""
+
+model_str = """
+entity Named {
+    name: string
+}
+entity Person extends Named {
+    age: int
+    height: int
+}
+entity Employee extends Person, Named {}
+type int
+type string
+"""
+
+
+@pytest.mark.parametrize('slots, direct_construction',
+                         [(False, False), (True, False), (False, True)])
+def test_reverse_refs(slots, direct_construction):
+    mm = metamodel_from_str(grammar, reverse_refs=True, slots=slots,
+                            direct_construction=direct_construction)
+    model = mm.model_from_str(model_str)
+    named, person, employee = model.entities
+    int_type, string_type = model.types
+    refs = model._tx_reverse_refs
+
+    assert len(refs) == 4
+    assert set(id(t) for t in refs) == \
+        set(id(t) for t in [named, person, int_type, string_type])
+    assert employee not in refs
+    assert refs.referrers(employee) == []
+    assert refs.referrers(named) == [(person, 'bases'),
+                                     (employee, 'bases')]
+    assert refs.referrers(person) == [(employee, 'bases')]
+    assert refs.referrers(int_type) == [(person.attrs[0], 'type'),
+                                        (person.attrs[1], 'type')]
+    assert refs.referrers(string_type) == [(named.attrs[0], 'type')]
+
+
+def test_reverse_refs_disabled():
+    model = metamodel_from_str(grammar).model_from_str(model_str)
+    assert not hasattr(model, '_tx_reverse_refs')
+
+
+def test_reverse_refs_builtins():
+    mm = metamodel_from_str(grammar, reverse_refs=True)
+    float_type = mm['Type']()
+    float_type.name = 'float'
+    mm.builtins = {'float': float_type}
+    model = mm.model_from_str('entity A { x: float }')
+    assert model._tx_reverse_refs.referrers(float_type) == \
+        [(model.entities[0].attrs[0], 'type')]
+
+
+def test_reverse_refs_lazy():
+    mm = metamodel_from_str(grammar, reverse_refs=True, lazy_refs=True)
+    model = mm.model_from_str(model_str)
+    int_type = model.types[0]
+    refs = model._tx_reverse_refs
+
+    # Forward references are added when resolved.
+    assert int_type not in refs
+    age = model.entities[1].attrs[0]
+    assert age.type is int_type
+    assert refs.referrers(int_type) == [(age, 'type')]
+    resolve_all(model)
+    assert len(refs.referrers(int_type)) == 2
+
+
+def test_reverse_refs_pickle():
+    mm = metamodel_from_str(grammar, reverse_refs=True)
+    model = pickle.loads(pickle.dumps(mm.model_from_str(model_str)))
+    named, person, employee = model.entities
+    assert model._tx_reverse_refs.referrers(named) == [(person, 'bases'),
+                                                       (employee, 'bases')]
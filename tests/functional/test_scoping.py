@@ -0,0 +1,107 @@
+from __future__ import unicode_literals
+import pytest  # noqa
+from textx import metamodel_from_str
+from textx.exceptions import TextXSemanticError
+from textx.scoping import FQN, PlainName
+
+grammar = r"""
+Model: packages*=Package;
+Package: 'package' name=ID '{' (packages+=Package | types+=Type)* '}';
+Type: Entity | DataType;
+DataType: 'type' name=ID;
+Entity: 'entity' name=ID ('extends' base=[Entity|QName])?
+        '{' attrs*=Attribute '}';
+Attribute: name=ID ':' type=[Type|QName];
+QName: ID ('.' ID)*;
+"""
+
+model_str = """
+package base {
+    type int
+    type string
+    entity Named {
+        name: string
+    }
+}
+package app {
+    type string
+    package model {
+        entity Person extends base.Named {
+            id: base.int
+            address: string
+            boss: Person
+        }
+    }
+    entity Person {
+        name: base.string
+        friend: model.Person
+        other: app.model.Person
+    }
+}
+"""
+
+
+def test_fqn_scope_provider():
+    mm = metamodel_from_str(grammar)
+    mm.register_scope_providers({'*.*': FQN()})
+    model = mm.model_from_str(model_str)
+
+    base, app = model.packages
+    int_type, string_type, named = base.types
+    app_string, app_person = app.types
+    person = app.packages[0].types[0]
+
+    assert person.base is named
+    assert [a.type for a in person.attrs] == [int_type, app_string, person]
+    assert [a.type for a in app_person.attrs] == \
+        [string_type, person, person]
+    assert named.attrs[0].type is string_type
+
+
+def test_scope_provider_for_attribute():
+    mm = metamodel_from_str(grammar)
+    mm.register_scope_providers({'Attribute.type': FQN(),
+                                 'Entity.*': PlainName()})
+    model = mm.model_from_str("""
+        package a {
+            entity E extends E2 {}
+            type int
+            package b {
+                type int
+                entity E2 { x: int y: a.int }
+            }
+        }
+    """)
+    a = model.packages[0]
+    e, a_int = a.types
+    b_int, e2 = a.packages[0].types
+    assert e.base is e2
+    assert [attr.type for attr in e2.attrs] == [b_int, a_int]
+
+
+@pytest.mark.parametrize('lazy_refs', [False, True])
+def test_scope_provider_unknown_object(lazy_refs):
+    mm = metamodel_from_str(grammar, lazy_refs=lazy_refs)
+    mm.register_scope_providers({'*.*': FQN()})
+    with pytest.raises(TextXSemanticError) as e:
+        model = mm.model_from_str("""
+            package a {
+                type int
+                entity E { x: b.int }
+            }
+        """)
+        model.packages[0].types[1].attrs[0].type
+    assert 'Unknown object "b.int" of class "Type"' in str(e.value)
+    assert (e.value.line, e.value.col) == (4, 31)
+
+
+def test_scope_provider_builtins():
+    mm = metamodel_from_str(grammar)
+    mm.register_scope_providers({'*.*': FQN()})
+    int_type = mm['DataType']()
+    int_type.name = 'int'
+    mm.builtins = {'int': int_type}
+    model = mm.model_from_str("""
+        package a { entity E { x: int } }
+    """)
+    assert model.packages[0].types[0].attrs[0].type is int_type
@@ -0,0 +1,109 @@
+from __future__ import unicode_literals
+import pytest  # noqa
+import os
+from textx import metamodel_from_str, metamodel_from_file
+
+grammar = r"""
+Model:
+    'model' name=ID
+    types*=SimpleType
+    entities+=Entity
+;
+
+Type:
+    SimpleType | Entity
+;
+
+SimpleType:
+    'type' name=ID
+;
+
+Entity:
+    'entity' name=ID '{'
+        attributes*=Attribute
+    '}'
+;
+
+Attribute:
+    name=ID ':' type=[Type] many?='*'
+;
+"""
+
+model_str = """
+model test
+type string
+entity Person {
+    name: string
+    addresses: Address*
+}
+entity Address {
+    street: string
+}
+"""
+
+
+def test_slots():
+    mm = metamodel_from_str(grammar, slots=True)
+
+    Attribute = mm['Attribute']
+    assert Attribute.__slots__ == ['parent', '_tx_position',
+                                   '_tx_position_end', '_tx_model',
+                                   '__weakref__', 'name', 'type', 'many']
+    assert mm['Model'].__slots__[-8:] == ['_tx_filename', '_tx_metamodel',
+                                          '_pos_crossref_list',
+                                          '_pos_rule_dict',
+                                          '_tx_reverse_refs', '_tx_objects',
+                                          '_tx_position_index',
+                                          '_tx_line_index']
+    assert not hasattr(mm['Type'], '__slots__')
+
+    # Meta-model is linked to the new classes.
+    assert mm.rootcls is mm['Model']
+    assert mm['Type']._tx_inh_by == [mm['SimpleType'], mm['Entity']]
+    assert mm['Entity']._tx_attrs['attributes'].cls is Attribute
+    assert mm['Entity']._tx_peg_rule._tx_class is mm['Entity']
+
+    # Class attributes are still available.
+    assert Attribute._tx_metamodel is mm
+    assert Attribute._tx_position > mm['Entity']._tx_position
+
+    model = mm.model_from_str(model_str)
+    assert type(model) is mm['Model']
+    assert model._tx_metamodel is mm
+    person, address = model.entities
+    assert not hasattr(person, '__dict__')
+    assert type(person) is mm['Entity']
+    assert person.parent is model
+    assert person._tx_position == model_str.index('entity Person')
+    assert person.attributes[0].type is model.types[0]
+    assert person.attributes[1].type is address
+    assert person.attributes[1].many is True
+
+    # Only attributes defined by the grammar can be set.
+    person.name = 'Human'
+    with pytest.raises(AttributeError):
+        person.age = 42
+
+
+def test_slots_imports_and_user_classes():
+    grammar_file = os.path.join(os.path.dirname(__file__), 'test_metamodel',
+                                'import', 'first_diamond.tx')
+
+    class MyDiamondRule(object):
+        def __init__(self, parent, a):
+            self.parent = parent
+            self.a = a
+
+    mm = metamodel_from_file(grammar_file, slots=True)
+    mm_user = metamodel_from_file(grammar_file, slots=True,
+                                  classes=[MyDiamondRule])
+
+    model = mm.model_from_str('second 42 11 third 42')
+    assert '__slots__' in mm['diamond.last.MyDiamondRule'].__dict__
+    assert not hasattr(model.seconds[0].diamond, '__dict__')
+    assert model.thirds[0].diamond.a == 42
+
+    model = mm_user.model_from_str('second 42 11 third 42')
+    assert mm_user['diamond.last.MyDiamondRule'] is MyDiamondRule
+    assert model.thirds[0].diamond.a == 42
+    assert model.thirds[0].diamond.parent is model.thirds[0]
@@ -1,6 +1,7 @@
 from __future__ import unicode_literals
 import pytest  # noqa
 import os
+from arpeggio import ParserPython, EOF
 from textx import metamodel_from_str
 
 
@@ -38,3 +39,24 @@ def test_special_model_attributes():
     assert mm["Root"]._tx_position_end == 41
     assert mm["MyObj"]._tx_position == 46
     assert mm["MyObj"]._tx_position_end == 74
+
+
+def test_line_index():
+    mm = metamodel_from_str(metamodel_str)
+    model_str = '1,\r\n 22 ,\n\n  333\n'
+    model = mm.model_from_str(model_str)
+    line_index = model._tx_line_index
+
+    # The same conversion as the parser's.
+    arpeggio_parser = ParserPython(lambda: EOF)
+    arpeggio_parser.input = model_str
+    arpeggio_parser.line_ends = []
+    positions = list(range(len(model_str) + 1))
+    expected = [arpeggio_parser.pos_to_linecol(p) for p in positions]
+    assert [line_index.line_col(p) for p in positions] == expected
+    assert line_index.line_cols(positions) == expected
+    assert line_index.line_cols(reversed(positions)) == expected[::-1]
+
+    assert line_index.line_col(model.objs[2]._tx_position) == (4, 3)
+    assert line_index.line_cols([o._tx_position for o in model.objs]) == \
+        [(1, 1), (2, 2), (4, 3)]
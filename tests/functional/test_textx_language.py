@@ -683,6 +683,34 @@ def test_abstract_rule_and_object_reference():
     assert model.ref.__class__.__name__ == "RuleE"
 
 
+def test_abstract_rule_reference_precedence():
+    """
+    Test that objects with the same name are resolved by a reference to an
+    abstract rule in the depth-first order of its alternatives.
+    """
+    grammar = """
+    Model: rules*=RuleA 'refs' a*=[RuleA] ';' b*=[Rule1] ';' c*=[Rule2];
+    RuleA: Rule1|Rule2|RuleI;
+    Rule1: RuleI|RuleE;
+    Rule2: 'r2' name=ID;
+    RuleI: 'rI' name=ID;
+    RuleE: 'rE' name=ID;
+    """
+    meta = metamodel_from_str(grammar)
+    assert [c.__name__ for c in meta._ref_classes[id(meta['RuleA'])]] == \
+        ['RuleI', 'RuleE', 'Rule2']
+
+    model = meta.model_from_str('r2 a rE a rI b r2 c rE c '
+                                'refs a b c; a; a c')
+
+    def refs(objs):
+        return [(o.__class__.__name__, o.name) for o in objs]
+
+    assert refs(model.a) == [('RuleE', 'a'), ('RuleI', 'b'), ('RuleE', 'c')]
+    assert refs(model.b) == [('RuleE', 'a')]
+    assert refs(model.c) == [('Rule2', 'a'), ('Rule2', 'c')]
+
+
 def test_repeat_rule_ref():
     grammar = """
     Rule: ID*;
@@ -871,3 +899,98 @@ def test_syntactic_predicate_and():
     assert model.elements[1].__class__.__name__ == 'A'
     assert model.elements[2].__class__.__name__ == 'AbeforeB'
     assert model.elements[3].__class__.__name__ == 'B'
+
+
+def test_reference_list_order():
+    """
+    Test that references resolved during the model construction and forward
+    references resolved afterwards keep their order in list attributes.
+    """
+    grammar = """
+    Model: items*=Item;
+    Item: Ref | Value;
+    Ref: 'ref' name=ID ('->' targets+=[Ref][','])?;
+    Value: 'value' name=ID ('->' targets+=[Item][','])?;
+    """
+    meta = metamodel_from_str(grammar)
+    model = meta.model_from_str("""
+        ref a -> b, a
+        ref b -> c, a, b
+        ref c
+        value d -> a, e, c, a, d, b
+        value e
+    """)
+    assert [[t.name for t in i.targets] for i in model.items] == \
+        [['b', 'a'], ['c', 'a', 'b'], [], ['a', 'e', 'c', 'a', 'd', 'b'],
+         []]
+
+
+@pytest.mark.parametrize('direct_construction', [False, True])
+def test_builtins_found_by_name(direct_construction):
+    """
+    Test that built-in objects are found by their names for references to
+    any class, even if the built-in object is of another meta-model class.
+    """
+    grammar = """
+    Model: types*=Type attrs*=Attribute;
+    Type: Entity | Simple;
+    Entity: 'entity' name=ID;
+    Simple: 'simple' name=ID;
+    Attribute: name=ID ':' type=[Type] ('in' entity=[Entity])?;
+    """
+    meta = metamodel_from_str(grammar,
+                              direct_construction=direct_construction)
+    integer = meta['Simple']()
+    integer.name = 'integer'
+    meta.builtins = {'integer': integer}
+
+    model = meta.model_from_str('a: integer in integer')
+    assert model.attrs[0].type is integer
+    assert model.attrs[0].entity is integer
+    meta.validate_str('a: integer in integer', check_refs=True)
+
+
+@pytest.mark.parametrize('params', [{}, {'direct_construction': True},
+                                    {'textx_tools_support': True},
+                                    {'lazy_refs': True},
+                                    {'lazy_refs': True, 'slots': True},
+                                    {'reverse_refs': True}])
+def test_reference_to_redefined_name(params):
+    """
+    Test that references to a name defined more than once are resolved to
+    the last definition in every construction mode.
+    """
+    grammar = """
+    Model: types*=Type;
+    Type: Entity | DataType;
+    DataType: 'type' name=ID;
+    Entity: 'entity' name=ID '{' attrs*=Attribute '}';
+    Attribute: name=ID ':' type=[Type] (',' others+=[Type][','])?;
+    """
+    meta = metamodel_from_str(grammar, **params)
+    model = meta.model_from_str("""
+        type int
+        entity A {
+            a: int
+            b: int, int, A
+        }
+        type int
+        entity B {
+            c: int
+        }
+        type A
+    """)
+    int1, a, int2, b, a_type = model.types
+    attr_a, attr_b = a.attrs
+    assert attr_a.type is int2
+    assert attr_b.type is int2
+    assert attr_b.others == [int2, a]
+    assert b.attrs[0].type is int2
+
+    if params.get('reverse_refs'):
+        reverse_refs = model._tx_reverse_refs
+        assert int1 not in reverse_refs
+        referrers = sorted(reverse_refs.referrers(int2),
+                           key=lambda r: (r[0]._tx_position, r[1]))
+        assert referrers == [(attr_a, 'type'), (attr_b, 'others'),
+                             (attr_b, 'type'), (b.attrs[0], 'type')]
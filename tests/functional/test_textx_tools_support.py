@@ -1,5 +1,6 @@
-# import pytest  # noqa
-from textx import metamodel_from_str
+import pytest  # noqa
+from textx import metamodel_from_str, TextXError
+from textx.model import object_at, objects_in_range, reference_at
 
 grammar = """
 Model:
@@ -59,3 +60,45 @@ def test_textx_tools_support():
     assert rules_len > 0
     assert rules_keys[0][0] > \
         rules_keys[rules_len-1][0]
+
+
+@pytest.mark.parametrize('textx_tools_support', [False, True])
+def test_position_queries(textx_tools_support):
+    mm = metamodel_from_str(grammar, textx_tools_support=textx_tools_support)
+    model = mm.model_from_str(modelstr)
+    str_type, int_type = model.types
+    point, person = model.entities
+    x, y = point.properties
+
+    assert object_at(model, modelstr.index('STR')) is str_type
+    assert object_at(model, modelstr.index('x')) is x
+    assert object_at(model, modelstr.index('{')) is point
+    assert object_at(model, x._tx_position_end) is point
+    assert object_at(model, model._tx_position) is str_type
+    assert object_at(model, str_type._tx_position_end) is model
+    assert object_at(model, 0) is None
+    assert object_at(model, len(modelstr)) is None
+
+    assert objects_in_range(model, modelstr.index('x'),
+                            modelstr.index('}')) == [model, point, x, y]
+    assert objects_in_range(model, point._tx_position,
+                            person._tx_position) == [model, point, x, y]
+    assert objects_in_range(model, 0, model._tx_position + 1) == \
+        [model, str_type]
+    assert objects_in_range(model, 0, model._tx_position) == []
+
+    # The index is built once.
+    index = model._tx_position_index
+    object_at(model, 0)
+    assert model._tx_position_index is index
+
+    pos = modelstr.index('INT age')
+    if textx_tools_support:
+        ref = reference_at(model, pos + 2)
+        assert ref.name == 'INT'
+        assert ref.def_pos_start == int_type._tx_position
+        assert reference_at(model, pos + 3) is None
+        assert reference_at(model, 0) is None
+    else:
+        with pytest.raises(TextXError):
+            reference_at(model, pos)
@@ -6,3 +6,12 @@ python test_memory_nomemoization.py >> reports/${1}_memory_report_nomemoization.
 
 python --version > reports/${1}_memory_report_memoization.txt 2>&1 
 python test_memory_memoization.py >> reports/${1}_memory_report_memoization.txt
+
+python --version > reports/${1}_memory_report_direct_construction.txt 2>&1 
+python test_memory_direct_construction.py >> reports/${1}_memory_report_direct_construction.txt
+
+python --version > reports/${1}_memory_report_slots.txt 2>&1 
+python test_memory_slots.py >> reports/${1}_memory_report_slots.txt
+
+python --version > reports/${1}_memory_report_model_iter.txt 2>&1 
+python test_memory_model_iter.py >> reports/${1}_memory_report_model_iter.txt
@@ -1,5 +1,12 @@
 #!/bin/bash
+# Usage: run_speed.sh <report prefix> [git revision to compare with]
 mkdir -p reports
 python --version > reports/${1}_speed_report.txt 2>&1
 python test_speed.py >> reports/${1}_speed_report.txt
 
+
+python --version > reports/${1}_objgraph_speed_report.txt 2>&1
+python test_objgraph_speed.py ${2} >> reports/${1}_objgraph_speed_report.txt
+
+python --version > reports/${1}_resolving_speed_report.txt 2>&1
+python test_resolving_speed.py >> reports/${1}_resolving_speed_report.txt
@@ -0,0 +1,28 @@
+from memory_profiler import profile
+from textx import metamodel_from_str
+
+grammar = r"""
+Model: 'model' name=ID entities*=Entity 'end';
+Entity: 'entity' name=ID ('extends' base=[Entity])? '{' attrs*=ID '}';
+"""
+
+model_str = 'model test\n' + \
+    ''.join('entity E{} {{ a b c }}\n'.format(i) for i in range(20000)) + \
+    'end\n'
+
+
+@profile
+def model_iter():
+    mm = metamodel_from_str(grammar)
+
+    # Whole model
+    model = mm.model_from_str(model_str)
+    del model
+
+    # Streaming
+    for entity in mm.model_iter_from_str(model_str):
+        pass
+
+
+if __name__ == '__main__':
+    model_iter()
@@ -0,0 +1,21 @@
+from os.path import dirname, join
+from memory_profiler import profile
+from textx import metamodel_from_file
+
+
+@profile
+def slots():
+    mm = metamodel_from_file('rhapsody.tx', slots=True)
+
+    # Small file
+    this_folder = dirname(__file__)
+    model = mm.model_from_file(join(this_folder,
+                                    'test_inputs', 'LightSwitch.rpy'))
+
+    # Large file
+    model2 = mm.model_from_file(join(this_folder,
+                                     'test_inputs', 'LightSwitchDouble.rpy'))
+
+
+if __name__ == '__main__':
+    slots()
@@ -0,0 +1,183 @@
+#-*- coding: utf-8 -*-
+#######################################################################
+# Testing speed of the model construction. For each input the time of
+# model_from_str (parsing and model construction) is measured for each
+# construction mode: by the walker over the parse tree (default), in the
+# direct construction mode and for a part of the model (include argument).
+#
+# Only the public API is used so the same measurements may be done with
+# another textX version. If a git revision is given, e.g.:
+#
+#     python test_objgraph_speed.py <revision>
+#
+# textX of that revision (e.g. before the walker was changed) is measured in
+# a separate process and the times are reported side by side. Options not
+# supported by a textX version are reported as such.
+#######################################################################
+from __future__ import print_function, unicode_literals
+
+import codecs
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from os.path import dirname, join
+from textx import metamodel_from_file, metamodel_from_str
+
+
+def best_time(func, repeat):
+    times = []
+    for i in range(repeat):
+        t_start = time.time()
+        func()
+        times.append(time.time() - t_start)
+    return min(times)
+
+
+def measure(create_metamodel, model_str, configs, repeat=5):
+    """
+    Returns a list of (name, best time of model_from_str or None if not
+    supported) for the given configurations which are (name, meta-model
+    params, model_from_str params).
+    """
+    times = []
+    for name, mm_params, model_params in configs:
+        try:
+            mm = create_metamodel(**mm_params)
+            model_time = best_time(
+                lambda: mm.model_from_str(model_str, **model_params), repeat)
+        except (TypeError, RuntimeError):
+            # Option not supported by this textX version or recursion limit
+            # reached.
+            model_time = None
+        times.append((name, model_time))
+    return times
+
+
+CONFIGS = [
+    ('Parse tree walker', {}, {}),
+    ('Direct construction', {'direct_construction': True}, {}),
+]
+
+
+def rhapsody(file_name):
+    file_name = join(dirname(__file__), 'test_inputs', file_name)
+    with codecs.open(file_name, 'r', 'utf-8') as f:
+        model_str = f.read()
+
+    def create_metamodel(**kwargs):
+        return metamodel_from_file(join(dirname(__file__), 'rhapsody.tx'),
+                                   **kwargs)
+
+    return measure(create_metamodel, model_str, CONFIGS)
+
+
+def deep(depth):
+    # Parser is recursive.
+    sys.setrecursionlimit(depth * 20)
+    model_str = ''.join('(n{} '.format(i) for i in range(depth)) + \
+        ')' * depth
+
+    def create_metamodel(**kwargs):
+        return metamodel_from_str(r"""
+            Model: node=Node;
+            Node: '(' name=ID children*=Node ')';
+        """, **kwargs)
+
+    return measure(create_metamodel, model_str, CONFIGS)
+
+
+def entities(count, attrs):
+    model_str = ' '.join(
+        'entity e{} {{ {} }}'.format(i, ' '.join(
+            'a{} : e{} = "x"'.format(j, (i + j) % count)
+            for j in range(attrs)))
+        for i in range(count))
+
+    def create_metamodel(**kwargs):
+        return metamodel_from_str(r"""
+            Model: entities*=Entity;
+            Entity: 'entity' name=ID '{' attrs*=Attribute '}';
+            Attribute: name=ID ':' type=[Entity] ('=' default=STRING)?;
+        """, **kwargs)
+
+    return measure(create_metamodel, model_str,
+                   CONFIGS + [('Only entities', {}, {'include': ['Entity']})])
+
+
+BENCHMARKS = [
+    ('Small file. File: LightSwitch.rpy',
+     lambda: rhapsody('LightSwitch.rpy')),
+    ('Large file. File: LightSwitchDouble.rpy',
+     lambda: rhapsody('LightSwitchDouble.rpy')),
+    ('Deeply nested model. Depth: 5000', lambda: deep(5000)),
+    ('Entities: 1000, attributes per entity: 20',
+     lambda: entities(1000, 20)),
+]
+
+
+def run_all():
+    return [(message, benchmark()) for message, benchmark in BENCHMARKS]
+
+
+def run_baseline(revision):
+    """
+    Runs the benchmarks in a new process with textX of the given git
+    revision and returns the results.
+    """
+    root = dirname(dirname(dirname(os.path.abspath(__file__))))
+    archive = subprocess.check_output(['git', 'archive', revision, 'textx'],
+                                      cwd=root)
+    textx_dir = tempfile.mkdtemp()
+    try:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(textx_dir)
+        env = dict(os.environ, PYTHONPATH=textx_dir)
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), '--json'],
+            cwd=textx_dir, env=env)
+    finally:
+        shutil.rmtree(textx_dir)
+    return json.loads(output.decode('utf-8'))
+
+
+def format_time(model_time):
+    if model_time is None:
+        return '{:>13}'.format('not supported')
+    return '{:9.3f} sec'.format(model_time)
+
+
+def report(results, baseline=None, revision=None):
+    if baseline is not None:
+        print('{:<28} {:>13} {:>13}'.format('', 'current', revision[:13]))
+    for idx, (message, times) in enumerate(results):
+        print(message)
+        for name, model_time in times:
+            line = '  {:<26} {}'.format(name, format_time(model_time))
+            if baseline is not None:
+                base_time = dict(baseline[idx][1]).get(name)
+                line += ' {}'.format(format_time(base_time))
+                if model_time and base_time:
+                    line += ' ({:.2f}x)'.format(base_time / model_time)
+            print(line)
+        print()
+
+
+def main(args):
+    if args == ['--json']:
+        print(json.dumps(run_all()))
+        return
+    results = run_all()
+    if args:
+        report(results, run_baseline(args[0]), args[0])
+    else:
+        report(results)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,120 @@
+#-*- coding: utf-8 -*-
+#######################################################################
+# Testing speed of reference resolving for references to an abstract rule
+# with a wide and deep hierarchy of descendants and for references resolved
+# by the FQN scope provider in nested scopes. The input is parsed once and
+# only the transformation of the parse tree to the object graph (including
+# reference resolving) is measured.
+#######################################################################
+from __future__ import print_function, unicode_literals
+
+import time
+from textx import metamodel_from_str
+from textx.model import parse_tree_to_objgraph
+from textx.scoping import FQN
+
+
+def hierarchy_grammar(width, depth):
+    """
+    Returns a grammar where abstract rule `Base` has `width` alternatives
+    on each of `depth` levels. Common rules are on the last level.
+    """
+    rules = []
+    level = ['Base']
+    for d in range(depth):
+        next_level = []
+        for name in level:
+            alternatives = ['{}_{}'.format(name, i) for i in range(width)]
+            rules.append('{}: {};'.format(name, ' | '.join(alternatives)))
+            next_level.extend(alternatives)
+        level = next_level
+    for i, name in enumerate(level):
+        rules.append("{}: 'o{}' name=ID;".format(name, i))
+
+    grammar = """
+    Model: objects*=Base 'refs' refs*=[Base];
+    {}
+    """.format('\n'.join(rules))
+    return grammar, len(level)
+
+
+def timeit(width, depth, objects, refs, repeat=10):
+    grammar, classes = hierarchy_grammar(width, depth)
+    print('Width: {}, depth: {}, common classes: {}, objects: {}, refs: {}'
+          .format(width, depth, classes, objects, refs))
+
+    mm = metamodel_from_str(grammar)
+    parser = mm.parser
+    model = ' '.join('o{} n{}'.format(i % classes, i) for i in range(objects))
+    # Reference objects of the last classes in the hierarchy.
+    model += ' refs ' + ' '.join('n{}'.format(objects - 1 - i % classes)
+                                 for i in range(refs))
+    parser.parse(model)
+    parse_tree = parser.parse_tree[0]
+
+    times = []
+    for i in range(repeat):
+        parser._instances = {}
+        parser._ref_index = {}
+        parser._shadowed = set()
+        parser._objects = None
+        t_start = time.time()
+        parse_tree_to_objgraph(parser, parse_tree)
+        times.append(time.time() - t_start)
+
+    print('Best time: {:.3f}'.format(min(times)), 'sec\n')
+
+
+def timeit_fqn(depth, types, refs, repeat=10):
+    print('FQN. Package depth: {}, types per package: {}, refs: {}'
+          .format(depth, types, refs))
+
+    mm = metamodel_from_str(r"""
+        Model: package=Package;
+        Package: 'package' name=ID '{' types*=Type packages*=Package
+                 refs*=Ref '}';
+        Type: 'type' name=ID;
+        Ref: 'ref' type=[Type|QName];
+        QName: ID ('.' ID)*;
+    """)
+    mm.register_scope_providers({'*.*': FQN()})
+    parser = mm.parser
+
+    # Nested packages. References in the innermost package reference types
+    # of all enclosing packages by plain and qualified names.
+    model = ''
+    for d in range(depth):
+        model += 'package p{} {{ {} '.format(
+            d, ' '.join('type t{}_{}'.format(d, i) for i in range(types)))
+    for i in range(refs):
+        name = 't{}_{}'.format(i % depth, i % types)
+        if i % 2:
+            name = 'p{}.{}'.format(i % depth, name)
+        model += 'ref {} '.format(name)
+    model += '} ' * depth
+    parser.parse(model)
+    parse_tree = parser.parse_tree[0]
+
+    times = []
+    for i in range(repeat):
+        parser._instances = {}
+        parser._ref_index = {}
+        parser._shadowed = set()
+        parser._objects = None
+        t_start = time.time()
+        parse_tree_to_objgraph(parser, parse_tree)
+        times.append(time.time() - t_start)
+
+    print('Best time: {:.3f}'.format(min(times)), 'sec\n')
+
+
+def main():
+    timeit(4, 1, 1000, 10000)
+    timeit(4, 3, 1000, 10000)
+    timeit(8, 3, 1000, 10000)
+    timeit_fqn(10, 100, 10000)
+    timeit_fqn(10, 100, 20000)
+
+
+if __name__ == '__main__':
+    main()
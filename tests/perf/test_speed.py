@@ -53,5 +53,14 @@ def main():
                '{}. Large file, with memoization.'.format(i + 1),
                memoization=True)
 
+    print('\n*** Direct construction\n')
+    for i in range(3):
+        timeit(file_name_small,
+               '{}. Small file, direct construction.'.format(i + 1),
+               direct_construction=True)
+        timeit(file_name_large,
+               '{}. Large file, direct construction.'.format(i + 1),
+               direct_construction=True)
+
 if __name__ == '__main__':
     main()
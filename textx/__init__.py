@@ -1,6 +1,13 @@
 from textx.metamodel import metamodel_from_file, metamodel_from_str
-from textx.model import children_of_type, parent_of_type, model_root
+from textx.model import children_of_type, parent_of_type, model_root, \
+    resolve_all, objects_of_type, iter_model
 from textx.exceptions import TextXError, TextXSyntaxError, \
     TextXSemanticError
 from textx.langapi import get_language, iter_languages
 from textx.pyecore import is_pyecore_enabled, enable_pyecore_support
+
+__all__ = ['metamodel_from_file', 'metamodel_from_str', 'children_of_type',
+           'parent_of_type', 'model_root', 'resolve_all', 'objects_of_type',
+           'iter_model', 'TextXError', 'TextXSyntaxError',
+           'TextXSemanticError', 'get_language', 'iter_languages',
+           'is_pyecore_enabled', 'enable_pyecore_support']
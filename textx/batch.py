@@ -0,0 +1,211 @@
+#######################################################################
+# Name: batch.py
+# Purpose: Parsing of many model files in a pool of worker processes.
+# Author: Igor R. Dejanovic <igor DOT dejanovic AT gmail DOT com>
+# Copyright:
+#   (c) 2017 Igor R. Dejanovic <igor DOT dejanovic AT gmail DOT com>
+# License: MIT License
+#######################################################################
+from __future__ import absolute_import
+import os
+import pickle
+from io import BytesIO
+from itertools import islice
+from textx.exceptions import TextXError
+
+__all__ = ['models_from_files']
+
+
+# The meta-model of the worker process. See _init_worker.
+_worker_metamodel = None
+
+
+class ModelPickler(pickle.Pickler):
+    """
+    Pickler that stores meta-model classes, the meta-model, built-in
+    objects and PEG rules of the given meta-model by reference. Used for
+    transferring models and errors between processes which use the same
+    meta-model. See ModelUnpickler.
+    """
+    def __init__(self, file, metamodel):
+        pickle.Pickler.__init__(self, file, pickle.HIGHEST_PROTOCOL)
+        self._refs = _metamodel_refs(metamodel)
+
+    def persistent_id(self, obj):
+        return self._refs.get(id(obj))
+
+
+class ModelUnpickler(pickle.Unpickler):
+    """
+    Unpickler that resolves references stored by the ModelPickler using
+    the given meta-model.
+    """
+    def __init__(self, file, metamodel):
+        pickle.Unpickler.__init__(self, file)
+        self._objs = {ref: obj for obj, ref
+                      in _metamodel_objs(metamodel)}
+
+    def persistent_load(self, pid):
+        try:
+            return self._objs[pid]
+        except KeyError:
+            raise pickle.UnpicklingError('Unknown reference {}'.format(pid))
+
+
+def models_from_files(metamodel, file_names, encoding='utf-8',
+                      max_workers=None, chunk_size=1, max_pending=None,
+                      ordered=True, metamodel_factory=None):
+    """
+    Parses the given model files in a pool of worker processes using
+    `model_from_file` of the worker meta-model. Returns an iterator of
+    (file_name, result) tuples where the result is the model or the
+    TextXError (i.e. TextXSyntaxError or TextXSemanticError) raised while
+    parsing the file. Other errors are raised.
+
+    Models are transferred to this process and are instances of the classes
+    of the given meta-model. Requires Python 3.7+.
+
+    Args:
+        metamodel(TextXMetaModel): The meta-model of the models.
+        file_names(iterable): Model file names.
+        encoding(str): The encoding of model files.
+        max_workers(int): The number of worker processes. Default is the
+            number of CPUs.
+        chunk_size(int): The number of files parsed by a single task.
+            Bigger chunks lower the overhead for many small files.
+        max_pending(int): Maximal number of tasks submitted to the pool
+            or completed but not yet returned. Default is two tasks per
+            worker.
+        ordered(bool): If True, results are returned in the order of the
+            given file names. Otherwise, in the order of completion.
+        metamodel_factory(callable): A picklable callable (e.g. a module
+            level function) without arguments which returns the meta-model
+            in the worker processes. If not given, the meta-model is
+            serialized together with its user classes, built-ins, match
+            filters and processors and restored in each worker, which
+            requires all of them to be picklable.
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, \
+        FIRST_COMPLETED
+
+    file_names = list(file_names)
+    chunks = [file_names[i:i + chunk_size]
+              for i in range(0, len(file_names), chunk_size)]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * max_workers
+
+    state = None if metamodel_factory else _metamodel_state(metamodel)
+
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                             initargs=(metamodel_factory, state)) \
+            as executor:
+
+        tasks = iter(enumerate(chunks))
+        pending = {}
+        # Results of completed chunks by chunk index in the ordered mode.
+        completed = {}
+        next_chunk = 0
+
+        while True:
+            free = max_pending - len(pending) - len(completed)
+            for idx, chunk in islice(tasks, max(free, 0)):
+                future = executor.submit(_parse_files, chunk, encoding)
+                pending[future] = idx
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx = pending.pop(future)
+                results = ModelUnpickler(BytesIO(future.result()),
+                                         metamodel).load()
+                if ordered:
+                    completed[idx] = results
+                else:
+                    for result in zip(chunks[idx], results):
+                        yield result
+
+            while next_chunk in completed:
+                for result in zip(chunks[next_chunk],
+                                  completed.pop(next_chunk)):
+                    yield result
+                next_chunk += 1
+
+
+def _metamodel_state(metamodel):
+    """
+    Returns the pickled meta-model used to restore the meta-model in worker
+    processes.
+    """
+    try:
+        return pickle.dumps(metamodel, pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        raise TextXError('Meta-model can not be sent to worker processes '
+                         '({}). Use metamodel_factory.'.format(e))
+
+
+def _init_worker(metamodel_factory, state):
+    """
+    Constructs or restores the meta-model once per worker process.
+    """
+    global _worker_metamodel
+    if metamodel_factory:
+        _worker_metamodel = metamodel_factory()
+    else:
+        _worker_metamodel = pickle.loads(state)
+
+
+def _parse_files(file_names, encoding):
+    """
+    Parses the given files in a worker process. Returns the list of models
+    or errors serialized by the ModelPickler.
+    """
+    results = []
+    for file_name in file_names:
+        try:
+            results.append(_worker_metamodel.model_from_file(file_name,
+                                                             encoding))
+        except TextXError as e:
+            results.append(e)
+
+    f = BytesIO()
+    ModelPickler(f, _worker_metamodel).dump(results)
+    return f.getvalue()
+
+
+def _metamodel_refs(metamodel):
+    return {id(obj): ref for obj, ref in _metamodel_objs(metamodel)}
+
+
+def _metamodel_objs(metamodel):
+    """
+    Yields objects of the meta-model transferred by reference together with
+    their references. Equal meta-models give equal references.
+    """
+    yield metamodel, ('metamodel',)
+
+    for ns_name, namespace in metamodel.namespaces.items():
+        for cls_name, cls in namespace.items():
+            yield cls, ('class', ns_name, cls_name)
+
+    if metamodel.builtins:
+        for name, obj in metamodel.builtins.items():
+            yield obj, ('builtin', name)
+
+    # PEG rules (e.g. expected rules of syntax errors) by the depth-first
+    # order in the parser model.
+    rules = [metamodel.parser.parser_model]
+    if metamodel.parser.comments_model:
+        rules.append(metamodel.parser.comments_model)
+    visited = set()
+    idx = 0
+    while rules:
+        rule = rules.pop()
+        if id(rule) in visited:
+            continue
+        visited.add(id(rule))
+        rules.extend(reversed(rule.nodes))
+        yield rule, ('rule', idx)
+        idx += 1
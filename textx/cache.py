@@ -0,0 +1,370 @@
+#######################################################################
+# Name: cache.py
+# Purpose: Serialization and on-disk caching of fully linked meta-models.
+# Author: Igor R. Dejanovic <igor DOT dejanovic AT gmail DOT com>
+# Copyright:
+#   (c) 2017 Igor R. Dejanovic <igor DOT dejanovic AT gmail DOT com>
+# License: MIT License
+#######################################################################
+from __future__ import absolute_import
+import codecs
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import weakref
+from io import BytesIO
+from textx.const import MULT_ONE, MULT_OPTIONAL, MULT_ZEROORMORE, \
+    MULT_ONEORMORE, RULE_COMMON, RULE_ABSTRACT, RULE_MATCH
+from textx.lang import BASE_TYPE_RULES, OBJECT, model_parser_for
+from textx.model import setup_object_builders
+
+__all__ = ['dumps_metamodel', 'loads_metamodel', 'load_metamodel',
+           'store_metamodel', 'reduce_metamodel', 'restore_metamodel']
+
+
+# Bump this if the layout of the serialized meta-model changes.
+CACHE_VERSION = 1
+
+# Pickle protocol of the serialized meta-models. Protocol 2 is supported by
+# all Python versions supported by textX.
+PICKLE_PROTOCOL = 2
+
+# Special rules defined globally in textx.lang. They are shared by all
+# meta-models and must keep their identity when the meta-model is restored.
+GLOBAL_RULES = dict(BASE_TYPE_RULES, OBJECT=OBJECT)
+
+# Class attributes set up by the grammar processing which are serialized.
+CLASS_STATE = ['_tx_attrs', '_tx_inh_by', '_tx_position', '_tx_position_end',
+               '_tx_type', '_tx_peg_rule']
+
+# Rule types and multiplicities are compared by identity in some places so
+# unpickled strings are replaced by these constants.
+CONSTANTS = {c: c for c in [MULT_ONE, MULT_OPTIONAL, MULT_ZEROORMORE,
+                            MULT_ONEORMORE, RULE_COMMON, RULE_ABSTRACT,
+                            RULE_MATCH]}
+
+# Meta-models pickled or unpickled in this process keyed by the digest of
+# their pickled state. See reduce_metamodel.
+_pickled_metamodels = weakref.WeakValueDictionary()
+
+
+class MetaModelPickler(pickle.Pickler):
+    """
+    Pickler that stores meta-model classes and global PEG rules by
+    reference. The classes are recreated by the MetaModelUnpickler.
+    """
+    def __init__(self, file, metamodel):
+        pickle.Pickler.__init__(self, file, PICKLE_PROTOCOL)
+        self._refs = {}
+        for ns_name, namespace in metamodel.namespaces.items():
+            for cls_name, cls in namespace.items():
+                self._refs[id(cls)] = ('class', ns_name, cls_name)
+        for rule_name, rule in GLOBAL_RULES.items():
+            self._refs[id(rule)] = ('rule', rule_name)
+
+    def persistent_id(self, obj):
+        return self._refs.get(id(obj))
+
+
+class MetaModelUnpickler(pickle.Unpickler):
+    """
+    Unpickler that resolves references stored by the MetaModelPickler
+    using the given (restored) meta-model.
+    """
+    def __init__(self, file, metamodel):
+        pickle.Unpickler.__init__(self, file)
+        self.metamodel = metamodel
+
+    def persistent_load(self, pid):
+        if pid[0] == 'class':
+            return self.metamodel.namespaces[pid[1]][pid[2]]
+        elif pid[0] == 'rule':
+            return GLOBAL_RULES[pid[1]]
+        raise pickle.UnpicklingError('Unknown reference {}'.format(pid))
+
+
+def dumps_metamodel(metamodel):
+    """
+    Serializes the grammar dependent state of the given meta-model (parser
+    model, meta-classes, meta-attributes, namespaces and imports) to bytes.
+    Constructor parameters (user classes, builtins, match filters...) and
+    registered processors are not serialized.
+
+    Args:
+        metamodel(TextXMetaModel): A fully linked meta-model.
+    """
+    namespaces = []
+    classes = []
+    for ns_name, namespace in metamodel.namespaces.items():
+        if ns_name == '__base__':
+            # BASETYPE classes are created by the meta-model constructor.
+            continue
+        namespaces.append((ns_name, list(namespace)))
+        for cls in namespace.values():
+            classes.append((cls, {attr: getattr(cls, attr)
+                                  for attr in CLASS_STATE}))
+
+    ns_names = {id(namespace): ns_name
+                for ns_name, namespace in metamodel.namespaces.items()}
+    imported = {ns_name: [ns_names[id(ns)] for ns in imported_namespaces]
+                for ns_name, imported_namespaces
+                in metamodel._imported_namespaces.items()}
+
+    state = {
+        'classes': classes,
+        'rootcls': metamodel.rootcls,
+        'root_rule': metamodel.parser.parser_model.nodes[0],
+        'comments_model': metamodel.parser.comments_model,
+    }
+    f = BytesIO()
+    MetaModelPickler(f, metamodel).dump(state)
+
+    return pickle.dumps((CACHE_VERSION, namespaces, imported, f.getvalue()),
+                        PICKLE_PROTOCOL)
+
+
+def loads_metamodel(data, file_name=None, **kwargs):
+    """
+    Restores the meta-model serialized by `dumps_metamodel` without parsing
+    the grammar.
+
+    Args:
+        data(bytes): Serialized meta-model.
+        file_name(str): A grammar file name the meta-model is built from.
+        other params: See TextXMetaModel.
+    """
+    from textx.metamodel import TextXMetaModel
+
+    version, namespaces, imported, state = pickle.loads(data)
+    if version != CACHE_VERSION:
+        raise ValueError('Unsupported serialized meta-model version {}.'
+                         .format(version))
+
+    metamodel = TextXMetaModel(file_name=file_name, **kwargs)
+
+    if metamodel.debug:
+        metamodel.dprint("*** RESTORING META-MODEL ***")
+
+    # Recreate classes in their namespaces. As for the grammar processing,
+    # user supplied classes are used instead of the dynamically created.
+    for ns_name, cls_names in namespaces:
+        metamodel._enter_namespace(ns_name)
+        for cls_name in cls_names:
+            if cls_name in metamodel.user_classes:
+                metamodel._init_class(metamodel.user_classes[cls_name], None,
+                                      0)
+            else:
+                metamodel._new_class(cls_name, None, 0)
+        metamodel._leave_namespace()
+
+    for ns_name, imported_names in imported.items():
+        metamodel._imported_namespaces[ns_name] = \
+            [metamodel.namespaces[name] for name in imported_names]
+
+    state = MetaModelUnpickler(BytesIO(state), metamodel).load()
+    for cls, cls_state in state['classes']:
+        for attr, value in cls_state.items():
+            setattr(cls, attr, value)
+        cls._tx_type = CONSTANTS[cls._tx_type]
+        for attr in cls._tx_attrs.values():
+            attr.mult = CONSTANTS[attr.mult]
+    metamodel.rootcls = state['rootcls']
+
+    model_parser = model_parser_for(metamodel, state['root_rule'],
+                                    state['comments_model'])
+    metamodel.validate()
+    metamodel.parser = model_parser
+    if metamodel.slots:
+        metamodel._init_slots()
+    setup_object_builders(model_parser)
+
+    return metamodel
+
+
+def load_metamodel(cache_dir, file_name, lang_desc, **kwargs):
+    """
+    Returns the meta-model for the given grammar restored from the cache or
+    None if the cache entry doesn't exist or is stale.
+
+    Args:
+        cache_dir(str): The cache directory.
+        file_name(str): The name of the grammar file.
+        lang_desc(str): The content of the grammar file.
+        other params: See TextXMetaModel.
+    """
+    cache_file = _cache_file_name(cache_dir, file_name, lang_desc, kwargs)
+    try:
+        with open(cache_file, 'rb') as f:
+            version, imports, data = pickle.load(f)
+    except (IOError, OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+
+    if version != CACHE_VERSION:
+        return None
+
+    # Cache is stale if any of the imported grammars has changed.
+    for import_file_name, digest in imports:
+        try:
+            if _file_digest(import_file_name) != digest:
+                return None
+        except (IOError, OSError):
+            return None
+
+    try:
+        return loads_metamodel(data, file_name=file_name, **kwargs)
+    except (EOFError, ValueError, KeyError, AttributeError, ImportError,
+            pickle.UnpicklingError):
+        return None
+
+
+def store_metamodel(cache_dir, file_name, lang_desc, metamodel, **kwargs):
+    """
+    Stores the given meta-model in the cache.
+
+    Args:
+        cache_dir(str): The cache directory. Created if it doesn't exist.
+        file_name(str): The name of the grammar file.
+        lang_desc(str): The content of the grammar file.
+        metamodel(TextXMetaModel): The meta-model built from the grammar.
+        other params: See TextXMetaModel.
+    """
+    main_namespace = metamodel._namespace_for_file_name(file_name)
+    imports = [(name, _file_digest(name))
+               for name in _imported_file_names(metamodel, main_namespace)]
+    try:
+        data = pickle.dumps((CACHE_VERSION, imports,
+                             dumps_metamodel(metamodel)),
+                            PICKLE_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError, RuntimeError):
+        # Grammar state can't be serialized (e.g. unpicklable user data
+        # attached to PEG rules). Caching is an optimization so just skip it.
+        if metamodel.debug:
+            metamodel.dprint("*** META-MODEL CAN'T BE CACHED ***")
+        return
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+
+    # Write to a temporary file and rename to prevent partially written
+    # cache files in case of concurrent access.
+    cache_file = _cache_file_name(cache_dir, file_name, lang_desc, kwargs)
+    fd, tmp_name = tempfile.mkstemp(dir=cache_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        _replace(tmp_name, cache_file)
+    except (IOError, OSError):
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+def reduce_metamodel(metamodel):
+    """
+    Returns the reduce value used for pickling of the given meta-model.
+    The meta-model is pickled in the serialized form (see dumps_metamodel)
+    together with its constructor parameters, registered processors and
+    scope providers which must be picklable (e.g. defined at the module
+    level).
+
+    Args:
+        metamodel(TextXMetaModel): A fully linked meta-model.
+    """
+    from textx.compiler import COMPILED_PARAMS
+
+    if metamodel._pickle_data is None:
+        metamodel._pickle_data = dumps_metamodel(metamodel)
+
+    params = {param: getattr(metamodel, param) for param in COMPILED_PARAMS}
+    params.update(classes=list(metamodel.user_classes.values()),
+                  builtins=metamodel.builtins,
+                  match_filters=metamodel.match_filters)
+    state = pickle.dumps((metamodel._pickle_data, metamodel.file_name,
+                          params, metamodel.obj_processors,
+                          metamodel._model_processors,
+                          metamodel.scope_providers),
+                         PICKLE_PROTOCOL)
+    key = hashlib.sha1(state).hexdigest()
+    _pickled_metamodels[key] = metamodel
+
+    return restore_metamodel, (key, state)
+
+
+def restore_metamodel(key, state):
+    """
+    Restores the meta-model pickled by reduce_metamodel. If the meta-model
+    with the same state is already pickled or unpickled in this process it
+    is reused.
+    """
+    metamodel = _pickled_metamodels.get(key)
+    if metamodel is None:
+        data, file_name, params, obj_processors, model_processors, \
+            scope_providers = pickle.loads(state)
+        metamodel = loads_metamodel(data, file_name=file_name, **params)
+        metamodel.register_obj_processors(obj_processors)
+        metamodel.register_scope_providers(scope_providers)
+        for model_processor in model_processors:
+            metamodel.register_model_processor(model_processor)
+        _pickled_metamodels[key] = metamodel
+    return metamodel
+
+
+def _imported_file_names(metamodel, main_namespace):
+    """
+    Returns file names of all grammars imported by the meta-model.
+    """
+    return [
+        "%s.tx" % os.path.join(metamodel.root_path, *ns_name.split("."))
+        for ns_name in metamodel.namespaces
+        if ns_name not in ('__base__', None, main_namespace)]
+
+
+def _cache_file_name(cache_dir, file_name, lang_desc, options):
+    digest = hashlib.sha1()
+    digest.update('{}:{}.{}:{}\n'.format(CACHE_VERSION,
+                                         sys.version_info[0],
+                                         sys.version_info[1],
+                                         os.path.abspath(file_name))
+                  .encode('utf-8'))
+    digest.update(lang_desc.encode('utf-8'))
+    digest.update(_fingerprint(options).encode('utf-8'))
+    return os.path.join(cache_dir, '{}.txcache'.format(digest.hexdigest()))
+
+
+def _file_digest(file_name):
+    with codecs.open(file_name, 'r', 'utf-8') as f:
+        return hashlib.sha1(f.read().encode('utf-8')).hexdigest()
+
+
+def _fingerprint(value):
+    """
+    Returns a stable string representation of constructor options used as a
+    part of the cache key.
+    """
+    if value is None or isinstance(value, (bool, int, float, type(u''),
+                                           type(b''))):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return '[{}]'.format(','.join(_fingerprint(v) for v in value))
+    if isinstance(value, dict):
+        items = sorted((_fingerprint(k), _fingerprint(v))
+                       for k, v in value.items())
+        return '{{{}}}'.format(','.join('{}:{}'.format(k, v)
+                                        for k, v in items))
+    if hasattr(value, '__name__'):
+        # Classes and callables
+        return '{}.{}'.format(getattr(value, '__module__', ''),
+                              getattr(value, '__qualname__', value.__name__))
+    return type(value).__name__
+
+
+def _replace(src, dst):
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+    else:
+        # Python 2
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
@@ -3,6 +3,7 @@ import sys
 import argparse
 from textx import metamodel_from_file, TextXError
 from textx.export import metamodel_export, model_export
+from textx.compiler import metamodel_compile
 
 
 def textx():
@@ -21,14 +22,22 @@ def textx():
             sys.exit(2)
 
     parser = MyParser(description='textX checker and visualizer')
-    parser.add_argument('cmd', help='Command - "check", "visualize" '
-                                    'or "generate"')
+    parser.add_argument('cmd', help='Command - "check", "visualize", '
+                                    '"generate" or "compile"')
     parser.add_argument('metamodel', help='Meta-model file name')
     parser.add_argument('model', help='Model file name', nargs='?')
     parser.add_argument('-i', help='case-insensitive parsing',
                         action='store_true')
     parser.add_argument('-d', help='run in debug mode',
                         action='store_true')
+    parser.add_argument('-r', '--recognize',
+                        help='only check the model syntax without '
+                             'constructing the model',
+                        action='store_true')
+    parser.add_argument('--check-refs',
+                        help='with --recognize, check that referenced names '
+                             'are defined',
+                        action='store_true')
     parser.add_argument('--out-folder', '-o',
                         help='output folder for metamodel generation. Default'
                              ' value is "."',
@@ -36,9 +45,12 @@ def textx():
 
     args = parser.parse_args()
 
-    if args.cmd not in ['visualize', 'check', 'generate']:
+    if args.cmd not in ['visualize', 'check', 'generate', 'compile']:
         print("Unknown command {}. Command must be one of"
-              " 'visualize', 'check', 'generate'.".format(args.cmd))
+              " 'visualize', 'check', 'generate', 'compile'.".format(args.cmd))
+        sys.exit(1)
+    if args.recognize and args.cmd != 'check':
+        print("Option --recognize can be used only with 'check' command.")
         sys.exit(1)
     if args.cmd == "generate":
         try:
@@ -62,7 +74,11 @@ def textx():
 
     if args.model:
         try:
-            model = metamodel.model_from_file(args.model, debug=args.d)
+            if args.recognize:
+                metamodel.validate_file(args.model,
+                                        check_refs=args.check_refs)
+            else:
+                model = metamodel.model_from_file(args.model, debug=args.d)
             print("Model OK.")
         except TextXError as e:
             print("Error in model file.")
@@ -95,6 +111,13 @@ def textx():
             print("  + '%s' metamodel Ecore file in folder '%s'"
                   % (ecore_file_name, dest))
             resource.save(output=URI(join(dest, ecore_file_name)))
+    elif args.cmd == "compile":
+        from os.path import join, basename, splitext
+        module_name = '%s_metamodel' % splitext(basename(args.metamodel))[0]\
+            .replace('-', '_').replace('.', '_')
+        module_file = join(args.out_folder, '%s.py' % module_name)
+        print("Generating '%s' meta-model module." % module_file)
+        metamodel_compile(metamodel, module_file)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,211 @@
+#######################################################################
+# Name: compiler.py
+# Purpose: Ahead-of-time compilation of meta-models to Python modules.
+# Author: Igor R. Dejanovic <igor DOT dejanovic AT gmail DOT com>
+# Copyright:
+#   (c) 2017 Igor R. Dejanovic <igor DOT dejanovic AT gmail DOT com>
+# License: MIT License
+#######################################################################
+from __future__ import absolute_import
+import base64
+import codecs
+import os
+import sys
+import arpeggio
+from textx.cache import dumps_metamodel, _imported_file_names, \
+    _file_digest, CACHE_VERSION, PICKLE_PROTOCOL
+from textx.exceptions import TextXError
+
+__all__ = ['metamodel_compile', 'check_compiled_module']
+
+
+# Meta-model parameters that influence grammar processing and model
+# construction. These are stored in the compiled module.
+COMPILED_PARAMS = ['auto_init_attributes', 'ignore_case', 'skipws', 'ws',
+                   'autokwd', 'memoization', 'textx_tools_support',
+                   'direct_construction', 'slots', 'lazy_refs',
+                   'reverse_refs', 'object_index', 'lean', 'positions']
+
+MODULE_TEMPLATE = '''\
+# -*- coding: utf-8 -*-
+"""
+textX meta-model compiled from {grammar!r}.
+
+This module is generated by `textx compile`. Do not edit.
+Importing this module and calling `metamodel()` restores the fully linked
+meta-model without parsing the grammar.
+"""
+from __future__ import unicode_literals
+import base64
+import os
+from textx.cache import loads_metamodel
+from textx.compiler import check_compiled_module
+
+# The grammar file name relative to the module directory.
+GRAMMAR = {grammar!r}
+
+# SHA1 digests of the grammar and all imported grammars keyed by the file name
+# relative to the module directory.
+GRAMMAR_DIGESTS = {{
+{digests}}}
+
+# Major and minor versions of Python, textX and Arpeggio and the version of
+# the serialization the meta-model is compiled with.
+VERSIONS = {{
+{versions}}}
+
+check_compiled_module(__file__, GRAMMAR_DIGESTS, VERSIONS)
+
+PARAMS = {{
+{params}}}
+
+_METAMODEL = base64.b64decode(
+{data})
+
+
+def metamodel(**kwargs):
+    """
+    Returns a new meta-model for the compiled grammar.
+
+    Args:
+        kwargs: Additional meta-model parameters (e.g. classes, builtins or
+            match_filters). See TextXMetaModel.
+    """
+    params = dict(PARAMS)
+    params.update(kwargs)
+    file_name = os.path.normpath(os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), GRAMMAR)) \
+        if GRAMMAR else None
+    return loads_metamodel(_METAMODEL, file_name=file_name, **params)
+'''
+
+
+def compiled_versions():
+    """
+    Returns the versions which must match for the compiled meta-model to be
+    loaded: major and minor versions of Python, textX and Arpeggio (patch
+    releases don't change the serialized classes) and the version of the
+    serialization (the cache format and the pickle protocol).
+    """
+    return {
+        'python': '{}.{}'.format(*sys.version_info[:2]),
+        'textx': _major_minor(_textx_version()),
+        'arpeggio': _major_minor(arpeggio.__version__),
+        'format': '{}.{}'.format(CACHE_VERSION, PICKLE_PROTOCOL),
+    }
+
+
+def check_compiled_module(module_file, digests, versions):
+    """
+    Called on import of a compiled meta-model module. Raises TextXError if
+    the module is compiled with other versions of Python, textX or Arpeggio
+    or if any of the grammar files is not found or has changed since the
+    module is compiled.
+
+    Args:
+        module_file(str): The file name of the compiled module.
+        digests(dict): SHA1 digests of the grammar files keyed by the file
+            names relative to the module directory (or absolute if the
+            grammar is on another drive).
+        versions(dict): See compiled_versions.
+    """
+    current = compiled_versions()
+    for name in sorted(current):
+        if versions.get(name) != current[name]:
+            raise TextXError(
+                'Meta-model module "{}" is compiled with {} version {} but '
+                'version {} is used. Regenerate it with "textx compile".'
+                .format(module_file, name, versions.get(name),
+                        current[name]))
+
+    module_dir = os.path.dirname(os.path.abspath(module_file))
+    for grammar_file, digest in sorted(digests.items()):
+        grammar_file = os.path.normpath(os.path.join(module_dir,
+                                                     grammar_file))
+        if not os.path.exists(grammar_file):
+            raise TextXError(
+                'Grammar file "{}" of meta-model module "{}" is not found. '
+                'Grammar files must be kept at the same place relative to '
+                'the module.'.format(grammar_file, module_file))
+        if _file_digest(grammar_file) != digest:
+            raise TextXError(
+                'Grammar file "{}" has changed since meta-model module "{}" '
+                'is compiled. Regenerate it with "textx compile".'
+                .format(grammar_file, module_file))
+
+
+def _major_minor(version):
+    return '.'.join(version.split('.')[:2]) if version else version
+
+
+def _module_path(file_name, module_dir):
+    """
+    Returns the file name relative to the module directory with forward
+    slashes or the absolute file name if it is on another drive.
+    """
+    file_name = os.path.abspath(file_name)
+    try:
+        file_name = os.path.relpath(file_name, module_dir)
+    except ValueError:
+        pass
+    return file_name.replace(os.sep, '/')
+
+
+def _textx_version():
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        # Python < 3.8
+        from pkg_resources import get_distribution, \
+            DistributionNotFound as PackageNotFoundError
+
+        def version(name):
+            return get_distribution(name).version
+    try:
+        return version('textX')
+    except PackageNotFoundError:
+        return None
+
+
+def metamodel_compile(metamodel, file_name):
+    """
+    Generates Python module with the serialized, fully linked meta-model.
+    The meta-model is restored by calling `metamodel()` function of the
+    generated module, which costs an import instead of a grammar build.
+    The restored meta-model uses the same parser model and thus produces the
+    same models as the original meta-model.
+
+    Args:
+        metamodel(TextXMetaModel): The meta-model to compile.
+        file_name(str): The name of the Python module to generate.
+    """
+    module_dir = os.path.dirname(os.path.abspath(file_name))
+    grammar = _module_path(metamodel.file_name, module_dir) \
+        if metamodel.file_name else None
+
+    digests = []
+    if metamodel.file_name:
+        main_namespace = metamodel._namespace_for_file_name(
+            metamodel.file_name)
+        grammar_files = [metamodel.file_name] + \
+            _imported_file_names(metamodel, main_namespace)
+        for grammar_file in grammar_files:
+            digests.append('    {!r}: {!r},\n'.format(
+                _module_path(grammar_file, module_dir),
+                _file_digest(grammar_file)))
+
+    params = ['    {!r}: {!r},\n'.format(param, getattr(metamodel, param))
+              for param in COMPILED_PARAMS]
+    versions = ['    {!r}: {!r},\n'.format(name, version)
+                for name, version in sorted(compiled_versions().items())]
+
+    data = base64.b64encode(dumps_metamodel(metamodel)).decode('ascii')
+    data = '\n'.join("    '{}'".format(data[i:i + 72])
+                     for i in range(0, len(data), 72))
+
+    with codecs.open(file_name, 'w', 'utf-8') as f:
+        f.write(MODULE_TEMPLATE.format(grammar=grammar,
+                                       digests=''.join(digests),
+                                       versions=''.join(versions),
+                                       params=''.join(params),
+                                       data=data))
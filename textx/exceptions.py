@@ -7,6 +7,11 @@ class TextXError(Exception):
         self.col = col
         self.err_type = err_type
 
+    def __reduce__(self):
+        # The message is kept utf-8 encoded in args.
+        return (self.__class__, (self.args[0].decode('utf-8'),),
+                self.__dict__)
+
 
 class TextXSemanticError(TextXError):
     def __init__(self, message, line=None, col=None, err_type=None,
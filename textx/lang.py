@@ -200,18 +200,7 @@ class TextXVisitor(PTNodeVisitor):
             comments_model = None
 
         root_rule = children[0]
-        from .model import get_model_parser
-        model_parser = get_model_parser(root_rule, comments_model,
-                                        ignore_case=self.metamodel.ignore_case,
-                                        skipws=self.metamodel.skipws,
-                                        ws=self.metamodel.ws,
-                                        autokwd=self.metamodel.autokwd,
-                                        memoization=self.metamodel.memoization,
-                                        debug=self.metamodel.debug)
-
-        model_parser.metamodel = self.metamodel
-
-        return model_parser
+        return model_parser_for(self.metamodel, root_rule, comments_model)
 
     def second_textx_model(self, model_parser):
         """Cross reference resolving for parser model."""
@@ -977,6 +966,25 @@ class TextXVisitor(PTNodeVisitor):
         return children[0]
 
 
+def model_parser_for(metamodel, root_rule, comments_model):
+    """
+    Creates model parser for the given meta-model using the given root PEG rule
+    and the PEG rule for comments (may be None).
+    """
+    from .model import get_model_parser
+    model_parser = get_model_parser(root_rule, comments_model,
+                                    ignore_case=metamodel.ignore_case,
+                                    skipws=metamodel.skipws,
+                                    ws=metamodel.ws,
+                                    autokwd=metamodel.autokwd,
+                                    memoization=metamodel.memoization,
+                                    debug=metamodel.debug)
+
+    model_parser.metamodel = metamodel
+
+    return model_parser
+
+
 # parser object cache. To speed up parser initialization (e.g. during imports)
 textX_parsers = {}
 
@@ -1031,6 +1039,15 @@ def language_from_str(language_def, metamodel):
     lang_parser.metamodel = metamodel
     metamodel.parser = lang_parser
 
+    # Imported grammars are processed using the same meta-model. Classes are
+    # replaced when the main grammar is processed.
+    if metamodel.slots and not is_pyecore_enabled() \
+            and len(metamodel._namespace_stack) == 1:
+        metamodel._init_slots()
+
+    from .model import setup_object_builders
+    setup_object_builders(lang_parser)
+
     if metamodel.debug:
         # Create dot file for debuging purposes
         PMDOTExporter().exportFile(
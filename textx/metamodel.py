@@ -11,12 +11,13 @@ import codecs
 import os
 from collections import OrderedDict
 from arpeggio import DebugPrinter
-from textx.six import add_metaclass
+from textx.six import add_metaclass, string_types
 from textx.lang import language_from_str, python_type, BASE_TYPE_NAMES, ID, \
     BOOL, INT, FLOAT, STRING, NUMBER, BASETYPE, OBJECT
 from textx.const import MULT_ONE, MULT_ZEROORMORE, MULT_ONEORMORE, \
-    RULE_MATCH, RULE_ABSTRACT
+    RULE_MATCH, RULE_ABSTRACT, RULE_COMMON
 from textx.pyecore import is_pyecore_enabled
+from textx.model import index_objects
 
 if is_pyecore_enabled():
     from pyecore.ecore import EObject, EClass, EPackage, EDataType, EEnum, \
@@ -35,6 +36,12 @@ BASE_FILTERS = {
 }
 
 
+# Attributes set on the model root object.
+MODEL_SLOTS = ['_tx_filename', '_tx_metamodel', '_pos_crossref_list',
+               '_pos_rule_dict', '_tx_reverse_refs', '_tx_objects',
+               '_tx_position_index', '_tx_line_index']
+
+
 class MetaAttr(object):
     """
     A metaclass for attribute description.
@@ -95,6 +102,39 @@ class TextXMetaModel(__BCLASS1, __BCLASS2):
             parsing). Default is False.
         textx_tools_support(bool): If True, additional properties will be
             added to model. Default is False.
+        direct_construction(bool): If True, model objects are constructed
+            during parsing as soon as their rules are matched and the parse
+            sub-trees of the rules are discarded, so the full parse tree is
+            never kept. Not used if pyecore support is enabled.
+            Default is False.
+        slots(bool): If True, classes created for common rules use
+            __slots__ for model object attributes instead of __dict__, which
+            lowers memory used by big models. Attributes not defined by the
+            grammar can't be set on model objects. Not used for user classes
+            and if pyecore support is enabled. Default is False.
+        lazy_refs(bool): If True, references of objects of classes created
+            for common rules are resolved on the first access instead of
+            after the model is constructed. See textx.model.resolve_all.
+            Not used for user classes, if textx_tools_support or pyecore
+            support is enabled. Default is False.
+        reverse_refs(bool): If True, an index of the objects referencing
+            each referenced object is collected while references are
+            resolved and kept in `_tx_reverse_refs` attribute of the model.
+            See textx.model.ReverseRefs. Default is False.
+        object_index(bool): If True, objects created in the model
+            construction are indexed by their classes and the index is kept
+            in `_tx_objects` attribute of the model. Used by
+            textx.model.objects_of_type. Not used for lean models.
+            Default is False.
+        lean(bool): If True, the state of the parser (the input, the parse
+            tree and the named objects) is released as soon as the model is
+            constructed and the model root doesn't keep the object index
+            (`_tx_objects`) and the line index (`_tx_line_index`), which
+            lowers memory used by long-living models. Default is False.
+        positions(bool): If False, positions of model objects in the input
+            are not kept in `_tx_position` and `_tx_position_end` attributes
+            (and classes created for common rules don't have their slots).
+            Not used if textx_tools_support is enabled. Default is True.
         debug(bool): Should debug messages be printed.
         builtins(dict): A dict of named object used in linking phase.
             References to named objects not defined in the model will be
@@ -105,6 +145,9 @@ class TextXMetaModel(__BCLASS1, __BCLASS2):
             used to transform strings matched by match rules.
         obj_processors(dict): A dict of user supplied object processors keyed
             by rule/class name (may be a fully qualified name).
+        scope_providers(dict): A dict of user supplied scope providers keyed
+            by 'class name.attribute name' patterns.
+            See register_scope_providers.
         rootcls(TextXClass): A language class that is a root of the metamodel.
         root_path(str): The root dir used for the import statement.
         namespaces(dict): A mapping from fully qualified module names to dicts
@@ -117,13 +160,35 @@ class TextXMetaModel(__BCLASS1, __BCLASS2):
         _imported_namespaces(dict): A mapping from namespace name to the list
             of references to imported namespaces. Used in searches for
             unqualified rules.
+        _builders(dict): Builders used in model construction keyed by id of
+            the meta-class or assignment PEG rule.
+            See textx.model.setup_object_builders.
+        _converters(dict): Match filters keyed by rule name.
+        _ref_classes(dict): Common classes which instances may be referenced
+            by a reference to the class (the class itself or descendants of
+            an abstract class) keyed by id of the class.
+        _ref_targets(dict): For each common class (keyed by id) a list of
+            (id of the abstract class, rank) for abstract classes with more
+            than one common descendant where rank is the position of the
+            class in `_ref_classes` of the abstract class.
+        _class_bits(dict): A bit of each common class keyed by id of the
+            class.
+        _subclass_bits(dict): Bitset of the common classes which instances
+            are instances of the class (the class itself or common
+            descendants of an abstract class) keyed by id of the class.
+            See is_instance.
+        _containers(dict): Bitset of the common classes which instances may
+            contain (directly or indirectly) the instances of the class keyed
+            by id of the class. Used in `parent_of_type`.
     """
 
     def __init__(self, file_name=None, classes=None, builtins=None,
                  match_filters=None, auto_init_attributes=True,
                  ignore_case=False, skipws=True, ws=None, autokwd=False,
                  memoization=False, resource_set=None, package=None,
-                 textx_tools_support=False, **kwargs):
+                 textx_tools_support=False, direct_construction=False,
+                 slots=False, lazy_refs=False, reverse_refs=False,
+                 object_index=False, lean=False, positions=True, **kwargs):
         super(TextXMetaModel, self).__init__(**kwargs)
 
         self.file_name = file_name
@@ -162,6 +227,16 @@ class TextXMetaModel(__BCLASS1, __BCLASS2):
         self.autokwd = autokwd
         self.memoization = memoization
         self.textx_tools_support = textx_tools_support
+        self.direct_construction = direct_construction
+        self.slots = slots
+        self.lazy_refs = lazy_refs
+        self.reverse_refs = reverse_refs
+        self.object_index = object_index
+        self.lean = lean
+        self.positions = positions
+
+        # Serialized meta-model used for pickling. See __reduce__.
+        self._pickle_data = None
 
         # Registered model processors
         self._model_processors = []
@@ -169,6 +244,11 @@ class TextXMetaModel(__BCLASS1, __BCLASS2):
         # Registered object processors
         self.obj_processors = {}
 
+        # Registered scope providers and providers found for class
+        # attributes.
+        self.scope_providers = {}
+        self._scope_provider_cache = {}
+
         # Namespaces
         self.namespaces = {}
         self._namespace_stack = []
@@ -181,6 +261,16 @@ class TextXMetaModel(__BCLASS1, __BCLASS2):
         # Imported namespaces
         self._imported_namespaces = {}
 
+        # Model construction tables. Created when the meta-model is
+        # constructed.
+        self._builders = {}
+        self._converters = {}
+        self._ref_classes = {}
+        self._ref_targets = {}
+        self._class_bits = {}
+        self._subclass_bits = {}
+        self._containers = {}
+
         # Create new namespace for BASETYPE classes
         self._enter_namespace('__base__')
 
@@ -366,6 +456,14 @@ class TextXMetaModel(__BCLASS1, __BCLASS2):
 
             """
 
+            def __reduce_ex__(self, protocol):
+                # Instances are pickled by the class FQN so that classes
+                # are found in the unpickled meta-model.
+                cls = type(self)
+                reduce_value = object.__reduce_ex__(self, max(protocol, 2))
+                return (_new_object, (cls._tx_metamodel, cls._tx_fqn)) + \
+                    reduce_value[2:]
+
             def __repr__(self):
                 """
                 Used for TextXClass bellow.
@@ -430,6 +528,62 @@ class TextXMetaModel(__BCLASS1, __BCLASS2):
         if root:
             self.rootcls = cls
 
+    def _init_slots(self):
+        """
+        Replaces classes created for common rules with equivalent classes
+        which instances use __slots__. Slots can't be added to an existing
+        class so this is done when the meta-model is fully constructed and
+        all class attributes are known.
+        """
+        # Classes which instances may be a model root.
+        root_classes = set()
+        classes = [self.rootcls]
+        while classes:
+            cls = classes.pop()
+            root_classes.add(cls)
+            classes.extend(cls._tx_inh_by)
+
+        positions = self.positions or self.textx_tools_support
+        replaced = {}
+        for namespace in self.namespaces.values():
+            for name, cls in namespace.items():
+                if cls._tx_type != RULE_COMMON \
+                        or name in self.user_classes \
+                        or '__slots__' in cls.__dict__:
+                    continue
+                slots = ['parent', '_tx_model', '__weakref__']
+                if positions:
+                    slots[1:1] = ['_tx_position', '_tx_position_end']
+                slots.extend(a for a in cls._tx_attrs if a not in slots)
+                if cls in root_classes:
+                    slots.extend(MODEL_SLOTS)
+                replaced[cls] = namespace[name] = _slots_class(cls, slots)
+
+        if not replaced:
+            return
+
+        # Update all references to the replaced classes.
+        if self.rootcls in replaced:
+            self.rootcls = replaced[self.rootcls]
+        for namespace in self.namespaces.values():
+            for cls in namespace.values():
+                cls._tx_inh_by[:] = [replaced.get(c, c)
+                                     for c in cls._tx_inh_by]
+                for attr in cls._tx_attrs.values():
+                    attr.cls = replaced.get(attr.cls, attr.cls)
+
+        rules = [self.parser.parser_model]
+        visited = set()
+        while rules:
+            rule = rules.pop()
+            if id(rule) in visited:
+                continue
+            visited.add(id(rule))
+            rules.extend(rule.nodes)
+            cls = getattr(rule, '_tx_class', None)
+            if cls in replaced:
+                rule._tx_class = replaced[cls]
+
     def _cls_fqn(self, cls):
         """
         Returns fully qualified name for the class based on current namespace
@@ -616,25 +770,134 @@ class TextXMetaModel(__BCLASS1, __BCLASS2):
     def _current_namespace(self):
         return self.namespaces[self._namespace_stack[-1]]
 
-    def model_from_str(self, model_str, debug=None):
+    def is_instance(self, obj, cls):
+        """
+        Returns True if the given model object is an instance of the given
+        class of this meta-model or of a common class inheriting the given
+        abstract class.
+
+        Args:
+            obj(object): A model object.
+            cls(str or class): The class or its name (may be fully
+                qualified).
+        """
+        bits = self._type_bits(cls)
+        return bool(bits and self._class_bits.get(id(type(obj)), 0) & bits)
+
+    def _type_bits(self, cls):
+        """
+        Returns the bitset of the common classes which instances are
+        instances of the given class or class name (see _subclass_bits) or
+        None if the class is not in this meta-model.
+        """
+        if isinstance(cls, string_types):
+            try:
+                cls = self[cls]
+            except KeyError:
+                return None
+        return self._subclass_bits.get(id(cls))
+
+    def model_from_str(self, model_str, debug=None, include=None,
+                       exclude=None):
         """
         Instantiates model from the given string.
+
+        Args:
+            include(list): If given, only the objects of these classes (or
+                class names) are constructed. Their containers are
+                constructed as stubs with the containment attributes only.
+            exclude(list): If given, the objects of these classes (or class
+                names) and the objects contained in them are not
+                constructed.
         """
-        model = self.parser.get_model_from_str(model_str, debug=debug)
+        parser = self.parser.clone()
+        model = parser.get_model_from_str(model_str, debug=debug,
+                                          include=include, exclude=exclude)
         for p in self._model_processors:
             p(model, self)
+        if self._model_processors and \
+                getattr(model, '_tx_objects', None) is not None:
+            # Model processors may change the model.
+            index_objects(model)
         return model
 
-    def model_from_file(self, file_name, encoding='utf-8', debug=None):
+    def model_from_file(self, file_name, encoding='utf-8', debug=None,
+                        include=None, exclude=None):
         """
         Instantiates model from the given file.
+        See model_from_str for include and exclude.
         """
-        model = self.parser.get_model_from_file(file_name,
-                                                encoding, debug=debug)
+        parser = self.parser.clone()
+        model = parser.get_model_from_file(file_name, encoding, debug=debug,
+                                           include=include, exclude=exclude)
         for p in self._model_processors:
             p(model, self)
+        if self._model_processors and \
+                getattr(model, '_tx_objects', None) is not None:
+            # Model processors may change the model.
+            index_objects(model)
         return model
 
+    def validate_str(self, model_str, check_refs=False):
+        """
+        Checks that the given string is a valid model without constructing
+        the model. Raises TextXSyntaxError for the first syntax error.
+
+        Args:
+            check_refs(bool): If True, the names of references are checked
+                to be defined in the model or by the built-in objects.
+                Raises TextXSemanticError for the first unknown name.
+                See TextXModelParser.recognize.
+        """
+        self.parser.clone().recognize(model_str, check_refs=check_refs)
+
+    def validate_file(self, file_name, encoding='utf-8', check_refs=False):
+        """
+        Checks that the given file is a valid model without constructing
+        the model. See validate_str.
+        """
+        self.parser.clone().recognize_file(file_name, encoding,
+                                           check_refs=check_refs)
+
+    def model_iter_from_str(self, model_str, debug=None):
+        """
+        Returns an iterator over the objects matched by the repetition
+        assignment of the root rule (e.g. `Model: entities+=Entity;`) in
+        the given string. Objects are yielded as soon as they are parsed and
+        constructed. Model processors are not called.
+        See TextXModelParser.get_model_iter_from_str.
+        """
+        return self.parser.clone().get_model_iter_from_str(model_str,
+                                                           debug=debug)
+
+    def model_iter_from_file(self, file_name, encoding='utf-8', debug=None):
+        """
+        Returns an iterator over the objects matched by the repetition
+        assignment of the root rule in the given file.
+        See model_iter_from_str.
+        """
+        return self.parser.clone().get_model_iter_from_file(file_name,
+                                                            encoding,
+                                                            debug=debug)
+
+    def __reduce__(self):
+        """
+        Meta-model is pickled in the serialized form together with its
+        parameters and processors. See textx.cache.reduce_metamodel.
+        """
+        from textx.cache import reduce_metamodel
+        return reduce_metamodel(self)
+
+    def models_from_files(self, file_names, encoding='utf-8', **kwargs):
+        """
+        Parses the given model files in a pool of worker processes. Returns
+        an iterator of (file_name, model or TextXError) tuples.
+        See textx.batch.models_from_files.
+        """
+        from textx.batch import models_from_files
+        return models_from_files(self, file_names, encoding=encoding,
+                                 **kwargs)
+
     def register_model_processor(self, model_processor):
         """
         Model processor is callable that will be called after
@@ -656,6 +919,84 @@ class TextXMetaModel(__BCLASS1, __BCLASS2):
         """
         self.obj_processors = obj_processors
 
+    def register_scope_providers(self, scope_providers):
+        """
+        Scope providers are callables used to resolve references instead of
+        looking up the name among all objects of the referenced class.
+        A provider is called with the object holding the reference, its
+        meta-attribute and the ObjCrossRef and returns the referenced object
+        or None if it can't be found. See textx.scoping for the built-in
+        providers. Registration of new scope providers will replace
+        previous.
+
+        Args:
+            scope_providers(dict): A dictionary where key is a pattern in the
+                form 'class name.attribute name' where '*' may be used
+                instead of class or attribute name (e.g. 'Entity.type',
+                'Entity.*', '*.type' or '*.*') and value=callable. The most
+                specific pattern is used.
+        """
+        self.scope_providers = scope_providers
+        self._scope_provider_cache = {}
+
+    def _scope_provider(self, cls_name, attr_name):
+        """
+        Returns the scope provider for references of the given class
+        attribute or None.
+        """
+        key = (cls_name, attr_name)
+        try:
+            return self._scope_provider_cache[key]
+        except KeyError:
+            provider = None
+            for pattern in ('{}.{}', '{}.*', '*.{1}', '*.*'):
+                provider = self.scope_providers.get(
+                    pattern.format(cls_name, attr_name))
+                if provider is not None:
+                    break
+            self._scope_provider_cache[key] = provider
+            return provider
+
+
+def _slots_class(cls, slots):
+    """
+    Returns a copy of the given textX class which instances use the given
+    __slots__. Class attributes with the same name as slots (e.g.
+    _tx_position) are moved to the properties of the class' meta-class.
+    """
+    class_values = {}
+    namespace = {}
+    for name, value in cls.__dict__.items():
+        if name in ('__dict__', '__weakref__'):
+            continue
+        if name in slots:
+            class_values[name] = value
+        else:
+            namespace[name] = value
+    namespace['__slots__'] = slots
+
+    def class_value(name):
+        return property(lambda cls: class_values[name],
+                        lambda cls, value: class_values.__setitem__(name,
+                                                                    value))
+
+    metaclass = type(cls)
+    if class_values:
+        metaclass = type(metaclass)(
+            metaclass.__name__, (metaclass,),
+            {name: class_value(name) for name in class_values})
+
+    return metaclass(cls.__name__, cls.__bases__, namespace)
+
+
+def _new_object(metamodel, fqn):
+    """
+    Creates an uninitialized instance of the meta-model class with the given
+    fully qualified name. Used for unpickling of model objects.
+    """
+    cls = metamodel[fqn]
+    return cls.__new__(cls)
+
 
 def metamodel_from_str(lang_desc, metamodel=None, **kwargs):
     """
@@ -675,17 +1016,32 @@ def metamodel_from_str(lang_desc, metamodel=None, **kwargs):
     return metamodel
 
 
-def metamodel_from_file(file_name, **kwargs):
+def metamodel_from_file(file_name, cache_dir=None, **kwargs):
     """
     Creates new metamodel from the given file.
 
     Args:
         file_name(str): The name of the file with textX language description.
+        cache_dir(str): A directory where fully linked meta-models are
+            cached. If given, the meta-model is restored from the cache
+            without parsing the grammar if neither the grammar, imported
+            grammars nor meta-model parameters have changed. Not used if
+            pyecore support is enabled. Default is None (no caching).
         other params: See metamodel_from_str.
     """
     with codecs.open(file_name, 'r', 'utf-8') as f:
         lang_desc = f.read()
 
+    if cache_dir and not is_pyecore_enabled():
+        from textx.cache import load_metamodel, store_metamodel
+        metamodel = load_metamodel(cache_dir, file_name, lang_desc, **kwargs)
+        if metamodel is None:
+            metamodel = metamodel_from_str(lang_desc=lang_desc,
+                                           file_name=file_name, **kwargs)
+            store_metamodel(cache_dir, file_name, lang_desc, metamodel,
+                            **kwargs)
+        return metamodel
+
     metamodel = metamodel_from_str(lang_desc=lang_desc,
                                    file_name=file_name, **kwargs)
 
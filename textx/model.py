@@ -7,12 +7,20 @@
 # License: MIT License
 #######################################################################
 
+import bisect
 import sys
 import codecs
+import copy
+import mmap
+import threading
 import traceback
+from array import array
 from collections import OrderedDict
-from arpeggio import Parser, Sequence, NoMatch, EOF, Terminal
-from textx.exceptions import TextXSyntaxError, TextXSemanticError
+from weakref import WeakValueDictionary
+from arpeggio import Parser, Sequence, NoMatch, EOF, Terminal, NonTerminal, \
+    flatten
+from textx.exceptions import TextXError, TextXSyntaxError, \
+    TextXSemanticError
 from textx.const import MULT_OPTIONAL, MULT_ONE, MULT_ONEORMORE, \
     MULT_ZEROORMORE, RULE_COMMON, RULE_ABSTRACT, RULE_MATCH, \
     MULT_ASSIGN_ERROR, UNKNOWN_OBJ_ERROR
@@ -27,17 +35,24 @@ if sys.version < '3':
 else:
     text = str
 
-__all__ = ['children_of_type', 'parent_of_type', 'model_root', 'metamodel']
+__all__ = ['children_of_type', 'parent_of_type', 'model_root', 'metamodel',
+           'resolve_all', 'objects_of_type', 'iter_model', 'object_at',
+           'objects_in_range', 'reference_at']
 
 
 def model_root(obj):
     """
-    Finds model root element for the given object.
+    Finds model root element for the given object. Objects created in the
+    model construction keep the model root in `_tx_model` attribute. For
+    other objects the `parent` references are followed.
     """
-    p = obj
-    while hasattr(p, 'parent'):
-        p = p.parent
-    return p
+    try:
+        return obj._tx_model
+    except AttributeError:
+        p = obj
+        while hasattr(p, 'parent'):
+            p = p.parent
+        return p
 
 
 def metamodel(obj):
@@ -54,34 +69,366 @@ def parent_of_type(typ, obj):
 
     Args:
         typ(str or python class): The type of the model object we are
-            looking for.
+            looking for. Objects of the common classes inheriting the given
+            abstract class are found as well.
         obj (model object): Python model object which is the start of the
             search process.
     """
-    if type(typ) is not text:
-        typ = typ.__name__
-
-    while hasattr(obj, 'parent'):
-        obj = obj.parent
-        if obj.__class__.__name__ == typ:
+    mm = getattr(model_root(obj), '_tx_metamodel', None)
+    bits = mm._type_bits(typ) if mm is not None else None
+
+    if bits is None:
+        # Not a class of the meta-model. Match by the class name.
+        if type(typ) is not text:
+            typ = typ.__name__
+        while True:
+            obj = getattr(obj, 'parent', None)
+            if obj is None:
+                return None
+            if obj.__class__.__name__ == typ:
+                return obj
+
+    # Objects of the given type can't contain the object.
+    containers = mm._containers.get(id(type(obj)))
+    if containers is not None and not containers & bits:
+        return None
+
+    class_bits = mm._class_bits
+    while True:
+        obj = getattr(obj, 'parent', None)
+        if obj is None:
+            return None
+        if class_bits.get(id(type(obj)), 0) & bits:
             return obj
 
 
+def resolve_all(model):
+    """
+    Resolves all lazy references of the given model (see `lazy_refs`
+    meta-model parameter). Raises TextXSemanticError for the first
+    reference that can't be resolved.
+
+    Args:
+        model (model object): Python model object which is the start of the
+            search process. Only objects contained in this object are
+            resolved.
+    """
+    # Lazy reference descriptors keyed by the class.
+    lazy_refs = {}
+
+    for obj in iter_model(model):
+        cls = type(obj)
+        descriptors = lazy_refs.get(cls)
+        if descriptors is None:
+            descriptors = lazy_refs[cls] = \
+                [getattr(cls, name) for name in getattr(cls, '_tx_attrs', ())
+                 if type(cls.__dict__.get(name)) is LazyReference]
+        for descriptor in descriptors:
+            descriptor.__get__(obj, cls)
+
+
+def iter_model(root, typ=None, predicate=None, order='pre', prune=None):
+    """
+    Returns a generator of the given model object and all model objects
+    contained in it (following containment attributes in the order of
+    `_tx_attrs`). Objects are visited lazily so the iteration may be
+    stopped at any point. Only the current path from the root is kept on
+    the stack and each object is visited once.
+
+    Args:
+        root (model object): Python model object which is the start of the
+            traversal.
+        typ(str or python class): If given, only objects of the class (or
+            of the common classes inheriting the given abstract class) are
+            given. A name may be fully qualified.
+        predicate(callable): If given, only objects for which it returns
+            True are given.
+        order(str): 'pre' for pre-order (containers before the contained
+            objects) or 'post' for post-order. Default is 'pre'.
+        prune(callable): If given, called with each visited object. If it
+            returns True the objects contained in the object are skipped.
+            The object itself is given if it matches the filters.
+    """
+    if order not in ('pre', 'post'):
+        raise ValueError('Unknown traversal order "{}"'.format(order))
+    post = order == 'post'
+
+    bits = None
+    if typ is not None:
+        mm = model_root(root)._tx_metamodel
+        bits = mm._type_bits(typ)
+        if bits is None:
+            raise KeyError('Unknown class "{}"'.format(typ))
+        class_bits = mm._class_bits
+
+    def matches(obj):
+        return (bits is None or class_bits.get(id(type(obj)), 0) & bits) \
+            and (predicate is None or predicate(obj))
+
+    visited = set()
+    # Objects with the iterators of their contained objects.
+    stack = [(None, iter((root,)))]
+    while stack:
+        container, objs = stack[-1]
+        for obj in objs:
+            if id(obj) in visited:
+                continue
+            visited.add(id(obj))
+            if not post and matches(obj):
+                yield obj
+            if prune is not None and prune(obj):
+                if post and matches(obj):
+                    yield obj
+                continue
+            stack.append((obj, _contained_objects(obj)))
+            break
+        else:
+            stack.pop()
+            if post and container is not None and matches(container):
+                yield container
+
+
+def _contained_objects(obj):
+    """
+    Returns a generator of the model objects directly contained in the given
+    object.
+    """
+    attrs = getattr(type(obj), '_tx_attrs', None)
+    if not attrs:
+        return
+    for attr_name, attr in attrs.items():
+        if attr.cont and attr.ref:
+            value = getattr(obj, attr_name)
+            if attr.mult in (MULT_ONE, MULT_OPTIONAL):
+                if value is not None:
+                    yield value
+            elif value:
+                for child in value:
+                    if child is not None:
+                        yield child
+
+
+def objects_of_type(model, cls, include_subclasses=True):
+    """
+    Returns a list of all objects of the given class contained in the
+    given model. Objects of each class are in the order of the input.
+
+    If the model has the object index (see `ObjectIndex`) the objects are
+    found in it and only the objects still contained in the model are
+    returned. The containment is checked up the parent chain of each found
+    object, so the objects contained in the containers of the found objects
+    are visited but the rest of the model is not. Objects added to the model
+    after it is returned are not found until the index is rebuilt (see
+    `index_objects`). Without the index the model is traversed. If the
+    positions of the objects are not kept, the objects of each class are in
+    the order of the traversal.
+
+    Args:
+        model (model object): The model root.
+        cls(str or python class): The class of the objects or its name
+            (may be a fully qualified name).
+        include_subclasses(bool): If True, the objects of the common
+            classes inheriting the given abstract class are returned.
+            Default is True.
+    """
+    metamodel = model._tx_metamodel
+    if type(cls) is text:
+        cls = metamodel[cls]
+
+    classes = metamodel._ref_classes.get(id(cls)) \
+        if include_subclasses else None
+    if classes is None:
+        classes = (cls,)
+
+    index = getattr(model, '_tx_objects', None)
+    if index is not None:
+        collected = []
+        for cls in classes:
+            collected.extend(index.objects(cls))
+        collected = _contained_in(model, collected)
+        if collected is not None:
+            return collected
+
+    class_ids = set(id(c) for c in classes)
+    collected = [obj for obj in iter_model(model)
+                 if id(type(obj)) in class_ids]
+
+    # Traversal follows the containment so objects are sorted to the input
+    # order.
+    if metamodel.positions or metamodel.textx_tools_support:
+        collected.sort(key=lambda obj: (classes.index(type(obj)),
+                                        _position_key(obj)))
+    else:
+        collected.sort(key=lambda obj: classes.index(type(obj)))
+    return collected
+
+
+def index_objects(model):
+    """
+    Builds the object index (see `ObjectIndex`) of the given model by
+    traversing the model and keeps it in `_tx_objects` attribute of the
+    model root. The index is rebuilt after object and model processors are
+    called. Call it after the model is changed otherwise, so that the added
+    objects are found by `objects_of_type`.
+
+    Args:
+        model (model object): The model root.
+    """
+    model._tx_objects = _object_index(model, model._tx_metamodel)
+    return model._tx_objects
+
+
+def _object_index(model, metamodel):
+    objs = list(iter_model(model))
+    if metamodel.positions or metamodel.textx_tools_support:
+        objs.sort(key=_position_key)
+    index = ObjectIndex()
+    for obj in objs:
+        index.add(obj)
+    return index
+
+
+def _position_key(obj):
+    """
+    Sort key of the objects in the order of the input. Objects created
+    after the model construction without positions are sorted last.
+    """
+    # Classes created for common rules have the positions of the rules in
+    # the grammar which must not be used for objects without positions.
+    state = getattr(obj, '__dict__', None)
+    try:
+        if state is not None:
+            return (state['_tx_position'], -state['_tx_position_end'])
+        return (obj._tx_position, -obj._tx_position_end)
+    except (KeyError, AttributeError):
+        return NO_POSITION_KEY
+
+
+NO_POSITION_KEY = (sys.maxsize, 0)
+
+
+def _contained_in(model, objs):
+    """
+    Returns the given objects which are contained in the given model, i.e.
+    the objects whose containers up to the model root still contain them.
+    Returns None if an object doesn't have its container (`parent`) so the
+    containment can't be checked.
+    """
+    # Containment of the visited objects and objects contained in the
+    # visited containers keyed by ids.
+    contained = {id(model): True}
+    children = {}
+
+    collected = []
+    for obj in objs:
+        # Containers of the object up to the first visited one.
+        path = []
+        node = obj
+        while id(node) not in contained:
+            parent = getattr(node, 'parent', None)
+            if parent is None:
+                return None
+            path.append(node)
+            parent_children = children.get(id(parent))
+            if parent_children is None:
+                parent_children = children[id(parent)] = \
+                    set(id(child) for child in _contained_objects(parent))
+            if id(node) not in parent_children:
+                is_contained = False
+                break
+            node = parent
+        else:
+            is_contained = contained[id(node)]
+        for node in path:
+            contained[id(node)] = is_contained
+        if is_contained:
+            collected.append(obj)
+    return collected
+
+
+def object_at(model, position):
+    """
+    Returns the innermost model object at the given position of the input
+    or None. An object spans from its `_tx_position` up to (not including)
+    its `_tx_position_end`. See PositionIndex.
+
+    Args:
+        model (model object): The model root.
+        position(int): A position in the input string.
+    """
+    return PositionIndex.of(model).object_at(position)
+
+
+def objects_in_range(model, start, end):
+    """
+    Returns a list of the model objects overlapping the given range
+    [start, end) of the input ordered by their positions. See PositionIndex.
+
+    Args:
+        model (model object): The model root.
+        start(int): The start position of the range.
+        end(int): The end position of the range (not included).
+    """
+    return PositionIndex.of(model).objects_in_range(start, end)
+
+
+def reference_at(model, position):
+    """
+    Returns the RefRulePosition of the reference at the given position of
+    the input or None. Positions of references are collected only if
+    `textx_tools_support` meta-model parameter is set.
+
+    Args:
+        model (model object): The model root.
+        position(int): A position in the input string.
+    """
+    return PositionIndex.of(model).reference_at(position)
+
+
 def children_of_type(typ, root):
     """
     Returns a list of all model elements of type 'typ' starting from model
     element 'root'. The search process will follow containment links only.
     Non-containing references shall not be followed.
 
+    If 'root' is the model root with the object index (see
+    `objects_of_type`), the objects are found in the index in the order of
+    the input instead of the search, unless some of them don't have
+    positions in the input (e.g. objects created by processors).
+
     Args:
         typ(str or python class): The type of the model object we are
-            looking for.
+            looking for. Objects of the common classes inheriting the given
+            abstract class are found as well.
         root (model object): Python model object which is the start of the
             search process.
     """
 
     collected = []
 
+    mm = getattr(model_root(root), '_tx_metamodel', None)
+    bits = mm._type_bits(typ) if mm is not None else None
+    if bits is not None:
+        class_bits = mm._class_bits
+
+        index = getattr(root, '_tx_objects', None)
+        if index is not None and (mm.positions or mm.textx_tools_support):
+            for cls in index.classes():
+                if class_bits.get(id(cls), 0) & bits:
+                    collected.extend(index.objects(cls))
+            collected = _contained_in(root, collected)
+            if collected is not None:
+                collected.sort(key=_position_key)
+                # Objects without positions are in the order of the search.
+                if not collected or \
+                        _position_key(collected[-1]) != NO_POSITION_KEY:
+                    return collected
+            collected = []
+
+        return [obj for obj in iter_model(root)
+                if class_bits.get(id(type(obj)), 0) & bits]
+
+    # Not a class of the meta-model. Match by the class name.
     if type(typ) is not text:
         typ = typ.__name__
 
@@ -114,7 +461,23 @@ def children_of_type(typ, root):
     return collected
 
 
-class ObjCrossRef(object):
+class _SlotsPickle(object):
+    """
+    Pickling support for classes with __slots__ which can't be pickled with
+    the pickle protocols older than 2 otherwise.
+    """
+    __slots__ = []
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__
+                    if hasattr(self, name))
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class ObjCrossRef(_SlotsPickle):
     """
     Used for object cross reference resolving.
 
@@ -122,14 +485,333 @@ class ObjCrossRef(object):
         obj_name(str): A name of the target object.
         cls(TextXClass): The target object class.
         position(int): A position in the input string of this cross-ref.
+        resolver(ReferenceResolver): Used to resolve lazy references.
     """
+    __slots__ = ['obj_name', 'cls', 'position', 'resolver']
+
     def __init__(self, obj_name, cls, position):
         self.obj_name = obj_name
         self.cls = cls
         self.position = position
+        self.resolver = None
+
+
+class ObjectIndex(object):
+    """
+    Objects of a model created in the model construction, available as
+    `_tx_objects` attribute of the model root. Used by `objects_of_type`.
+
+    Objects are kept in lists, one for each class, in the order of the
+    input, keyed by id of the class. Collected only if `object_index`
+    meta-model parameter is set. The index is rebuilt after object and model
+    processors are called. Other changes of the model are not tracked so
+    the objects removed from the model are kept in the index until it is
+    rebuilt (see `index_objects`).
+    """
+    __slots__ = ['_objs']
+
+    def __init__(self, objs=()):
+        self._objs = {}
+        for cls_objs in objs:
+            self._objs[id(type(cls_objs[0]))] = cls_objs
+
+    def add(self, obj):
+        cls_objs = self._objs.get(id(type(obj)))
+        if cls_objs is None:
+            self._objs[id(type(obj))] = [obj]
+        else:
+            cls_objs.append(obj)
+
+    def objects(self, cls):
+        """
+        Returns a list of the objects of the given class (not including
+        the objects of the inheriting classes).
+        """
+        return list(self._objs.get(id(cls), ()))
+
+    def classes(self):
+        """
+        Returns a list of the classes of the objects.
+        """
+        return [type(cls_objs[0]) for cls_objs in self._objs.values()]
+
+    def __len__(self):
+        return sum(len(cls_objs) for cls_objs in self._objs.values())
+
+    def __reduce__(self):
+        # Classes get new ids when unpickled.
+        return (ObjectIndex, (list(self._objs.values()),))
+
+
+class ReverseRefs(object):
+    """
+    Reverse reference index of a model collected during the reference
+    resolving if `reverse_refs` meta-model parameter is set. Available as
+    `_tx_reverse_refs` attribute of the model root.
+
+    For each referenced object keeps the objects referencing it and the
+    names of the reference attributes. References are kept in a flat list
+    starting with the referenced object followed by pairs of the referencing
+    object and the attribute name, keyed by id of the referenced object.
+    """
+    __slots__ = ['_refs']
+
+    def __init__(self, refs=()):
+        self._refs = {}
+        for ref_list in refs:
+            self._refs[id(ref_list[0])] = ref_list
+
+    def add(self, target, obj, attr_name):
+        ref_list = self._refs.get(id(target))
+        if ref_list is None:
+            self._refs[id(target)] = [target, obj, attr_name]
+        else:
+            ref_list.append(obj)
+            ref_list.append(attr_name)
+
+    def remove(self, target, obj, attr_name):
+        """
+        Removes one reference of the given object to the target.
+        """
+        ref_list = self._refs.get(id(target))
+        if ref_list is None:
+            return
+        for idx in range(1, len(ref_list), 2):
+            if ref_list[idx] is obj and ref_list[idx + 1] == attr_name:
+                del ref_list[idx:idx + 2]
+                break
+        if len(ref_list) == 1:
+            del self._refs[id(target)]
+
+    def referrers(self, target):
+        """
+        Returns a list of (object, attribute name) for each reference to the
+        given object in the order of resolving. An object referencing the
+        target more than once is given for each reference.
+        """
+        ref_list = self._refs.get(id(target))
+        if ref_list is None:
+            return []
+        return list(zip(ref_list[1::2], ref_list[2::2]))
+
+    def __contains__(self, target):
+        return id(target) in self._refs
+
+    def __iter__(self):
+        """
+        Iterates over the referenced objects.
+        """
+        return (ref_list[0] for ref_list in self._refs.values())
+
+    def __len__(self):
+        return len(self._refs)
+
+    def __reduce__(self):
+        # Objects get new ids when unpickled.
+        return (ReverseRefs, (list(self._refs.values()),))
+
+
+class ReferenceResolver(object):
+    """
+    Resolves cross-references of a model.
+
+    Attributes:
+        metamodel(TextXMetaModel): The meta-model of the model.
+        instances(dict): Named objects of the model keyed by id of the class
+            and the name. See TextXModelParser._instances.
+        pos_crossref_list(list): If given, RefRulePosition of each resolved
+            reference is appended for textx-tools support.
+        line_index(LineIndex): Line ends of the input used for error
+            reporting if the parser is not kept.
+        cache(dict): Data kept by scope providers during the resolving of
+            the model references (e.g. indexes of the model).
+            See textx.scoping.
+        reverse_refs(ReverseRefs): If not None, each reference resolved for
+            an object attribute is added to this index.
+    """
+    def __init__(self, parser, pos_crossref_list=None, keep_parser=True):
+        self.metamodel = parser.metamodel
+        self.instances = parser._instances
+        self.pos_crossref_list = pos_crossref_list
+        self.reverse_refs = parser._reverse_refs
+
+        if keep_parser:
+            self.parser = parser
+        else:
+            # Lazy references are resolved after the parser is discarded.
+            # Keep only the line ends instead of the input.
+            self.parser = None
+            self.line_index = parser.line_index
+
+        self.cache = {}
+
+        # Named objects which may be referenced by a reference to the class
+        # keyed by id of the class.
+        self._name_index = {}
+
+    def resolve(self, obj_ref, obj=None, attr=None):
+        """
+        Returns the object referenced by the given ObjCrossRef of the given
+        object attribute. Raises TextXSemanticError if the object doesn't
+        exist.
+
+        Args:
+            obj_ref(ObjCrossRef): The reference.
+            obj(object): The object holding the reference. If given, the
+                scope provider registered for the attribute is used.
+            attr(MetaAttr): The meta-attribute of the reference.
+        """
+        metamodel = self.metamodel
+        if metamodel.debug:
+            metamodel.dprint("Resolving obj crossref: {}:{}"
+                             .format(obj_ref.cls, obj_ref.obj_name))
+
+        provider = None
+        if obj is not None and metamodel.scope_providers:
+            provider = metamodel._scope_provider(type(obj).__name__,
+                                                 attr.name)
+        if provider is not None:
+            obj_ref.resolver = self
+            result = provider(obj, attr, obj_ref)
+        else:
+            result = self.lookup(obj_ref)
+
+        # Collect cross-references for textx-tools
+        if result:
+            if self.pos_crossref_list is not None:
+                self.pos_crossref_list.append(
+                    RefRulePosition(name=obj_ref.obj_name,
+                                    ref_pos_start=obj_ref.position,
+                                    ref_pos_end=obj_ref.position +
+                                    len(obj_ref.obj_name),
+                                    def_pos_start=result._tx_position,
+                                    def_pos_end=result._tx_position_end))
+
+        # As a fall-back search builtins if given
+        elif metamodel.builtins and obj_ref.obj_name in metamodel.builtins:
+            result = metamodel.builtins[obj_ref.obj_name]
+
+        else:
+            line, col = self.pos_to_linecol(obj_ref.position)
+            raise TextXSemanticError(
+                message='Unknown object "{}" of class "{}" at {}'
+                        .format(obj_ref.obj_name, obj_ref.cls.__name__,
+                                (line, col)),
+                line=line,
+                col=col,
+                err_type=UNKNOWN_OBJ_ERROR,
+                expected_obj_cls=obj_ref.cls)
+
+        if self.reverse_refs is not None and obj is not None:
+            self.reverse_refs.add(result, obj, attr.name)
+
+        return result
+
+    def lookup(self, obj_ref):
+        """
+        Returns the object with the referenced name among all objects of the
+        referenced class (or its descendants) or None.
+        """
+        objs = self._name_index.get(id(obj_ref.cls))
+        if objs is None:
+            objs = self._name_index[id(obj_ref.cls)] = \
+                self._named_objects(obj_ref.cls)
+        return objs.get(obj_ref.obj_name)
+
+    def pos_to_linecol(self, pos):
+        if self.parser is not None:
+            return self.parser.pos_to_linecol(pos)
+        return self.line_index.line_col(pos)
+
+    def _named_objects(self, cls):
+        classes = self.metamodel._ref_classes.get(id(cls))
+        if classes is None:
+            classes = _concrete_classes(cls, is_pyecore_enabled())
+        objs = [self.instances[id(c)] for c in classes
+                if id(c) in self.instances]
+        if len(objs) == 1:
+            return objs[0]
+        # The first class in the inheritance order takes precedence.
+        merged = {}
+        for class_objs in reversed(objs):
+            merged.update(class_objs)
+        return merged
+
+
+class LazyReference(object):
+    """
+    Data descriptor installed on meta-classes for reference attributes if
+    lazy references are enabled. Attribute holds ObjCrossRef (or a list of
+    them) which is resolved on the first access.
+
+    Attributes:
+        name(str): The name of the attribute.
+        slot(member_descriptor): The descriptor of the slot holding the
+            value if the class uses slots. Otherwise, the value is kept in
+            the instance dict.
+    """
+    def __init__(self, name, slot=None):
+        self.name = name
+        self.slot = slot
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        if cls is None:
+            cls = type(obj)
+        value = self.get_value(obj)
+        if type(value) is ObjCrossRef:
+            value = value.resolver.resolve(value, obj,
+                                           cls._tx_attrs[self.name])
+            self.__set__(obj, value)
+        elif type(value) is LazyReferenceList:
+            attr = cls._tx_attrs[self.name]
+            value = [v.resolver.resolve(v, obj, attr)
+                     if type(v) is ObjCrossRef else v for v in value]
+            self.__set__(obj, value)
+        return value
+
+    def __set__(self, obj, value):
+        if self.slot is not None:
+            self.slot.__set__(obj, value)
+        else:
+            obj.__dict__[self.name] = value
+
+    def get_value(self, obj):
+        """
+        Returns the attribute value without resolving references.
+        """
+        if self.slot is not None:
+            return self.slot.__get__(obj, type(obj))
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name)
+
+    def add_crossref(self, obj, crossref, many, index=None):
+        """
+        Adds the cross-ref to the attribute value. If index is given, the
+        cross-ref is already in the list at that position.
+        """
+        if many or index is not None:
+            value = self.get_value(obj)
+            if type(value) is not LazyReferenceList:
+                value = LazyReferenceList(value)
+                self.__set__(obj, value)
+            if index is None:
+                value.append(crossref)
+        else:
+            self.__set__(obj, crossref)
+
+
+class LazyReferenceList(list):
+    """
+    A list of lazy references held by LazyReference attributes before the
+    first access.
+    """
 
 
-class RefRulePosition(object):
+class RefRulePosition(_SlotsPickle):
     """
     Used for "go to definition" support in textx-languageserver
 
@@ -140,6 +822,9 @@ class RefRulePosition(object):
         def_pos_start(int): Starting position of referenced object
         def_pos_end(int): Ending position of referenced object
     """
+    __slots__ = ['name', 'ref_pos_start', 'ref_pos_end', 'def_pos_start',
+                 'def_pos_end']
+
     def __init__(self, name, ref_pos_start, ref_pos_end,
                  def_pos_start, def_pos_end):
         self.name = name
@@ -149,6 +834,562 @@ class RefRulePosition(object):
         self.def_pos_end = def_pos_end
 
 
+class LineIndex(_SlotsPickle):
+    """
+    Positions of the line ends (new line characters) of an input used to
+    convert positions to lines and columns. Built once for each parsed input
+    and kept in `_tx_line_index` attribute of the model root, so positions
+    can be converted after the parser is discarded.
+
+    Attributes:
+        line_ends(array): Positions of the new line characters.
+    """
+    __slots__ = ['line_ends']
+
+    def __init__(self, input_str):
+        self.line_ends = line_ends = array('l')
+        find = input_str.find
+        pos = find('\n')
+        while pos >= 0:
+            line_ends.append(pos)
+            pos = find('\n', pos + 1)
+
+    def line_col(self, position):
+        """
+        Returns (line, column) for the given position. Both are 1-based.
+        """
+        line_ends = self.line_ends
+        line = bisect.bisect_left(line_ends, position)
+        col = position - line_ends[line - 1] - 1 if line else position
+        return line + 1, col + 1
+
+    def line_cols(self, positions):
+        """
+        Returns a list of (line, column) for the given positions. Searches
+        for the ascending positions are started from the previous line.
+        """
+        line_ends = self.line_ends
+        result = []
+        line = 0
+        prev = -1
+        for position in positions:
+            lo = line if position >= prev else 0
+            line = bisect.bisect_left(line_ends, position, lo)
+            col = position - line_ends[line - 1] - 1 if line else position
+            result.append((line + 1, col + 1))
+            prev = position
+        return result
+
+
+class PositionIndex(_SlotsPickle):
+    """
+    Index of the model objects and references by their positions in the
+    input. The index is built on the first query and kept in
+    `_tx_position_index` attribute of the model root. Changes of the model
+    made afterwards are not tracked.
+
+    Objects are sorted by the start positions (an object is before the
+    objects it contains). As objects are either nested or disjoint, the
+    objects containing a position are the object found by a binary search
+    and its enclosing objects, which indexes are precomputed.
+    Positions are kept in arrays of integers.
+    """
+    __slots__ = ['objs', 'starts', 'ends', 'parents', 'refs', 'ref_starts']
+
+    def __init__(self, model):
+        metamodel = model._tx_metamodel
+        if not (metamodel.positions or metamodel.textx_tools_support):
+            raise TextXError('Positions of model objects are not kept '
+                             '(see positions meta-model parameter).')
+        objs = [obj for obj in iter_model(model)
+                if hasattr(obj, '_tx_position')]
+        # Sort is stable so objects with the same span stay in pre-order.
+        objs.sort(key=lambda obj: (obj._tx_position, -obj._tx_position_end))
+        self.objs = objs
+        self.starts = array('l', (obj._tx_position for obj in objs))
+        self.ends = array('l', (obj._tx_position_end for obj in objs))
+
+        # Index of the innermost enclosing object of each object or -1.
+        self.parents = parents = array('l')
+        enclosing = []
+        for idx, obj in enumerate(objs):
+            while enclosing and \
+                    (self.ends[enclosing[-1]] < obj._tx_position_end or
+                     self.ends[enclosing[-1]] <= obj._tx_position):
+                enclosing.pop()
+            parents.append(enclosing[-1] if enclosing else -1)
+            enclosing.append(idx)
+
+        refs = getattr(model, '_pos_crossref_list', None)
+        if refs is not None:
+            refs = sorted(refs, key=lambda ref: ref.ref_pos_start)
+            self.ref_starts = array('l', (r.ref_pos_start for r in refs))
+        self.refs = refs
+
+    @staticmethod
+    def of(model):
+        """
+        Returns the index of the given model root building it if needed.
+        """
+        index = getattr(model, '_tx_position_index', None)
+        if index is None:
+            index = PositionIndex(model)
+            try:
+                model._tx_position_index = index
+            except AttributeError:
+                # Slots class of the model root without model attributes.
+                pass
+        return index
+
+    def _innermost(self, position):
+        idx = bisect.bisect_right(self.starts, position) - 1
+        while idx >= 0 and self.ends[idx] <= position:
+            idx = self.parents[idx]
+        return idx
+
+    def object_at(self, position):
+        idx = self._innermost(position)
+        return self.objs[idx] if idx >= 0 else None
+
+    def objects_in_range(self, start, end):
+        # Objects starting before the range overlap it only if they
+        # contain its start.
+        enclosing = []
+        idx = self._innermost(start)
+        if idx >= 0 and self.starts[idx] == start:
+            idx = self.parents[idx]
+            while idx >= 0 and self.starts[idx] == start:
+                idx = self.parents[idx]
+        while idx >= 0:
+            enclosing.append(self.objs[idx])
+            idx = self.parents[idx]
+        enclosing.reverse()
+
+        first = bisect.bisect_left(self.starts, start)
+        last = bisect.bisect_left(self.starts, end)
+        return enclosing + self.objs[first:last]
+
+    def reference_at(self, position):
+        if self.refs is None:
+            raise TextXError('Positions of references are collected only '
+                             'if textx_tools_support is enabled.')
+        idx = bisect.bisect_right(self.ref_starts, position) - 1
+        if idx >= 0 and position < self.refs[idx].ref_pos_end:
+            return self.refs[idx]
+        return None
+
+
+# Value of the parse tree node of an object or an assignment which is not
+# constructed. See Projection.
+SKIPPED = object()
+
+
+class Projection(object):
+    """
+    Classes which objects are constructed when a model is loaded with
+    `include` or `exclude` classes. Objects of the needed classes are
+    constructed with all attributes. Objects of the other kept classes (the
+    classes which objects may contain the objects of the needed classes and
+    the model root) are stubs with the containment attributes only. The
+    rest of the input is only parsed.
+
+    References of the needed objects are resolved only if all objects they
+    may reference are needed. Otherwise, they are not assigned.
+
+    Attributes:
+        needed(int): Bitset of the needed common classes.
+        kept(int): Bitset of the common classes which objects are
+            constructed.
+    """
+    __slots__ = ['needed', 'kept', '_class_bits', '_subclass_bits',
+                 '_assigned']
+
+    def __init__(self, parser, include=None, exclude=None):
+        metamodel = parser.metamodel
+        self._class_bits = class_bits = metamodel._class_bits
+        self._subclass_bits = metamodel._subclass_bits
+        # Is the assignment done keyed by id of the builder.
+        self._assigned = {}
+
+        def type_bits(classes):
+            bits = 0
+            for cls in classes:
+                cls_bits = metamodel._type_bits(cls)
+                if cls_bits is None:
+                    raise KeyError('Unknown class "{}"'.format(cls))
+                bits |= cls_bits
+            return bits
+
+        root_cls = metamodel._builders[id(parser.parser_model.nodes[0])].cls
+        kept = self._subclass_bits.get(id(root_cls), 0)
+        if include is not None:
+            self.needed = type_bits(include)
+            kept |= self.needed
+            containers = metamodel._containers
+            for cls_id, bit in class_bits.items():
+                if bit & self.needed:
+                    kept |= containers.get(cls_id, 0)
+        else:
+            self.needed = ((1 << len(class_bits)) - 1) & ~type_bits(exclude)
+            kept |= self.needed
+        self.kept = kept
+
+    @staticmethod
+    def of(parser, include=None, exclude=None):
+        """
+        Returns the projection for the given include or exclude classes
+        (or class names) or None if all objects are constructed.
+        """
+        if include is None and exclude is None:
+            return None
+        if include is not None and exclude is not None:
+            raise ValueError('Only one of include and exclude may be given.')
+        if is_pyecore_enabled():
+            return None
+        return Projection(parser, include, exclude)
+
+    def constructs(self, cls):
+        """
+        Returns True if the objects of the given class are constructed.
+        """
+        return bool(self._class_bits.get(id(cls), 0) & self.kept)
+
+    def completes(self, cls):
+        """
+        Returns True if the objects of the given class are constructed with
+        all attributes.
+        """
+        return bool(self._class_bits.get(id(cls), 0) & self.needed)
+
+    def assigns(self, builder, cls):
+        """
+        Returns True if the assignment of the given builder is done for the
+        objects of the given class.
+        """
+        assigned = self._assigned.get(id(builder))
+        if assigned is None:
+            metaattr = builder.metaattr
+            bits = self._subclass_bits.get(id(metaattr.cls), 0)
+            if metaattr.cont and metaattr.ref:
+                assigned = bool(bits & self.kept)
+            elif not self.completes(cls):
+                assigned = False
+            elif builder.crossref:
+                assigned = bits & self.needed == bits
+            else:
+                assigned = True
+            self._assigned[id(builder)] = assigned
+        return assigned
+
+
+class ObjNode(Terminal):
+    """
+    Used in the direct construction mode as a replacement for the parse
+    sub-tree of a matched common rule.
+
+    Attributes:
+        obj(object): The model object constructed from the matched rule.
+        index(int): An index of the object in the list of objects constructed
+            during parsing.
+    """
+    __slots__ = ['obj', 'index', '_position_end']
+
+    def __init__(self, rule, position, position_end, obj, index):
+        super(ObjNode, self).__init__(rule, position, '')
+        self.obj = obj
+        self.index = index
+        self._position_end = position_end
+
+    @property
+    def position_end(self):
+        return self._position_end
+
+
+class ObjectBuilder(object):
+    """
+    Replaces `parse` method of the PEG rule of a common meta-class in the
+    direct construction mode. When the rule is matched the model object is
+    constructed from the matched sub-tree and the sub-tree is replaced by
+    an ObjNode.
+
+    Attributes:
+        rule(ParsingExpression): The PEG rule of a common meta-class.
+    """
+    def __init__(self, rule):
+        self.rule = rule
+
+    def __call__(self, parser):
+        rule = self.rule
+        c_pos = parser.position
+        result = type(rule).parse(rule, parser)
+        if type(result) is not NonTerminal or parser._recognizing:
+            # Already constructed object returned from the memoization cache
+            # or the input is only recognized.
+            return result
+
+        node = build_object(parser, result)
+        if parser.memoization:
+            rule._result_cache[c_pos] = (node, parser.position)
+        return node
+
+
+class ClassBuilder(object):
+    """
+    Precomputed information used for model construction from the matches
+    of the PEG rule of a meta-class.
+
+    Attributes:
+        cls(TextXClass): The meta-class.
+        rule_type: The type of the textX rule. See textx.const.
+        user_class(class): User supplied class used instead of the
+            meta-class or None.
+        convert(callable): A match filter for match rules or None.
+    """
+    __slots__ = ['cls', 'rule_type', 'user_class', 'convert']
+
+    def __init__(self, cls, rule_type, user_class, convert):
+        self.cls = cls
+        self.rule_type = rule_type
+        self.user_class = user_class
+        self.convert = convert
+
+
+class AssignmentBuilder(object):
+    """
+    Precomputed information used for model construction from the matches
+    of the PEG rule of an assignment.
+
+    Attributes:
+        attr_name(str): The name of the assigned attribute.
+        txa_attr_name(str): The name of the attribute used during model
+            construction. Mangled for user classes to prevent name clashing
+            with property setters.
+        op(str): The assignment operation. One of 'plain', 'optional',
+            'list', 'oneormore' or 'zeroormore'.
+        metaattr(MetaAttr): The meta-attribute.
+        crossref(bool): Is this a non-containing reference.
+        keep_crossref(bool): Is unresolved cross-ref assigned to the
+            attribute until it is resolved, which keeps the order of list
+            attributes. False for user classes and pyecore.
+    """
+    __slots__ = ['attr_name', 'txa_attr_name', 'op', 'metaattr', 'crossref',
+                 'keep_crossref']
+
+    def __init__(self, attr_name, txa_attr_name, op, metaattr,
+                 keep_crossref=True):
+        self.attr_name = attr_name
+        self.txa_attr_name = txa_attr_name
+        self.op = op
+        self.metaattr = metaattr
+        self.crossref = metaattr.ref and not metaattr.cont
+        self.keep_crossref = keep_crossref
+
+
+def setup_object_builders(parser):
+    """
+    Precomputes builders for all meta-class and assignment PEG rules used
+    by the given model parser. Builders are kept in `_builders` dict of the
+    meta-model keyed by id of the PEG rule. Match filters are kept in
+    `_converters` dict keyed by rule name.
+
+    If direct construction is enabled for the meta-model ObjectBuilder is
+    installed on each PEG rule of common meta-classes. Otherwise, previously
+    installed builders are removed.
+    """
+    from textx.metamodel import BASE_FILTERS
+
+    metamodel = parser.metamodel
+    pyecore = is_pyecore_enabled()
+    direct = metamodel.direct_construction and not pyecore
+
+    converters = dict(BASE_FILTERS)
+    converters.update(metamodel.match_filters)
+
+    base_classes = metamodel.namespaces['__base__']
+    builders = {}
+
+    rules = [parser.parser_model]
+    visited = set()
+    while rules:
+        rule = rules.pop()
+        if id(rule) in visited:
+            continue
+        visited.add(id(rule))
+        rules.extend(rule.nodes)
+
+        cls = getattr(rule, '_tx_class', None)
+        if not rule.root or cls is None:
+            continue
+
+        # Base type rules are shared by all meta-models.
+        base_cls = base_classes.get(rule.rule_name)
+        if base_cls is not None and base_cls._tx_peg_rule is rule:
+            cls = base_cls
+
+        builders[id(rule)] = ClassBuilder(
+            cls, cls._tx_type, metamodel.user_classes.get(rule.rule_name),
+            converters.get(rule.rule_name))
+
+        if cls._tx_type == RULE_COMMON:
+            _setup_assignment_builders(metamodel, rule, cls, builders,
+                                       pyecore)
+            if direct:
+                rule.parse = ObjectBuilder(rule)
+            else:
+                rule.__dict__.pop('parse', None)
+
+    metamodel._builders = builders
+    metamodel._converters = converters
+
+    ref_classes = {}
+    for namespace in metamodel.namespaces.values():
+        for cls in namespace.values():
+            ref_classes[id(cls)] = _concrete_classes(cls, pyecore)
+            if cls._tx_type == RULE_COMMON and not pyecore \
+                    and cls.__name__ not in metamodel.user_classes:
+                _setup_lazy_references(metamodel, cls)
+    metamodel._ref_classes = ref_classes
+
+    ref_targets = {}
+    for target_id, classes in ref_classes.items():
+        if len(classes) > 1:
+            for rank, cls in enumerate(classes):
+                ref_targets.setdefault(id(cls), []).append((target_id, rank))
+    metamodel._ref_targets = ref_targets
+
+    # Each common class gets a bit. The bitset of a class has the bits of
+    # its common classes (see TextXMetaModel.is_instance).
+    class_bits = {}
+    subclass_bits = {}
+    for cls_id, classes in ref_classes.items():
+        bits = 0
+        for cls in classes:
+            bit = class_bits.get(id(cls))
+            if bit is None:
+                bit = class_bits[id(cls)] = 1 << len(class_bits)
+            bits |= bit
+        subclass_bits[cls_id] = bits
+    metamodel._class_bits = class_bits
+    metamodel._subclass_bits = subclass_bits
+
+    # Common classes which instances may directly contain the instances of
+    # the class keyed by id of the class.
+    contained_in = {}
+    for namespace in metamodel.namespaces.values():
+        for cls in namespace.values():
+            if cls._tx_type != RULE_COMMON:
+                continue
+            container = ref_classes[id(cls)][0]
+            for attr in cls._tx_attrs.values():
+                if attr.cont and attr.ref:
+                    for contained in ref_classes.get(id(attr.cls), ()):
+                        contained_in.setdefault(id(contained), []) \
+                            .append(container)
+
+    containers = {}
+    for cls_id in contained_in:
+        bits = 0
+        visited = set([cls_id])
+        classes = [cls_id]
+        while classes:
+            for container in contained_in.get(classes.pop(), ()):
+                bits |= class_bits[id(container)]
+                if id(container) not in visited:
+                    visited.add(id(container))
+                    classes.append(id(container))
+        containers[cls_id] = bits
+    metamodel._containers = containers
+
+
+def _setup_lazy_references(metamodel, cls):
+    """
+    Installs LazyReference descriptors for reference attributes of the
+    given class if lazy references are enabled. Otherwise, previously
+    installed descriptors are removed.
+    """
+    lazy = metamodel.lazy_refs and not metamodel.textx_tools_support
+    for attr in cls._tx_attrs.values():
+        if not attr.ref or attr.cont:
+            continue
+        descriptor = cls.__dict__.get(attr.name)
+        if type(descriptor) is LazyReference:
+            if lazy:
+                continue
+            slot = descriptor.slot
+            if slot is not None:
+                setattr(cls, attr.name, slot)
+            else:
+                delattr(cls, attr.name)
+        elif lazy:
+            setattr(cls, attr.name, LazyReference(attr.name, descriptor))
+
+
+def _concrete_classes(cls, pyecore):
+    """
+    Returns a tuple of common classes which instances may be referenced by
+    a reference to the given class, i.e. the class itself or common
+    descendants of an abstract class in the depth-first order.
+    """
+    result = []
+    visited = set()
+    classes = [cls]
+    while classes:
+        cls = classes.pop()
+        if id(cls) in visited:
+            continue
+        visited.add(id(cls))
+        if cls._tx_type is RULE_ABSTRACT:
+            classes.extend(reversed(cls._tx_inh_by))
+        elif cls._tx_type == RULE_COMMON:
+            if pyecore and isinstance(cls, EClass):
+                cls = cls.python_class
+            result.append(cls)
+    return tuple(result)
+
+
+def _setup_assignment_builders(metamodel, cls_rule, cls, builders, pyecore):
+    """
+    Creates builders for assignments of the given common meta-class.
+    """
+    user = cls.__name__ in metamodel.user_classes
+    rules = [cls_rule]
+    while rules:
+        for rule in rules.pop().nodes:
+            if rule.rule_name.startswith('__asgn'):
+                attr_name = rule._attr_name
+                # Mangle attribute name to prevent name clashing with
+                # property setters on user classes
+                txa_attr_name = "_txa_%s" % attr_name \
+                    if user and not pyecore else attr_name
+                builders[id(rule)] = AssignmentBuilder(
+                    attr_name, txa_attr_name, rule.rule_name.split('_')[-1],
+                    cls._tx_attrs[attr_name],
+                    keep_crossref=not user and not pyecore)
+            elif not rule.root:
+                rules.append(rule)
+
+
+def read_file(file_name, encoding):
+    """
+    Returns the content of the given file decoded using the given encoding.
+    The file is memory-mapped and the decoded string is built straight from
+    the mapping, so the raw content is never copied to the heap next to the
+    decoded string. The mapping is closed as soon as the content is decoded.
+    Parser needs the whole decoded string so the content can't be decoded
+    lazily.
+    """
+    with open(file_name, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            # Empty files and files which can't be mapped (e.g. pipes).
+            return codecs.getreader(encoding)(f).read()
+        try:
+            return text(mapped, encoding)
+        finally:
+            mapped.close()
+
+
 def get_model_parser(top_rule, comments_model, **kwargs):
     """
     Creates model parser for the given language.
@@ -169,6 +1410,30 @@ def get_model_parser(top_rule, comments_model, **kwargs):
                 nodes=[top_rule, EOF()], rule_name='Model', root=True)
             self.comments_model = comments_model
 
+            # Memoization caches are kept in the PEG rules which are shared
+            # by the clones of this parser so parsing with memoization is
+            # serialized.
+            self._memo_lock = threading.RLock()
+
+            # The parser this parser is cloned from. See clone.
+            self._origin = None
+
+            self._init_state()
+
+        def _init_state(self):
+            """
+            Initializes the state of a single parse and model construction.
+            """
+            self.parse_tree = None
+            self.input = None
+            self.line_ends = []
+            self._line_index = None
+            self.comment_positions = {}
+
+            # Is the input only recognized without constructing the model.
+            # See recognize.
+            self._recognizing = False
+
             # Stack for metaclass instances
             self._inst_stack = []
 
@@ -176,10 +1441,101 @@ def get_model_parser(top_rule, comments_model, **kwargs):
             # { id(class): { obj.name: obj}}
             self._instances = {}
 
+            # Named objects by abstract classes with more than one common
+            # descendant, used to resolve references during construction.
+            # { id(abstract class): { obj.name: (rank of obj class, obj)}}
+            # See TextXMetaModel._ref_targets.
+            self._ref_index = {}
+
+            # Ids of the named objects replaced in the registered names by
+            # the objects of the same name defined later. References to them
+            # resolved during construction are resolved again.
+            self._shadowed = set()
+
+            # Classes constructed if only a part of the model is needed.
+            # See Projection.
+            self._projection = None
+
+            # Reverse reference index of the model if collected. The
+            # meta-model is not set yet when the parser is constructed.
+            metamodel = getattr(self, 'metamodel', None)
+            self._reverse_refs = ReverseRefs() \
+                if metamodel is not None and metamodel.reverse_refs else None
+
+            # Objects created in the model construction by their classes.
+            # None if the objects are not indexed (the index is not requested,
+            # streamed and lean models).
+            self._objects = ObjectIndex() \
+                if metamodel is not None and metamodel.object_index \
+                and not metamodel.lean else None
+
             # List to keep track of all cross-ref that need to be resolved
-            # Contained elements are tuples: (instance, metaattr, cross-ref)
+            # Contained elements are tuples:
+            #   (instance, metaattr, cross-ref, index)
+            # where index is the position of the cross-ref in the list
+            # attribute value if it is already there or None.
             self._crossrefs = []
 
+            # State of the direct construction mode. Objects are constructed
+            # during parsing and some of them may be discarded by
+            # backtracking so the bookkeeping is done by object indexes.
+            # Objects in the order of construction
+            self._direct_objs = []
+            # Index of the containing object or -1 for each object
+            self._direct_parents = []
+            # (position, -end position) of each object if positions are not
+            # kept in the objects
+            self._direct_spans = []
+            # Tuples: (object index, metaattr, cross-ref)
+            self._direct_crossrefs = []
+            # Tuples: (object index, attribute name, position)
+            self._direct_mult_assignments = []
+
+        def clone(self):
+            """
+            Returns a new parser for this language which shares the
+            configuration and the parser model with this parser but has its
+            own parse state. Meta-model uses a new clone for each model so
+            that models can be parsed concurrently from multiple threads and
+            the parser can be reentered (e.g. from object processors).
+            """
+            parser = copy.copy(self)
+            parser._init_state()
+            parser._origin = self
+            return parser
+
+        def _keep_line_index(self, parser):
+            """
+            Keeps the line index of the input of the given clone so that
+            positions of the last model parsed by a clone can be converted
+            by this parser (e.g. `metamodel.parser.pos_to_linecol`). The
+            input and the parse tree are not kept. If models are parsed
+            concurrently, the index of any of the recently parsed models may
+            be kept.
+            """
+            self._line_index = parser.line_index
+
+        @property
+        def line_index(self):
+            """
+            LineIndex of the current input built on the first use.
+            """
+            if self._line_index is None:
+                self._line_index = LineIndex(self.input)
+            return self._line_index
+
+        def pos_to_linecol(self, pos):
+            return self.line_index.line_col(pos)
+
+        def parse(self, _input, file_name=None):
+            self._line_index = None
+            if self.memoization:
+                with self._memo_lock:
+                    return super(TextXModelParser, self).parse(
+                        _input, file_name=file_name)
+            return super(TextXModelParser, self).parse(_input,
+                                                       file_name=file_name)
+
         def _parse(self):
             try:
                 return self.parser_model.parse(self)
@@ -190,17 +1546,18 @@ def get_model_parser(top_rule, comments_model, **kwargs):
                                        col=col,
                                        expected_rules=e.rules)
 
-        def get_model_from_file(self, file_name, encoding, debug):
+        def get_model_from_file(self, file_name, encoding, debug,
+                                include=None, exclude=None):
             """
             Creates model from the parse tree from the previous parse call.
             If file_name is given file will be parsed before model
             construction.
             """
-            with codecs.open(file_name, 'r', encoding) as f:
-                model_str = f.read()
+            model_str = read_file(file_name, encoding)
 
             model = self.get_model_from_str(model_str, file_name=file_name,
-                                            debug=debug)
+                                            debug=debug, include=include,
+                                            exclude=exclude)
 
             # Register filename of the model for later use.
             try:
@@ -210,9 +1567,18 @@ def get_model_parser(top_rule, comments_model, **kwargs):
                 pass
             return model
 
-        def get_model_from_str(self, model_str, file_name=None, debug=None):
+        def get_model_from_str(self, model_str, file_name=None, debug=None,
+                               include=None, exclude=None):
             """
             Parses given string and creates model object graph.
+
+            Args:
+                include(list): If given, only the objects of these classes
+                    (or class names) and the stubs of their containers are
+                    constructed. See Projection.
+                exclude(list): If given, the objects of these classes (or
+                    class names) and the objects contained in them are not
+                    constructed.
             """
             old_debug_state = self.debug
 
@@ -220,32 +1586,699 @@ def get_model_parser(top_rule, comments_model, **kwargs):
                 if debug is not None:
                     self.debug = debug
 
+                self._projection = Projection.of(self, include, exclude)
+
                 if self.debug:
                     self.dprint("*** PARSING MODEL ***")
 
+                # Names of the objects from the previous model must not be
+                # resolved.
+                self._instances = {}
+                self._ref_index = {}
+                self._shadowed = set()
                 self.parse(model_str, file_name=file_name)
+                if self._origin is not None and not self.metamodel.lean:
+                    self._origin._keep_line_index(self)
                 # Transform parse tree to model. Skip root node which
                 # represents the whole file ending in EOF.
                 model = parse_tree_to_objgraph(self, self.parse_tree[0])
             finally:
                 if debug is not None:
                     self.debug = old_debug_state
+                self._projection = None
+                if self.metamodel.lean:
+                    # Nothing of the parse outlives the model construction.
+                    self._init_state()
+                else:
+                    if self.metamodel.direct_construction:
+                        self._clear_direct_state()
+                    # Positions where comments are parsed are needed only
+                    # during parsing.
+                    self.comment_positions = {}
 
             try:
                 model._tx_filename = None
                 model._tx_metamodel = self.metamodel
+                if not self.metamodel.lean:
+                    model._tx_line_index = self.line_index
             except AttributeError:
                 # model is some primitive python type (e.g. str)
                 pass
             return model
 
+        def recognize_file(self, file_name, encoding, check_refs=False):
+            """
+            Checks the model in the given file without constructing it.
+            See recognize.
+            """
+            model_str = read_file(file_name, encoding)
+            self.recognize(model_str, file_name=file_name,
+                           check_refs=check_refs)
+
+        def recognize(self, model_str, file_name=None, check_refs=False):
+            """
+            Checks the given string without constructing the model. Only the
+            PEG match is done and the matched input is dropped. Raises
+            TextXSyntaxError for the first syntax error.
+
+            Args:
+                check_refs(bool): If True, the names of references are
+                    checked to be defined by objects of the referenced class
+                    (or its descendants) anywhere in the input or by
+                    built-in objects. References of the attributes with
+                    scope providers are not checked. Raises
+                    TextXSemanticError for the first unknown name.
+            """
+            old_reduce_tree = self.reduce_tree
+            try:
+                self._recognizing = True
+                # Assignments are found in the nodes which are reduced.
+                self.reduce_tree = not check_refs
+                self.parse(model_str, file_name=file_name)
+                if check_refs:
+                    check_references(self, self.parse_tree[0])
+            finally:
+                self.reduce_tree = old_reduce_tree
+                self._init_state()
+
+        def get_model_iter_from_file(self, file_name, encoding, debug):
+            """
+            Returns an iterator over the objects of the streamed
+            repetition of the root rule for the model in the given file.
+            See get_model_iter_from_str.
+            """
+            model_str = read_file(file_name, encoding)
+
+            return self.get_model_iter_from_str(model_str,
+                                                file_name=file_name,
+                                                debug=debug)
+
+        def get_model_iter_from_str(self, model_str, file_name=None,
+                                    debug=None):
+            """
+            Returns an iterator over the objects matched by the repetition
+            assignment ('*=' or '+=') of the root rule. Each object is
+            constructed, its references are resolved and object processors
+            are called as soon as it is parsed. Objects are not added to the
+            model root and the parse tree of each object is discarded.
+
+            References are resolved to the objects already parsed which are
+            still alive (i.e. referenced by the caller or by other live
+            objects). References to objects defined later in the input or
+            to released objects raise TextXSemanticError.
+
+            This parser can't be used for other models until the iteration
+            is finished. See clone.
+            """
+            stream_rules = self._stream_rules()
+            return self._model_iter(stream_rules, model_str, file_name,
+                                    debug)
+
+        def _stream_rules(self):
+            """
+            Returns the PEG rule of the root meta-class, its repetition
+            assignment rule and the lists of PEG rules matched before and
+            after the repetition.
+            """
+            root_rule = self.parser_model.nodes[0]
+            builder = self.metamodel._builders.get(id(root_rule))
+            if builder is not None and builder.rule_type == RULE_COMMON \
+                    and isinstance(root_rule, Sequence):
+                repetitions = [idx for idx, rule in enumerate(root_rule.nodes)
+                               if rule.rule_name in ('__asgn_zeroormore',
+                                                     '__asgn_oneormore')]
+                if len(repetitions) == 1:
+                    idx = repetitions[0]
+                    suffix = root_rule.nodes[idx + 1:]
+                    if not any(_has_assignments(r) for r in suffix):
+                        return (root_rule, root_rule.nodes[idx],
+                                root_rule.nodes[:idx],
+                                suffix + self.parser_model.nodes[1:])
+
+            raise TextXError(
+                'Model can be streamed only if the root rule is a common '
+                'rule with a single repetition assignment ("*=" or "+=") '
+                'not followed by other assignments.')
+
+        def _model_iter(self, stream_rules, model_str, file_name, debug):
+            root_rule, repetition, prefix, suffix = stream_rules
+            direct = self.metamodel.direct_construction and \
+                not is_pyecore_enabled()
+            positions = self.metamodel.positions or \
+                self.metamodel.textx_tools_support
+            old_debug_state = self.debug
+            old_ws, old_skipws = self.ws, self.skipws
+
+            try:
+                if debug is not None:
+                    self.debug = debug
+
+                if self.debug:
+                    self.dprint("*** STREAMING MODEL ***")
+
+                # Streamed objects are not kept.
+                self._objects = None
+                self._start_stream(model_str, file_name)
+                if root_rule.ws is not None:
+                    self.ws = root_rule.ws
+                if root_rule.skipws is not None:
+                    self.skipws = root_rule.skipws
+
+                # The model root is constructed from the matches before the
+                # repetition. Empty EOF match marks the start of the
+                # repetition so that the root node is never empty.
+                results = []
+                for rule in prefix:
+                    result = self._stream_parse(rule)
+                    if result:
+                        results.append(result)
+                results.append(Terminal(suffix[-1], self.position, ''))
+                node = NonTerminal(root_rule, flatten(results))
+                if direct:
+                    node = build_object(self, node)
+                model = parse_tree_to_objgraph(self, node)
+                del node, results
+                self._stream_object_done()
+                model._tx_filename = file_name
+                model._tx_metamodel = self.metamodel
+                if not self.metamodel.lean:
+                    model._tx_line_index = self.line_index
+
+                if repetition.eolterm:
+                    self.eolterm = True
+                count = 0
+                while True:
+                    objs = self._stream_object(
+                        repetition.nodes[0],
+                        repetition.sep if count else None, model)
+                    if not objs:
+                        break
+                    count += 1
+                    yield objs.pop()
+                self.eolterm = False
+
+                if not count and repetition.rule_name == '__asgn_oneormore':
+                    # Raises syntax error
+                    self._stream_parse(repetition.nodes[0])
+
+                for rule in suffix:
+                    if rule is suffix[-1] and positions:
+                        model._tx_position_end = self.position
+                    self._stream_parse(rule)
+
+            finally:
+                self.debug = old_debug_state
+                self.ws, self.skipws = old_ws, old_skipws
+                self.eolterm = False
+                if direct:
+                    self._clear_direct_state()
+                del self._inst_stack[:]
+                del self._crossrefs[:]
+                self._instances = {}
+                self._ref_index = {}
+                self._shadowed = set()
+                self.nm = None
+                if self.metamodel.lean:
+                    self._init_state()
+
+        def _start_stream(self, model_str, file_name):
+            """
+            Initializes the parser state as done by Parser.parse.
+            """
+            self.position = 0
+            self.nm = None
+            self.line_ends = []
+            self._line_index = None
+            self.input = model_str
+            self.file_name = file_name
+            self.comment_positions = {}
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.parse_tree = None
+            self._instances = {}
+            self._ref_index = {}
+            self._shadowed = set()
+
+        def _stream_match(self, rule, sep=None):
+            """
+            Matches the given rule, preceded by the separator if given, at
+            the current position. Memoization caches are cleared afterwards
+            as the input before the current position is never parsed again.
+            """
+            if self.memoization:
+                self._memo_lock.acquire()
+            try:
+                if sep:
+                    sep.parse(self)
+                return rule.parse(self)
+            finally:
+                if self.memoization:
+                    self._clear_caches()
+                    self._memo_lock.release()
+
+        def _stream_parse(self, rule):
+            try:
+                return self._stream_match(rule)
+            except NoMatch as e:
+                line, col = e.parser.pos_to_linecol(e.position)
+                raise TextXSyntaxError(message=text(e),
+                                       line=line,
+                                       col=col,
+                                       expected_rules=e.rules)
+
+        def _stream_object(self, rule, sep, parent):
+            """
+            Parses and constructs the next object of the streamed
+            repetition. Returns a list with the object or an empty list if
+            the repetition is finished. The object is not kept in a local
+            variable of the iterator so that it is released as soon as the
+            caller drops it.
+            """
+            c_pos = self.position
+            try:
+                node = self._stream_match(rule, sep)
+            except NoMatch:
+                self.position = c_pos
+                return []
+            if not node:
+                return []
+
+            obj = parse_tree_to_objgraph(self, node, parent)
+            self._stream_object_done()
+            return [obj]
+
+        def _stream_object_done(self):
+            """
+            Releases the parser state kept for the constructed object.
+            Already parsed input is never parsed again.
+            """
+            if self.metamodel.direct_construction:
+                self._clear_direct_state()
+            self.comment_positions = {}
+
+            # Registered names must not keep objects alive.
+            for key, names in list(self._instances.items()):
+                if type(names) is dict:
+                    self._instances[key] = WeakValueDictionary(names)
+            self._ref_index = {}
+            self._shadowed = set()
+
+        def _clear_direct_state(self):
+            del self._direct_objs[:]
+            del self._direct_parents[:]
+            del self._direct_spans[:]
+            del self._direct_crossrefs[:]
+            del self._direct_mult_assignments[:]
+            del self._crossrefs[:]
+
     return TextXModelParser(**kwargs)
 
 
-def parse_tree_to_objgraph(parser, parse_tree):
+def _has_assignments(rule):
+    """
+    Checks if the given PEG rule contains assignments of the meta-class it
+    belongs to.
+    """
+    rules = [rule]
+    while rules:
+        rule = rules.pop()
+        if rule.rule_name.startswith('__asgn'):
+            return True
+        if not rule.root:
+            rules.extend(rule.nodes)
+    return False
+
+
+def build_object(parser, node):
+    """
+    Constructs model object from the sub-tree of a matched common rule in
+    the direct construction mode. Nested objects are already constructed and
+    represented by ObjNode instances in the sub-tree.
+
+    Operations that must not be done for objects which might be discarded
+    by backtracking (user classes initialization, registration of names,
+    cross-ref resolving) are postponed until parsing is finished.
+    See direct_model.
+    """
+    metamodel = parser.metamodel
+    builders = metamodel._builders
+    cls = builders[id(node.rule)].cls
+    user = builders[id(node.rule)].user_class is not None
+
+    projection = parser._projection
+    if projection is not None and not projection.constructs(cls):
+        return ObjNode(node.rule, node.position, node.position_end, SKIPPED,
+                       -1)
+
+    if parser.debug:
+        parser.dprint("CREATING INSTANCE {}".format(node.rule_name))
+
+    inst = cls.__new__(cls)
+    metamodel._init_obj_attrs(inst, user=user)
+    if metamodel.positions or metamodel.textx_tools_support:
+        inst._tx_position = node.position
+        inst._tx_position_end = node.position_end
+    else:
+        # Spans are needed to index the objects in the order of the input.
+        parser._direct_spans.append((node.position, -node.position_end))
+
+    index = len(parser._direct_objs)
+    parser._direct_objs.append(inst)
+    parser._direct_parents.append(-1)
+
+    for n in node:
+        if n.rule_name.startswith('__asgn'):
+            builder = builders[id(n.rule)]
+            if projection is None or projection.assigns(builder, cls):
+                _direct_assignment(parser, inst, index, builder, n)
+        else:
+            _direct_value(parser, n, index)
+
+    return ObjNode(node.rule, node.position, node.position_end, inst, index)
+
+
+def _direct_value(parser, node, parent_index):
+    """
+    Returns a value of the given node in the direct construction mode and
+    registers containment for constructed objects.
+    """
+    metamodel = parser.metamodel
+    while type(node) is not ObjNode:
+        if isinstance(node, Terminal):
+            convert = metamodel._converters.get(node.rule_name)
+            return convert(node.value) if convert else node.value
+        if metamodel._builders[id(node.rule)].rule_type != RULE_ABSTRACT:
+            return match_value(metamodel, node)
+        node = node[0]
+
+    if node.obj is not SKIPPED:
+        parser._direct_parents[node.index] = parent_index
+    return node.obj
+
+
+def match_value(metamodel, node):
+    """
+    Returns converted value of the parse tree node produced by a match rule.
+    """
+    converters = metamodel._converters
+    if isinstance(node, Terminal):
+        convert = converters.get(node.rule_name)
+        return convert(node.value) if convert else node.value
+
+    # Depth-first with an explicit stack. Values of processed nodes
+    # are collected on the values stack.
+    values = []
+    stack = [(node, False)]
+    while stack:
+        node, children_processed = stack.pop()
+        if isinstance(node, Terminal):
+            convert = converters.get(node.rule_name)
+            values.append(convert(node.value) if convert else node.value)
+        elif not children_processed:
+            stack.append((node, True))
+            stack.extend((n, False) for n in reversed(node))
+        elif len(node) > 1:
+            # If RHS of assignment is NonTerminal it is a product of
+            # complex match rule. Convert nodes to text and do the join.
+            value = "".join([text(v) for v in values[-len(node):]])
+            del values[-len(node):]
+            convert = metamodel._builders[id(node.rule)].convert
+            values.append(convert(value) if convert else value)
+        elif is_pyecore_enabled():
+            # if the cls is an Enumeration, we retrieve the literal
+            # from the string value
+            cls = metamodel._builders[id(node.rule)].cls
+            if type(cls) is EEnum:
+                values[-1] = cls.getEEnumLiteral(values[-1])
+
+    return values[0]
+
+
+def check_references(parser, parse_tree):
+    """
+    Checks the names of the references in the given parse tree without
+    constructing the model. See TextXModelParser.recognize.
+    """
+    metamodel = parser.metamodel
+    builders = metamodel._builders
+    builtins = metamodel.builtins or {}
+
+    # Names defined by the objects keyed by id of their classes.
+    names = {}
+    # (name, meta-attribute, position) of each reference.
+    refs = []
+
+    # Nodes with the class of the object they belong to.
+    stack = [(parse_tree, None)]
+    while stack:
+        node, cls = stack.pop()
+        if isinstance(node, Terminal):
+            continue
+        builder = builders.get(id(node.rule))
+        if type(builder) is ClassBuilder:
+            if builder.rule_type == RULE_MATCH:
+                continue
+            if builder.rule_type == RULE_COMMON:
+                cls = builder.cls
+        elif builder is not None:
+            if builder.crossref:
+                if metamodel.scope_providers and metamodel._scope_provider(
+                        cls.__name__, builder.attr_name):
+                    continue
+                values = (node[0],) if builder.op == 'plain' else \
+                    [n for n in node if n.rule_name != 'sep']
+                refs.extend((match_value(metamodel, n), builder.metaattr,
+                             n.position) for n in values)
+                continue
+            if builder.attr_name == 'name' and builder.op == 'plain':
+                names.setdefault(id(cls), set()).add(
+                    match_value(metamodel, node[0]))
+                continue
+        stack.extend((n, cls) for n in reversed(node))
+
+    for name, metaattr, position in refs:
+        classes = metamodel._ref_classes.get(id(metaattr.cls), ())
+        if any(name in names.get(id(c), ()) for c in classes):
+            continue
+        if name in builtins:
+            continue
+        line, col = parser.pos_to_linecol(position)
+        raise TextXSemanticError(
+            message='Unknown object "{}" of class "{}" at {}'
+                    .format(name, metaattr.cls.__name__, (line, col)),
+            line=line,
+            col=col,
+            err_type=UNKNOWN_OBJ_ERROR,
+            expected_obj_cls=metaattr.cls)
+
+
+def _direct_assignment(parser, inst, index, builder, node):
+    """
+    Handles assignment in the direct construction mode.
+    """
+    op = builder.op
+    txa_attr_name = builder.txa_attr_name
+    metaattr = builder.metaattr
+
+    if parser.debug:
+        parser.dprint('Handling assignment: {} {}...'
+                      .format(op, txa_attr_name))
+
+    if op == 'optional':
+        setattr(inst, txa_attr_name, True)
+
+    elif op == 'plain':
+        attr_value = getattr(inst, txa_attr_name)
+        if attr_value and type(attr_value) is not list:
+            parser._direct_mult_assignments.append((index, builder.attr_name,
+                                                    node.position))
+
+        value = _direct_value(parser, node[0], index)
+        if value is SKIPPED:
+            return
+
+        if builder.crossref:
+            # If this is non-containing reference create ObjCrossRef
+            parser._direct_crossrefs.append(
+                (index, metaattr, ObjCrossRef(obj_name=value,
+                                              cls=metaattr.cls,
+                                              position=node[0].position)))
+        elif type(attr_value) is list:
+            attr_value.append(value)
+        else:
+            setattr(inst, txa_attr_name, value)
+
+    else:
+        for n in node:
+            # If the node is separator skip
+            if n.rule_name != 'sep':
+                value = _direct_value(parser, n, index)
+                if value is SKIPPED:
+                    continue
+
+                if builder.crossref:
+                    # If this is non-containing reference create ObjCrossRef
+                    parser._direct_crossrefs.append(
+                        (index, metaattr, ObjCrossRef(obj_name=value,
+                                                      cls=metaattr.cls,
+                                                      position=n.position)))
+                    continue
+
+                if getattr(inst, txa_attr_name, None) is None:
+                    setattr(inst, txa_attr_name, [])
+                getattr(inst, txa_attr_name).append(value)
+
+
+def direct_model(parser, node, parent=None):
+    """
+    Finishes model construction in the direct construction mode.
+    Objects that are not contained in the model (i.e. discarded by
+    backtracking) are dropped. For the rest of the objects, in the order of
+    construction (depth-first), the user classes are initialized and the
+    names are registered for cross-ref resolving.
+
+    Args:
+        parent(object): If given, the constructed object is contained in
+            this object.
+
+    Returns:
+        model, objects of the model
+    """
+    metamodel = parser.metamodel
+    objs = parser._direct_objs
+    parents = parser._direct_parents
+
+    # The model root is contained in a virtual object with the index past
+    # the last constructed object.
+    root_index = len(objs)
+    model = _direct_value(parser, node, root_index)
+
+    # An object is contained in the model if its container is. Containers
+    # are always constructed after contained objects.
+    live = bytearray(root_index + 1)
+    live[root_index] = 1
+    for idx in range(root_index - 1, -1, -1):
+        parent_index = parents[idx]
+        if parent_index >= 0 and live[parent_index]:
+            live[idx] = 1
+
+    mult_assignments = [m for m in parser._direct_mult_assignments
+                        if live[m[0]]]
+    if mult_assignments:
+        _, attr_name, position = min(mult_assignments, key=lambda m: m[2])
+        raise TextXSemanticError(
+            message="Multiple assignments to attribute {} at {}"
+                    .format(attr_name, parser.pos_to_linecol(position)),
+            err_type=MULT_ASSIGN_ERROR)
+
+    root = model if parent is None else parent._tx_model
+
+    model_objs = []
+    for idx, inst in enumerate(objs):
+        if not live[idx]:
+            continue
+        model_objs.append(inst)
+        inst._tx_model = root
+
+        user = inst.__class__.__name__ in metamodel.user_classes
+        container = objs[parents[idx]] if parents[idx] != root_index \
+            else parent
+        if container is not None:
+            if user:
+                inst._txa_parent = container
+            else:
+                inst.parent = container
+
+        if user:
+            try:
+                attrs = {}
+                if hasattr(inst, '_txa_parent'):
+                    attrs['parent'] = inst._txa_parent
+                    del inst._txa_parent
+                for a in inst.__class__._tx_attrs:
+                    attrs[a] = getattr(inst, "_txa_%s" % a)
+                    delattr(inst, "_txa_%s" % a)
+                inst.__init__(**attrs)
+            except TypeError as e:
+                # Add class name information in case of
+                # wrong constructor parameters
+                e.args += ("for class %s" % inst.__class__.__name__,)
+                parser.dprint(traceback.print_exc())
+                raise e
+
+        # Special case for 'name' attrib. It is used for cross-referencing
+        if hasattr(inst, 'name') and inst.name:
+            _register_instance(parser, inst)
+
+    # Containers are constructed after contained objects so the objects
+    # are indexed in the order of the input.
+    if parser._objects is not None:
+        if parser._direct_spans:
+            spans = [span for idx, span in enumerate(parser._direct_spans)
+                     if live[idx]]
+            ordered = [inst for _, inst in sorted(zip(spans, model_objs),
+                                                  key=lambda s: s[0])]
+        else:
+            ordered = sorted(model_objs, key=lambda o: (o._tx_position,
+                                                        -o._tx_position_end))
+        for inst in ordered:
+            parser._objects.add(inst)
+
+    # Cross-refs are resolved in the order of appearance in the input.
+    crossrefs = [c for c in parser._direct_crossrefs if live[c[0]]]
+    crossrefs.sort(key=lambda c: c[2].position)
+    parser._crossrefs = [(objs[idx], metaattr, crossref, None)
+                         for idx, metaattr, crossref in crossrefs]
+
+    return model, model_objs
+
+
+def _register_instance(parser, inst):
+    """
+    Registers the named object for cross-ref resolving.
+    """
+    cls = inst.__class__
+    name = inst.name
+
+    # Objects of each class are in its own namespace
+    objs = parser._instances.get(id(cls))
+    if objs is None:
+        objs = parser._instances[id(cls)] = {}
+    registered = objs.get(name)
+    if registered is not None and registered is not inst:
+        parser._shadowed.add(id(registered))
+    objs[name] = inst
+
+    for target_id, rank in parser.metamodel._ref_targets.get(id(cls), ()):
+        objs = parser._ref_index.get(target_id)
+        if objs is None:
+            objs = parser._ref_index[target_id] = {}
+        # The first class in the inheritance order takes precedence.
+        registered = objs.get(name)
+        if registered is None or registered[0] >= rank:
+            if registered is not None and registered[1] is not inst:
+                parser._shadowed.add(id(registered[1]))
+            objs[name] = (rank, inst)
+
+
+# Marks that the processing of the parse tree node continues on the stack.
+PUSHED = object()
+
+# Kinds of stack frames used in model construction: nodes of common rules,
+# plain assignments and repetition assignments.
+FRAME_OBJECT = 'object'
+FRAME_PLAIN = 'plain'
+FRAME_LIST = 'list'
+
+
+def parse_tree_to_objgraph(parser, parse_tree, parent=None):
     """
     Transforms parse_tree to object graph representing model in a
     new language.
+
+    Args:
+        parent(object): If given, the constructed object is contained in
+            this object instead of being the model root.
     """
 
     metamodel = parser.metamodel
@@ -254,354 +2287,446 @@ def parse_tree_to_objgraph(parser, parse_tree):
         pos_rule_dict = {}
         pos_crossref_list = []
 
-    def process_match(nt):
-        """
-        Process subtree for match rules.
-        """
-        if isinstance(nt, Terminal):
-            return metamodel.convert(nt.value, nt.rule_name)
-        else:
-            # If RHS of assignment is NonTerminal it is a product of
-            # complex match rule. Convert nodes to text and do the join.
-            if len(nt) > 1:
-                return metamodel.convert(
-                    "".join([text(process_match(n)) for n in nt]),
-                    nt.rule_name)
-            else:
-                value = process_match(nt[0])
-                if is_pyecore_enabled():
-                    # if the cls is an Enumeration, we retrieve the literal
-                    # from the string value
-                    cls = metamodel[nt.rule_name]
-                    if type(cls) is EEnum:
-                        value = cls.getEEnumLiteral(value)
-                return value
+    builders = metamodel._builders
+    converters = metamodel._converters
+    pyecore = is_pyecore_enabled()
+
+    # References to already registered objects are resolved during the
+    # construction. Positions of cross-refs collected for textx-tools must be
+    # sorted so all references are resolved afterwards in that case.
+    immediate = not metamodel.textx_tools_support
+    ref_classes = metamodel._ref_classes
+    objects = parser._objects
+    positions = metamodel.positions or metamodel.textx_tools_support
+    projection = parser._projection
+
+    def convert(node):
+        convert = converters.get(node.rule_name)
+        return convert(node.value) if convert else node.value
 
     def __is_collection(col):
-        if is_pyecore_enabled():
+        if pyecore:
             return isinstance(col, ECollection)
         return type(col) is list
 
     def __is_collection_or_enum(col):
-        if is_pyecore_enabled():
+        if pyecore:
             return isinstance(col, (ECollection, EEnumLiteral))
         return type(col) is list
 
-    def process_node(node):
-        if isinstance(node, Terminal):
-            return metamodel.convert(node.value, node.rule_name)
-
-        assert node.rule.root,\
-            "Not a root node: {}".format(node.rule.rule_name)
-        # If this node is created by some root rule
-        # create metaclass instance.
-        inst = None
-        if not node.rule_name.startswith('__asgn'):
-            # If not assignment
-            # Get class
-            mclass = node.rule._tx_class
-
-            if mclass._tx_type == RULE_ABSTRACT:
-                # If this meta-class is product of abstract rule replace it
-                # with matched concrete meta-class down the inheritance tree.
-                # Abstract meta-class should never be instantiated.
-                return process_node(node[0])
-            elif mclass._tx_type == RULE_MATCH:
-                # If this is a product of match rule handle it as a RHS
-                # of assignment and return converted python type.
-                return process_match(node)
+    def enter_node(node, stack):
+        """
+        Starts processing of the given node. If the node has sub-nodes that
+        must be processed a new frame is pushed on the stack and PUSHED is
+        returned. Otherwise, the value of the node is returned.
+        """
+        while not isinstance(node, Terminal):
+            assert node.rule.root,\
+                "Not a root node: {}".format(node.rule.rule_name)
+            builder = builders[id(node.rule)]
+
+            if type(builder) is ClassBuilder:
+                if builder.rule_type == RULE_ABSTRACT:
+                    # If this meta-class is product of abstract rule replace
+                    # it with matched concrete meta-class down the
+                    # inheritance tree. Abstract meta-class should never be
+                    # instantiated.
+                    node = node[0]
+                    continue
+                elif builder.rule_type == RULE_MATCH:
+                    # If this is a product of match rule handle it as a RHS
+                    # of assignment and return converted python type.
+                    return match_value(metamodel, node)
+
+                if projection is not None and \
+                        not projection.constructs(builder.cls):
+                    return SKIPPED
 
-            if parser.debug:
-                parser.dprint("CREATING INSTANCE {}".format(node.rule_name))
-
-            # If user class is given
-            # use it instead of generic one
-            if node.rule_name in metamodel.user_classes:
-                user_class = metamodel.user_classes[node.rule_name]
-
-                # Object initialization will be done afterwards
-                # At this point we need object to be allocated
-                # So that nested object get correct reference
-                if is_pyecore_enabled():
-                    if isinstance(user_class, type):
-                        inst = user_class.__new__(user_class, 'tmp_name')
+                if parser.debug:
+                    parser.dprint("CREATING INSTANCE {}"
+                                  .format(node.rule_name))
+
+                # If user class is given
+                # use it instead of generic one
+                user_class = builder.user_class
+                if user_class is not None:
+                    # Object initialization will be done afterwards
+                    # At this point we need object to be allocated
+                    # So that nested object get correct reference
+                    if pyecore:
+                        if isinstance(user_class, type):
+                            inst = user_class.__new__(user_class, 'tmp_name')
+                        else:
+                            inst = user_class.__new__(user_class)
+                        metamodel._init_obj_attrs(inst)
                     else:
                         inst = user_class.__new__(user_class)
-                    parser.metamodel._init_obj_attrs(inst)
-                else:
-                    inst = user_class.__new__(user_class)
-                    # Initialize object attributes for user class
-                    parser.metamodel._init_obj_attrs(inst, user=True)
-            else:
-                # Generic class will call attributes init
-                # from the constructor
-                if is_pyecore_enabled():
-                    inst = mclass()
-                else:
-                    inst = mclass.__new__(mclass)
-                    # Initialize object attributes
-                    parser.metamodel._init_obj_attrs(inst)
-
-            # Collect attributes directly on meta-class instance
-            obj_attrs = inst
-
-            inst._tx_position = node.position
-            inst._tx_position_end = node.position_end
-
-            # Push real obj. and dummy attr obj on the instance stack
-            parser._inst_stack.append((inst, obj_attrs))
-
-            for n in node:
-                if parser.debug:
-                    parser.dprint("Recursing into {} = '{}'"
-                                  .format(type(n).__name__, text(n)))
-                process_node(n)
-
-            parser._inst_stack.pop()
-
-            # If this object is nested add 'parent' reference
-            if parser._inst_stack:
-                if node.rule_name in metamodel.user_classes:
-                    obj_attrs._txa_parent = parser._inst_stack[-1][0]
+                        # Initialize object attributes for user class
+                        metamodel._init_obj_attrs(inst, user=True)
                 else:
-                    obj_attrs.parent = parser._inst_stack[-1][0]
-
-            # If the class is user supplied we need to do
-            # a proper initialization at this point.
-            if node.rule_name in metamodel.user_classes:
-                try:
-                    # Get only attributes defined by the grammar as well
-                    # as `parent` if exists
-                    attrs = {}
-                    if hasattr(obj_attrs, '_txa_parent'):
-                        attrs['parent'] = obj_attrs._txa_parent
-                        del obj_attrs._txa_parent
-                    if is_pyecore_enabled():
-                        init_fun = obj_attrs.__class__.__init__
-                        if 'parent' not in init_fun.__code__.co_varnames:
-                            attrs.pop('parent', None)
-                        for a in obj_attrs.__class__._tx_attrs:
-                            attrs[a] = getattr(obj_attrs, a)
-                            # delattr(obj_attrs, a.name)
+                    # Generic class will call attributes init
+                    # from the constructor
+                    mclass = builder.cls
+                    if pyecore:
+                        inst = mclass()
                     else:
-                        for a in obj_attrs.__class__._tx_attrs:
-                            attrs[a] = getattr(obj_attrs, "_txa_%s" % a)
-                            delattr(obj_attrs, "_txa_%s" % a)
-                    inst.__init__(**attrs)
-                except TypeError as e:
-                    # Add class name information in case of
-                    # wrong constructor parameters
-                    e.args += ("for class %s" %
-                               inst.__class__.__name__,)
-                    parser.dprint(traceback.print_exc())
-                    raise e
-
-            # Special case for 'name' attrib. It is used for cross-referencing
-            if hasattr(inst, 'name') and inst.name:
-                # Objects of each class are in its own namespace
-                if not id(inst.__class__) in parser._instances:
-                    parser._instances[id(inst.__class__)] = {}
-                parser._instances[id(inst.__class__)][inst.name] = inst
-
-            if parser.debug:
-                parser.dprint("LEAVING INSTANCE {}".format(node.rule_name))
+                        inst = mclass.__new__(mclass)
+                        # Initialize object attributes
+                        metamodel._init_obj_attrs(inst)
+
+                if positions:
+                    inst._tx_position = node.position
+                    inst._tx_position_end = node.position_end
+                inst._tx_model = parser._inst_stack[0]._tx_model \
+                    if parser._inst_stack else inst
+                if objects is not None:
+                    objects.add(inst)
+
+                # Push the object on the instance stack
+                parser._inst_stack.append(inst)
+                stack.append((builder, node, iter(node), FRAME_OBJECT))
+                return PUSHED
 
-        else:
             # Handle assignments
-            attr_name = node.rule._attr_name
-            op = node.rule_name.split('_')[-1]
-            model_obj, obj_attr = parser._inst_stack[-1]
-            cls = type(model_obj)
-            if is_pyecore_enabled():
-                cls = cls.eClass if not hasattr(cls, '_tx_attrs') else cls
-            metaattr = cls._tx_attrs[attr_name]
-
-            # Mangle attribute name to prevent name clashing with property
-            # setters on user classes
-            if cls.__name__ in metamodel.user_classes:
-                if is_pyecore_enabled():
-                    txa_attr_name = attr_name
-                else:
-                    txa_attr_name = "_txa_%s" % attr_name
-            else:
-                txa_attr_name = attr_name
+            op = builder.op
+            model_obj = parser._inst_stack[-1]
+
+            if projection is not None and \
+                    not projection.assigns(builder, type(model_obj)):
+                return SKIPPED
 
             if parser.debug:
                 parser.dprint('Handling assignment: {} {}...'
-                              .format(op, txa_attr_name))
+                              .format(op, builder.txa_attr_name))
 
             if op == 'optional':
-                setattr(obj_attr, txa_attr_name, True)
+                setattr(model_obj, builder.txa_attr_name, True)
+                return None
 
             elif op == 'plain':
-                attr_value = getattr(obj_attr, txa_attr_name)
+                attr_value = getattr(model_obj, builder.txa_attr_name)
                 if attr_value and not __is_collection_or_enum(attr_value):
                     raise TextXSemanticError(
                         message="Multiple assignments to attribute {} at {}"
-                                .format(attr_name,
+                                .format(builder.attr_name,
                                         parser.pos_to_linecol(node.position)),
                         err_type=MULT_ASSIGN_ERROR)
+                stack.append((builder, node, iter((node[0],)), FRAME_PLAIN))
+            else:
+                stack.append((builder, node, iter(node), FRAME_LIST))
+            return PUSHED
 
-                # Convert tree bellow assignment to proper value
-                value = process_node(node[0])
+        return convert(node)
 
-                if metaattr.ref and not metaattr.cont:
-                    # If this is non-containing reference create ObjCrossRef
-                    value = ObjCrossRef(obj_name=value, cls=metaattr.cls,
-                                        position=node[0].position)
-                    parser._crossrefs.append((model_obj, metaattr, value))
-                    return model_obj
+    def leave_node(builder, node):
+        """
+        Finishes construction of the object after all sub-nodes of its
+        node are processed and returns the object.
+        """
+        inst = parser._inst_stack.pop()
+        user_class = builder.user_class
 
-                if __is_collection(attr_value):
-                    attr_value.append(value)
-                else:
-                    setattr(obj_attr, txa_attr_name, value)
-
-            elif op in ['list', 'oneormore', 'zeroormore']:
-                pos_index = 0
-                positions = [n.position for n in node if n.rule_name != 'sep']
-                for n in node:
-                    # If the node is separator skip
-                    if n.rule_name != 'sep':
-                        # Convert node to proper type
-                        # Rule links will be resolved later
-                        value = process_node(n)
-
-                        if metaattr.ref and not metaattr.cont:
-                            # If this is non-containing reference
-                            # create ObjCrossRef
-                            value = ObjCrossRef(obj_name=value,
-                                                cls=metaattr.cls,
-                                                position=positions[pos_index])
-
-                            parser._crossrefs.append((obj_attr, metaattr,
-                                                      value))
-                            pos_index += 1
-                            continue
-
-                        if not hasattr(obj_attr, txa_attr_name) or \
-                                getattr(obj_attr, txa_attr_name) is None:
-                            setattr(obj_attr, txa_attr_name, [])
-                        getattr(obj_attr, txa_attr_name).append(value)
+        # If this object is nested add 'parent' reference
+        if parser._inst_stack:
+            if user_class is not None:
+                inst._txa_parent = parser._inst_stack[-1]
             else:
-                # This shouldn't happen
-                assert False
+                inst.parent = parser._inst_stack[-1]
+
+        # If the class is user supplied we need to do
+        # a proper initialization at this point.
+        if user_class is not None:
+            try:
+                # Get only attributes defined by the grammar as well
+                # as `parent` if exists
+                attrs = {}
+                if hasattr(inst, '_txa_parent'):
+                    attrs['parent'] = inst._txa_parent
+                    del inst._txa_parent
+                if pyecore:
+                    init_fun = inst.__class__.__init__
+                    if 'parent' not in init_fun.__code__.co_varnames:
+                        attrs.pop('parent', None)
+                    for a in inst.__class__._tx_attrs:
+                        attrs[a] = getattr(inst, a)
+                else:
+                    for a in inst.__class__._tx_attrs:
+                        attrs[a] = getattr(inst, "_txa_%s" % a)
+                        delattr(inst, "_txa_%s" % a)
+                inst.__init__(**attrs)
+            except TypeError as e:
+                # Add class name information in case of
+                # wrong constructor parameters
+                e.args += ("for class %s" %
+                           inst.__class__.__name__,)
+                parser.dprint(traceback.print_exc())
+                raise e
+
+        # Special case for 'name' attrib. It is used for cross-referencing
+        if hasattr(inst, 'name') and inst.name:
+            _register_instance(parser, inst)
+
+        if parser.debug:
+            parser.dprint("LEAVING INSTANCE {}".format(node.rule_name))
 
         # Collect rules for textx-tools
-        if inst and metamodel.textx_tools_support:
+        if metamodel.textx_tools_support:
             pos = (inst._tx_position, inst._tx_position_end)
             pos_rule_dict[pos] = inst
 
         return inst
 
-    def resolve_refs(model):
+    def process_node(node):
         """
-        Resolves model references.
+        Depth-first construction of the object graph for the given node.
+        An explicit stack of (builder, node, sub-nodes iterator, kind) frames
+        is used instead of recursion so that the depth of the model is not
+        limited by the Python recursion limit.
         """
-        # TODO: Scoping and name-space rules.
+        stack = []
+        value = enter_node(node, stack)
+        while stack:
+            builder, node, children, kind = stack[-1]
+            child = next(children, None)
+
+            if child is None:
+                # All sub-nodes are processed.
+                stack.pop()
+                value = leave_node(builder, node) \
+                    if kind is FRAME_OBJECT else None
+                if not stack:
+                    break
+                child = node
+                builder, node, children, kind = stack[-1]
+
+            elif isinstance(child, Terminal):
+                # If the node is separator skip
+                if kind is FRAME_LIST and child.rule_name == 'sep':
+                    continue
+                convert = converters.get(child.rule_name)
+                value = convert(child.value) if convert else child.value
 
-        metamodel = parser.metamodel
+            else:
+                if parser.debug:
+                    parser.dprint("Recursing into {} = '{}'"
+                                  .format(type(child).__name__, text(child)))
+                value = enter_node(child, stack)
+                if value is PUSHED or value is SKIPPED:
+                    continue
+
+            if kind is FRAME_OBJECT:
+                continue
+
+            # Assign the value of the sub-node of an assignment.
+            model_obj = parser._inst_stack[-1]
+            txa_attr_name = builder.txa_attr_name
+
+            crossref = None
+            if builder.crossref:
+                obj = registered_object(model_obj, builder, value) \
+                    if immediate else None
+                if obj is not None:
+                    value = obj
+                    if parser._reverse_refs is not None:
+                        parser._reverse_refs.add(obj, model_obj,
+                                                 builder.metaattr.name)
+                else:
+                    # If this is non-containing reference create ObjCrossRef
+                    # Rule links will be resolved later
+                    crossref = ObjCrossRef(obj_name=value,
+                                           cls=builder.metaattr.cls,
+                                           position=child.position)
+                    if not builder.keep_crossref:
+                        parser._crossrefs.append((model_obj,
+                                                  builder.metaattr,
+                                                  crossref, None))
+                        continue
+                    value = crossref
+
+            if kind is FRAME_PLAIN:
+                attr_value = getattr(model_obj, txa_attr_name)
+                if __is_collection(attr_value):
+                    attr_value.append(value)
+                else:
+                    setattr(model_obj, txa_attr_name, value)
+                    attr_value = None
 
-        def _resolve_link_rule_ref(obj_ref):
+            else:
+                attr_value = getattr(model_obj, txa_attr_name, None)
+                if attr_value is None:
+                    attr_value = []
+                    setattr(model_obj, txa_attr_name, attr_value)
+                attr_value.append(value)
 
-            if obj_ref is None:
-                return
+            if crossref is not None:
+                parser._crossrefs.append(
+                    (model_obj, builder.metaattr, crossref,
+                     None if attr_value is None else len(attr_value) - 1))
 
-            assert type(obj_ref) is ObjCrossRef, type(obj_ref)
+        return value
 
-            if parser.debug:
-                parser.dprint("Resolving obj crossref: {}:{}"
-                              .format(obj_ref.cls, obj_ref.obj_name))
-
-            def _inner_resolve_link_rule_ref(cls, obj_name):
-                """
-                Depth-first resolving of link rule reference.
-                """
-                if cls._tx_type is RULE_ABSTRACT:
-                    for inherited in cls._tx_inh_by:
-                        result = _inner_resolve_link_rule_ref(inherited,
-                                                              obj_name)
-                        if result:
-                            return result
-                elif cls._tx_type == RULE_COMMON:
-                    if is_pyecore_enabled():
-                        cls = (cls.python_class if isinstance(cls, EClass)
-                               else cls)
-                    if id(cls) in parser._instances:
-                        objs = parser._instances[id(cls)]
-                        if obj_name in objs:
-                            return objs[obj_name]
-
-            result = _inner_resolve_link_rule_ref(obj_ref.cls,
-                                                  obj_ref.obj_name)
-
-            # Collect cross-references for textx-tools
-            if result:
-                if metamodel.textx_tools_support:
-                    pos_crossref_list.append(
-                        RefRulePosition(name=obj_ref.obj_name,
-                                        ref_pos_start=obj_ref.position,
-                                        ref_pos_end=obj_ref.position +
-                                        len(result.name),
-                                        def_pos_start=result._tx_position,
-                                        def_pos_end=result._tx_position_end))
-
-                return result
-
-            # As a fall-back search builtins if given
-            if metamodel.builtins:
-                if obj_ref.obj_name in metamodel.builtins:
-                    # TODO: Classes must match
-                    return metamodel.builtins[obj_ref.obj_name]
-
-            line, col = parser.pos_to_linecol(obj_ref.position)
-            raise TextXSemanticError(
-                message='Unknown object "{}" of class "{}" at {}'
-                        .format(obj_ref.obj_name, obj_ref.cls.__name__,
-                                (line, col)),
-                line=line,
-                col=col,
-                err_type=UNKNOWN_OBJ_ERROR,
-                expected_obj_cls=obj_ref.cls)
+    def registered_object(model_obj, builder, name):
+        """
+        Returns the object with the given name already registered for the
+        reference assigned by the given builder or None if the reference
+        must be resolved after the model is constructed.
+        """
+        # Cross-refs of user classes are added to lists after the
+        # construction so only single references are resolved here to keep
+        # the order.
+        if not builder.keep_crossref \
+                and builder.metaattr.mult not in (MULT_ONE, MULT_OPTIONAL):
+            return None
+        if metamodel.scope_providers and metamodel._scope_provider(
+                type(model_obj).__name__, builder.attr_name):
+            return None
+
+        return last_registered(builder.metaattr.cls, name)
+
+    def last_registered(cls, name):
+        """
+        Returns the object with the given name registered so far for the
+        references to the given class or None.
+        """
+        classes = ref_classes.get(id(cls))
+        if not classes:
+            return None
+        if len(classes) == 1:
+            objs = parser._instances.get(id(classes[0]))
+            return objs.get(name) if objs else None
+        objs = parser._ref_index.get(id(cls))
+        registered = objs.get(name) if objs else None
+        return registered[1] if registered else None
+
+    def resolve_shadowed(model):
+        """
+        Resolves again the references resolved during construction to the
+        objects whose names were defined again later in the input, so the
+        last definition is referenced as if all references were resolved
+        after the construction.
+        """
+        shadowed = parser._shadowed
+        reverse_refs = parser._reverse_refs
+        for obj in iter_model(model):
+            attrs = getattr(type(obj), '_tx_attrs', None)
+            if not attrs:
+                continue
+            for attr_name, attr in attrs.items():
+                if not attr.ref or attr.cont:
+                    continue
+                # Lazy references must not be resolved here.
+                descriptor = type(obj).__dict__.get(attr_name)
+                if type(descriptor) is LazyReference:
+                    try:
+                        value = descriptor.get_value(obj)
+                    except AttributeError:
+                        continue
+                else:
+                    value = getattr(obj, attr_name, None)
+                if attr.mult in (MULT_ONE, MULT_OPTIONAL):
+                    targets = [value]
+                else:
+                    targets = value or []
+                for index, target in enumerate(targets):
+                    if id(target) not in shadowed:
+                        continue
+                    resolved = last_registered(attr.cls, target.name)
+                    if resolved is None or resolved is target:
+                        continue
+                    if targets is value:
+                        value[index] = resolved
+                    else:
+                        setattr(obj, attr_name, resolved)
+                    if reverse_refs is not None:
+                        reverse_refs.remove(target, obj, attr_name)
+                        reverse_refs.add(resolved, obj, attr_name)
+        shadowed.clear()
+
+    def resolve_refs(model):
+        """
+        Resolves model references. References held by lazy reference
+        attributes are resolved on the first access instead.
+        """
+        lazy = metamodel.lazy_refs and not metamodel.textx_tools_support
+        resolver = ReferenceResolver(
+            parser,
+            pos_crossref_list if metamodel.textx_tools_support else None,
+            keep_parser=not lazy)
 
         # If this object has attributes (created using a common rule)
-        for obj, attr, crossref in parser._crossrefs:
-            attr_value = getattr(obj, attr.name)
-            resolved = _resolve_link_rule_ref(crossref)
-            if attr.mult in [MULT_ONEORMORE, MULT_ZEROORMORE]:
-                attr_value.append(resolved)
+        for obj, attr, crossref, index in parser._crossrefs:
+            many = attr.mult in [MULT_ONEORMORE, MULT_ZEROORMORE]
+            if lazy:
+                descriptor = type(obj).__dict__.get(attr.name)
+                if type(descriptor) is LazyReference:
+                    crossref.resolver = resolver
+                    descriptor.add_crossref(obj, crossref, many, index)
+                    continue
+            resolved = resolver.resolve(crossref, obj, attr)
+            if index is not None:
+                # Cross-ref is replaced in place to keep the list order.
+                getattr(obj, attr.name)[index] = resolved
+            elif many:
+                getattr(obj, attr.name).append(resolved)
             else:
                 setattr(obj, attr.name, resolved)
         del parser._crossrefs[:]
 
     def call_obj_processors(model_obj):
         """
-        Depth-first model object processing.
+        Depth-first model object processing. Contained objects are
+        processed before their container. An explicit stack is used
+        instead of recursion.
         """
-        try:
-            if is_pyecore_enabled():
-                metaclass = model_obj.eClass
-            else:
-                metaclass = metamodel[model_obj.__class__.__name__]
-            for metaattr in metaclass._tx_attrs.values():
-                # If attribute is containment reference go down
-                if metaattr.ref and metaattr.cont:
-                    attr = getattr(model_obj, metaattr.name)
-                    if attr:
-                        if metaattr.mult != MULT_ONE:
-                            for obj in attr:
-                                if obj:
-                                    call_obj_processors(obj)
-                        else:
-                            call_obj_processors(attr)
-        except KeyError:
-            metaclass = type(model_obj)
-
-        obj_processor = metamodel.obj_processors.get(metaclass.__name__, None)
-        if obj_processor:
-            obj_processor(model_obj)
-
-    model = process_node(parse_tree)
+        stack = [(model_obj, False)]
+        while stack:
+            model_obj, children_processed = stack.pop()
+            try:
+                if pyecore:
+                    metaclass = model_obj.eClass
+                else:
+                    metaclass = metamodel[model_obj.__class__.__name__]
+            except KeyError:
+                metaclass = type(model_obj)
+                children_processed = True
+
+            if not children_processed:
+                stack.append((model_obj, True))
+                children = []
+                for metaattr in metaclass._tx_attrs.values():
+                    # If attribute is containment reference go down
+                    if metaattr.ref and metaattr.cont:
+                        attr = getattr(model_obj, metaattr.name)
+                        if attr:
+                            if metaattr.mult != MULT_ONE:
+                                children.extend(obj for obj in attr if obj)
+                            else:
+                                children.append(attr)
+                stack.extend((obj, False) for obj in reversed(children))
+                continue
+
+            obj_processor = metamodel.obj_processors.get(metaclass.__name__,
+                                                         None)
+            # Stubs of the containers of projected models are not processed.
+            if obj_processor and (projection is None or
+                                  projection.completes(type(model_obj))):
+                obj_processor(model_obj)
+
+    if metamodel.direct_construction and not is_pyecore_enabled():
+        model, model_objs = direct_model(parser, parse_tree, parent)
+        if metamodel.textx_tools_support:
+            for inst in model_objs:
+                pos_rule_dict[(inst._tx_position,
+                               inst._tx_position_end)] = inst
+    else:
+        if parent is not None:
+            parser._inst_stack.append(parent)
+            model = process_node(parse_tree)
+            parser._inst_stack.pop()
+        else:
+            model = process_node(parse_tree)
+        if immediate and parser._shadowed:
+            resolve_shadowed(model)
     resolve_refs(model)
     assert not parser._inst_stack
 
@@ -613,7 +2738,11 @@ def parse_tree_to_objgraph(parser, parse_tree):
             parser.dprint("CALLING OBJECT PROCESSORS")
         call_obj_processors(model)
 
-    if metamodel.textx_tools_support \
+        # Processors may change the model.
+        if objects is not None and parent is None:
+            objects = _object_index(model, metamodel)
+
+    if metamodel.textx_tools_support and parent is None \
        and type(model) not in PRIMITIVE_PYTHON_TYPES:
         # Cross-references for go-to definition language server support
         # Already sorted based on ref_pos_start attr
@@ -625,4 +2754,14 @@ def parse_tree_to_objgraph(parser, parse_tree):
         model._pos_rule_dict = OrderedDict(sorted(pos_rule_dict.items(),
                                            key=lambda x: x[0], reverse=True))
 
+    if parent is None and type(model) not in PRIMITIVE_PYTHON_TYPES:
+        try:
+            if objects is not None:
+                model._tx_objects = objects
+            if parser._reverse_refs is not None:
+                model._tx_reverse_refs = parser._reverse_refs
+        except AttributeError:
+            # Slots class of the model root without model attributes.
+            pass
+
     return model
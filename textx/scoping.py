@@ -0,0 +1,169 @@
+#######################################################################
+# Name: scoping.py
+# Purpose: Scope providers used in reference resolving.
+# Author: Igor R. Dejanovic <igor DOT dejanovic AT gmail DOT com>
+# Copyright:
+#   (c) 2017 Igor R. Dejanovic <igor DOT dejanovic AT gmail DOT com>
+# License: MIT License
+#######################################################################
+from __future__ import absolute_import
+from textx.const import MULT_ONE, MULT_OPTIONAL
+from textx.model import model_root
+
+__all__ = ['PlainName', 'FQN', 'ScopeIndex']
+
+
+class PlainName(object):
+    """
+    Resolves references by the name among all objects of the referenced
+    class. This is the resolving used when no scope provider is registered
+    for the attribute. Can be used to override a more general provider.
+    """
+    def __call__(self, obj, attr, obj_ref):
+        return obj_ref.resolver.lookup(obj_ref)
+
+
+class FQN(object):
+    """
+    Resolves references by the names qualified by the names of the
+    containing objects (e.g. `package.Entity`).
+
+    Named objects (with non-empty `name` attribute) and the model root are
+    the scopes of the named objects they contain (directly or through
+    unnamed objects). The qualified name is first looked up in the scope of
+    the object holding the reference and then in the enclosing scopes up to
+    the model root, i.e. inner names hide outer names.
+
+    Args:
+        separator(str): Separator of the names. Default is '.'.
+    """
+    def __init__(self, separator='.'):
+        self.separator = separator
+
+    def __call__(self, obj, attr, obj_ref):
+        index = ScopeIndex.for_reference(obj, obj_ref)
+        names = tuple(obj_ref.obj_name.split(self.separator))
+        return index.find_visible(obj, names, obj_ref.cls)
+
+
+class ScopeIndex(object):
+    """
+    Named objects of the model indexed by their scopes. The index is built
+    once for all references resolved together (see `for_reference`) and
+    the results of lookups are memoized.
+
+    Attributes:
+        root(object): The model root.
+        members(dict): Named objects keyed by id of the scope and the name.
+            Values are lists of objects in the order of the model.
+    """
+    def __init__(self, root, metamodel):
+        self.root = root
+        self.metamodel = metamodel
+        self.members = {}
+
+        # Results of find and find_visible keyed by id of the scope, the
+        # names and id of the referenced class.
+        self._found = {}
+        self._visible = {}
+
+        objs = [(root, root)]
+        while objs:
+            obj, scope = objs.pop()
+            cls = type(obj)
+            if not hasattr(cls, '_tx_attrs'):
+                continue
+            if self.is_scope(obj):
+                scope = obj
+
+            children = []
+            for attr_name, attr in cls._tx_attrs.items():
+                if attr.cont and attr.ref:
+                    value = getattr(obj, attr_name)
+                    if attr.mult in (MULT_ONE, MULT_OPTIONAL):
+                        if value is not None:
+                            children.append(value)
+                    elif value:
+                        children.extend(value)
+
+            for child in children:
+                name = getattr(child, 'name', None)
+                if name:
+                    members = self.members.get(id(scope))
+                    if members is None:
+                        members = self.members[id(scope)] = {}
+                    members.setdefault(name, []).append(child)
+            objs.extend((child, scope) for child in reversed(children))
+
+    @staticmethod
+    def for_reference(obj, obj_ref):
+        """
+        Returns the index of the model of the given object. The index is
+        kept by the resolver of the reference so it is built once for all
+        references of the model.
+        """
+        cache = obj_ref.resolver.cache
+        index = cache.get(ScopeIndex)
+        if index is None:
+            index = cache[ScopeIndex] = ScopeIndex(model_root(obj),
+                                                   obj_ref.resolver.metamodel)
+        return index
+
+    def is_scope(self, obj):
+        return obj is self.root or bool(getattr(obj, 'name', None))
+
+    def find_visible(self, obj, names, cls):
+        """
+        Returns the object of the given class (or its descendants) with the
+        given qualified name (a tuple of names) relative to the scope of the
+        given object or the first enclosing scope where it is found or None.
+        """
+        scope = obj
+        while scope is not None and not self.is_scope(scope):
+            scope = getattr(scope, 'parent', None)
+
+        key = (id(scope), names, id(cls))
+        try:
+            return self._visible[key]
+        except KeyError:
+            pass
+
+        result = None
+        while scope is not None:
+            if self.is_scope(scope):
+                result = self.find(scope, names, cls)
+                if result is not None:
+                    break
+            scope = getattr(scope, 'parent', None)
+
+        self._visible[key] = result
+        return result
+
+    def find(self, scope, names, cls):
+        """
+        Returns the object of the given class (or its descendants) with the
+        given qualified name (a tuple of names) relative to the given scope
+        or None.
+        """
+        key = (id(scope), names, id(cls))
+        try:
+            return self._found[key]
+        except KeyError:
+            pass
+
+        result = None
+        for name in names[:-1]:
+            objs = self.members.get(id(scope), {}).get(name)
+            if not objs:
+                break
+            scope = objs[0]
+        else:
+            bits = self.metamodel._subclass_bits.get(id(cls), 0)
+            class_bits = self.metamodel._class_bits
+            for obj in self.members.get(id(scope), {}).get(names[-1], ()):
+                if class_bits.get(id(type(obj)), 0) & bits:
+                    result = obj
+                    break
+
+        self._found[key] = result
+        return result